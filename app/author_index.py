@@ -0,0 +1,184 @@
+import ast
+import json
+import logging
+import sqlite3
+import unicodedata
+from typing import List, Optional, Tuple
+
+from app.paper_details import has_paper_details, paper_column_sql
+from app.search import build_match_query
+
+logger = logging.getLogger(__name__)
+
+# Built by create_db.py from papers.all_authors
+PAPER_AUTHORS_TABLE = "paper_authors"
+AUTHOR_STATS_TABLE = "author_stats"
+AUTHORS_FTS_TABLE = "authors_fts"
+# PPC_Ids of papers inserted or re-bylined since their author rows were built,
+# queued by triggers (SQL cannot parse all_authors) and drained by sync_author_index()
+AUTHOR_SYNC_TABLE = "author_index_pending"
+
+def normalize_author_name(name: str) -> str:
+    """Normalized form used to store and look up author names.
+
+    Accents are stripped, case is folded and whitespace collapsed, so
+    "José  Müller" and "jose muller" resolve to the same author.
+    """
+    text = unicodedata.normalize("NFKD", str(name))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.casefold().split())
+
+def parse_author_names(all_authors) -> List[str]:
+    """Extract author names from an all_authors value, in listed order.
+
+    all_authors holds a list of {'author_name': ..., 'author_affiliation': ...}
+    dicts serialized as a Python literal (older exports use JSON). Values that
+    cannot be parsed yield no names.
+    """
+    if not isinstance(all_authors, str) or not all_authors.strip():
+        return []
+    try:
+        authors = ast.literal_eval(all_authors)
+    except (ValueError, SyntaxError):
+        try:
+            authors = json.loads(all_authors)
+        except ValueError:
+            return []
+    if not isinstance(authors, list):
+        return []
+
+    names = []
+    for author in authors:
+        name = author.get("author_name") if isinstance(author, dict) else author
+        if isinstance(name, str) and name.strip():
+            names.append(name.strip())
+    return names
+
+def has_author_index(conn: sqlite3.Connection) -> bool:
+    """Check whether the database was built with the normalized author tables"""
+    row = conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN (?, ?, ?)",
+        (PAPER_AUTHORS_TABLE, AUTHOR_STATS_TABLE, AUTHORS_FTS_TABLE)
+    ).fetchone()
+    return row[0] == 3
+
+def author_search_condition(conn: sqlite3.Connection, query: str) -> Tuple[str, list]:
+    """WHERE condition on papers matching any author whose name contains the query's words.
+
+    Falls back to a substring match on submission_contact for databases built
+    before the author tables existed.
+    """
+    match = build_match_query(normalize_author_name(query)) if has_author_index(conn) else None
+    if match is None:
+        return "submission_contact LIKE ?", [f"%{query}%"]
+    return f"""PPC_Id IN (
+        SELECT pa.PPC_Id FROM {AUTHORS_FTS_TABLE} f
+        JOIN {PAPER_AUTHORS_TABLE} pa ON pa.author_norm = f.author_norm
+        WHERE {AUTHORS_FTS_TABLE} MATCH ?
+    )""", [match]
+
+def matching_author_norms(conn: sqlite3.Connection, author_name: str) -> Optional[List[str]]:
+    """Normalized names of the indexed authors matched by author_papers_condition.
+
+    None when the name has no searchable words, in which case the condition
+    is a substring match instead.
+    """
+    match = build_match_query(normalize_author_name(author_name))
+    if match is None:
+        return None
+    rows = conn.execute(
+        f"SELECT author_norm FROM {AUTHORS_FTS_TABLE} WHERE {AUTHORS_FTS_TABLE} MATCH ?", (match,)
+    ).fetchall()
+    return [row[0] for row in rows]
+
+def author_papers_condition(conn: sqlite3.Connection, author_name: str) -> Tuple[str, list]:
+    """WHERE condition on papers selecting every paper of the authors matching the name.
+
+    Matches like author_search_condition, against every author listed on
+    the byline: each word of the name must begin a word of the author's
+    normalized name, with case and diacritics folded. "garc" and "García"
+    both find "Maria Garcia Lopez", but a mid-word fragment such as "arci"
+    no longer matches as it did under the older substring match on
+    submission_contact.
+    """
+    return author_search_condition(conn, author_name)
+
+def _index_paper_authors(conn: sqlite3.Connection, ppc_id: str, authors_sql: str) -> None:
+    """Replace a paper's author rows and their stats with those parsed from its current all_authors"""
+    old_norms = {
+        row[0] for row in conn.execute(f"SELECT author_norm FROM {PAPER_AUTHORS_TABLE} WHERE PPC_Id = ?", (ppc_id,))
+    }
+    conn.execute(f"""
+        UPDATE {AUTHOR_STATS_TABLE} SET
+            paper_count = paper_count - 1,
+            total_citations = total_citations
+                - COALESCE((SELECT total_citation FROM papers WHERE PPC_Id = ?), 0)
+        WHERE author_norm IN (SELECT author_norm FROM {PAPER_AUTHORS_TABLE} WHERE PPC_Id = ?)
+    """, (ppc_id, ppc_id))
+    conn.execute(f"DELETE FROM {PAPER_AUTHORS_TABLE} WHERE PPC_Id = ?", (ppc_id,))
+
+    paper = conn.execute(f"SELECT total_citation, {authors_sql} FROM papers WHERE PPC_Id = ?", (ppc_id,)).fetchone()
+    new_norms = set()
+    if paper is not None:
+        total_citation, all_authors = paper[0], paper[1]
+        for position, name in enumerate(parse_author_names(all_authors), start=1):
+            author_norm = normalize_author_name(name)
+            if not author_norm or author_norm in new_norms:
+                continue
+            new_norms.add(author_norm)
+            conn.execute(f"INSERT INTO {PAPER_AUTHORS_TABLE} VALUES (?, ?, ?, ?)", (ppc_id, author_norm, position, name))
+            known = conn.execute(
+                f"SELECT 1 FROM {AUTHOR_STATS_TABLE} WHERE author_norm = ?", (author_norm,)
+            ).fetchone()
+            conn.execute(f"""
+                INSERT INTO {AUTHOR_STATS_TABLE} VALUES (?, ?, 1, NULL, COALESCE(?, 0))
+                ON CONFLICT(author_norm) DO UPDATE SET
+                    author_name = MIN(author_name, excluded.author_name),
+                    paper_count = paper_count + 1,
+                    total_citations = total_citations + excluded.total_citations
+            """, (author_norm, name, total_citation))
+            if known is None:
+                conn.execute(f"INSERT INTO {AUTHORS_FTS_TABLE}(author_norm) VALUES (?)", (author_norm,))
+
+    for author_norm in old_norms | new_norms:
+        conn.execute(f"""
+            UPDATE {AUTHOR_STATS_TABLE} SET max_citations = (
+                SELECT MAX(p.total_citation) FROM {PAPER_AUTHORS_TABLE} pa
+                JOIN papers p ON p.PPC_Id = pa.PPC_Id
+                WHERE pa.author_norm = ?
+            )
+            WHERE author_norm = ?
+        """, (author_norm, author_norm))
+        conn.execute(f"DELETE FROM {AUTHOR_STATS_TABLE} WHERE author_norm = ? AND paper_count <= 0", (author_norm,))
+
+def sync_author_index(conn: sqlite3.Connection) -> int:
+    """Bring the author tables up to date with papers inserted or re-bylined since they were built.
+
+    create_db.py's triggers queue such papers in AUTHOR_SYNC_TABLE; each is
+    re-parsed here and its author rows and stats rebuilt, in one write
+    transaction so concurrent workers never apply a paper twice. Cheap when
+    the queue is empty, so readers of the author tables call it first.
+    Returns the number of papers synced.
+    """
+    try:
+        if conn.execute(f"SELECT 1 FROM {AUTHOR_SYNC_TABLE} LIMIT 1").fetchone() is None:
+            return 0
+    except sqlite3.OperationalError:
+        # Databases built before the queue existed have nothing to sync
+        return 0
+
+    authors_sql = paper_column_sql("all_authors", has_paper_details(conn))
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        pending = [row[0] for row in conn.execute(f"SELECT PPC_Id FROM {AUTHOR_SYNC_TABLE}").fetchall()]
+        for ppc_id in pending:
+            _index_paper_authors(conn, ppc_id, authors_sql)
+        conn.execute(f"DELETE FROM {AUTHOR_SYNC_TABLE}")
+        conn.commit()
+    except sqlite3.Error as e:
+        # The queue is kept, so the next reader retries
+        conn.rollback()
+        logger.warning(f"Could not sync the author tables: {e}")
+        return 0
+    logger.info(f"Synced the authors of {len(pending)} new or updated papers")
+    return len(pending)
@@ -1,17 +1,902 @@
-from cachetools import TTLCache
+import gzip
+import heapq
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from cachetools import Cache, TTLCache
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
 from app.config import settings
+from app.data_version import current_data_version
+from app.database import db_manager
+from app.metrics import key_family, registry
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - falls back to the standard library encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - br is simply not offered
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Tag of entries that depend on the whole data set; every write invalidates it
+GLOBAL_TAG = "global"
+
+class CacheBackend:
+    """Shared second-level store behind the in-process caches.
+
+    Values are opaque bytes grouped by namespace (one per cache instance)
+    and labelled with the tags of the data they depend on. Entries are
+    written for one data generation and only read back for it. A write
+    moves the data to a new generation through invalidate(), which drops
+    the entries carrying the written tags, carries the others over and
+    records the tags so every worker can drop the same entries from its
+    L1. Backends treat their own failures as misses: the cache must never
+    fail a request.
+    """
+
+    def get(self, namespace: str, key: str, generation: Optional[int]) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(
+        self, namespace: str, key: str, value: bytes, ttl: int, generation: Optional[int], tags: Sequence[str]
+    ) -> None:
+        raise NotImplementedError
+
+    def delete(self, namespace: str, key: str) -> bool:
+        raise NotImplementedError
+
+    def clear(self, namespace: str) -> None:
+        raise NotImplementedError
+
+    def invalidate(self, tags: Set[str], from_generation: Optional[int], to_generation: Optional[int]) -> None:
+        raise NotImplementedError
+
+    def invalidated_tags(self, from_generation: int, to_generation: int) -> Optional[Set[str]]:
+        """Tags invalidated between two generations, or None when unknown (e.g. a rebuilt database)"""
+        raise NotImplementedError
+
+    def tags_with_prefix(self, prefix: str) -> Set[str]:
+        raise NotImplementedError
+
+    def usage(self) -> Dict[str, Tuple[int, int]]:
+        """Live entries and value bytes per namespace"""
+        raise NotImplementedError
+
+class SQLiteCacheBackend(CacheBackend):
+    """Cache entries in a local SQLite file shared by all worker processes.
+
+    The file is opened in WAL mode, so workers read concurrently while one
+    writes, and entries survive restarts and redeploys until they expire.
+    Expired entries, entries of older data generations and old invalidation
+    records are purged every PURGE_EVERY writes.
+    """
+    PURGE_EVERY = 256
+    # Workers catch up on invalidations at their next cache access; a day covers any of them
+    INVALIDATION_RETENTION = 86400
+    MAX_INVALIDATION_CHAIN = 1000
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._connection()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                generation INTEGER,
+                expires_at REAL NOT NULL,
+                value BLOB NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_tags (
+                tag TEXT NOT NULL,
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                PRIMARY KEY (tag, namespace, key)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_tags_entry ON cache_tags(namespace, key)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS cache_invalidations (
+                from_generation INTEGER NOT NULL,
+                to_generation INTEGER NOT NULL,
+                tags TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (from_generation, to_generation)
+            )
+        """)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Thread-local connection, reopened in forked worker processes"""
+        conn = getattr(self._local, "connection", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=settings.cache_busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def get(self, namespace: str, key: str, generation: Optional[int]) -> Optional[bytes]:
+        try:
+            row = self._connection().execute(
+                "SELECT value FROM cache_entries"
+                " WHERE namespace = ? AND key = ? AND generation IS ? AND expires_at > ?",
+                (namespace, key, generation, time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache read failed: {e}")
+            return None
+        return row[0] if row else None
+
+    def set(
+        self, namespace: str, key: str, value: bytes, ttl: int, generation: Optional[int], tags: Sequence[str]
+    ) -> None:
+        now = time.time()
+        try:
+            with self._transaction() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache_entries (namespace, key, generation, expires_at, value)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (namespace, key, generation, now + ttl, value)
+                )
+                conn.execute("DELETE FROM cache_tags WHERE namespace = ? AND key = ?", (namespace, key))
+                conn.executemany(
+                    "INSERT OR IGNORE INTO cache_tags (tag, namespace, key) VALUES (?, ?, ?)",
+                    [(tag, namespace, key) for tag in tags]
+                )
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                self._purge(now, generation)
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache write failed: {e}")
+
+    def _purge(self, now: float, generation: Optional[int]) -> None:
+        with self._transaction() as conn:
+            purged = conn.execute(
+                "SELECT namespace, key, expires_at <= ? FROM cache_entries WHERE expires_at <= ? OR generation IS NOT ?",
+                (now, now, generation)
+            ).fetchall()
+            conn.execute(
+                "DELETE FROM cache_entries WHERE expires_at <= ? OR generation IS NOT ?", (now, generation)
+            )
+            for namespace, key, expired in purged:
+                record_eviction(namespace, key, "l2", "expired" if expired else "invalidated")
+            conn.execute("""
+                DELETE FROM cache_tags WHERE NOT EXISTS (
+                    SELECT 1 FROM cache_entries e
+                    WHERE e.namespace = cache_tags.namespace AND e.key = cache_tags.key
+                )
+            """)
+            conn.execute(
+                "DELETE FROM cache_invalidations WHERE created_at < ?", (now - self.INVALIDATION_RETENTION,)
+            )
+
+    def delete(self, namespace: str, key: str) -> bool:
+        try:
+            with self._transaction() as conn:
+                cursor = conn.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (namespace, key)
+                )
+                conn.execute("DELETE FROM cache_tags WHERE namespace = ? AND key = ?", (namespace, key))
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache delete failed: {e}")
+            return False
+        return cursor.rowcount > 0
+
+    def clear(self, namespace: str) -> None:
+        try:
+            with self._transaction() as conn:
+                conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (namespace,))
+                conn.execute("DELETE FROM cache_tags WHERE namespace = ?", (namespace,))
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache clear failed: {e}")
+
+    def invalidate(self, tags: Set[str], from_generation: Optional[int], to_generation: Optional[int]) -> None:
+        tag_list = sorted(tags)
+        placeholders = ",".join(["?"] * len(tag_list))
+        try:
+            with self._transaction() as conn:
+                entries = conn.execute(
+                    f"SELECT DISTINCT namespace, key FROM cache_tags WHERE tag IN ({placeholders})", tag_list
+                ).fetchall() if tag_list else []
+                conn.executemany("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", entries)
+                conn.executemany("DELETE FROM cache_tags WHERE namespace = ? AND key = ?", entries)
+                for namespace, key in entries:
+                    record_eviction(namespace, key, "l2", "invalidated")
+                # What the write did not touch stays valid in the new generation
+                conn.execute(
+                    "UPDATE cache_entries SET generation = ? WHERE generation IS ?", (to_generation, from_generation)
+                )
+                if from_generation is not None and to_generation is not None:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO cache_invalidations (from_generation, to_generation, tags, created_at)"
+                        " VALUES (?, ?, ?, ?)",
+                        (from_generation, to_generation, json.dumps(tag_list), time.time())
+                    )
+        except sqlite3.Error as e:
+            # Entries of the old generation simply stop matching
+            logger.warning(f"Shared cache invalidation failed: {e}")
+
+    def invalidated_tags(self, from_generation: int, to_generation: int) -> Optional[Set[str]]:
+        tags: Set[str] = set()
+        generation = from_generation
+        try:
+            conn = self._connection()
+            for _ in range(self.MAX_INVALIDATION_CHAIN):
+                if generation == to_generation:
+                    return tags
+                row = conn.execute(
+                    "SELECT to_generation, tags FROM cache_invalidations"
+                    " WHERE from_generation = ? ORDER BY created_at DESC LIMIT 1",
+                    (generation,)
+                ).fetchone()
+                if row is None:
+                    return None
+                generation = row[0]
+                tags.update(json.loads(row[1]))
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache invalidation lookup failed: {e}")
+        return None
+
+    def tags_with_prefix(self, prefix: str) -> Set[str]:
+        try:
+            rows = self._connection().execute(
+                "SELECT DISTINCT tag FROM cache_tags WHERE tag >= ? AND tag < ?", (prefix, prefix + "\U0010ffff")
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache tag lookup failed: {e}")
+            return set()
+        return {row[0] for row in rows}
+
+    def usage(self) -> Dict[str, Tuple[int, int]]:
+        try:
+            rows = self._connection().execute(
+                "SELECT namespace, COUNT(*), COALESCE(SUM(length(value)), 0) FROM cache_entries"
+                " WHERE expires_at > ? GROUP BY namespace",
+                (time.time(),)
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache usage lookup failed: {e}")
+            return {}
+        return {namespace: (entries, size) for namespace, entries, size in rows}
+
+def create_cache_backend() -> Optional[CacheBackend]:
+    """Shared backend selected by settings.cache_backend ("sqlite" or "memory" for none)"""
+    if settings.cache_backend == "memory":
+        return None
+    if settings.cache_backend == "sqlite":
+        try:
+            return SQLiteCacheBackend(settings.cache_path)
+        except sqlite3.Error as e:
+            logger.warning(f"Shared cache unavailable at {settings.cache_path}, using in-process caches only: {e}")
+            return None
+    raise ValueError(f"Unknown cache backend '{settings.cache_backend}'")
+
+_MISSING = object()
+
+class _Entry(NamedTuple):
+    """A cached value, the Unix time until which it is fresh, its tags and the seconds it took to compute"""
+    value: Any
+    fresh_until: float
+    tags: Tuple[str, ...]
+    cost: float = 0.0
+
+_DEFAULT_TAGS = (GLOBAL_TAG,)
+
+def record_eviction(namespace: str, key: str, level: str, reason: str) -> None:
+    registry.inc("ppc_cache_evictions_total", cache=namespace, family=key_family(key), level=level, reason=reason)
+
+def _value_size(value: Any) -> int:
+    """Approximate bytes held by a cached value"""
+    if isinstance(value, EncodedJSONResponse):
+        return len(value.body) + sum(len(variant) for variant in value.variants.values())
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    return sys.getsizeof(value)
+
+class _BudgetedTTLCache(TTLCache):
+    """TTLCache bounded by bytes, evicting the entries cheapest to recompute first.
+
+    Entries weigh the size of their value plus ENTRY_OVERHEAD, so maxsize is
+    a memory budget. When it is exceeded, entries are evicted by
+    GreedyDual-Size-Frequency: an entry's priority is the cache's inflation
+    value plus hits * cost / size, and the lowest goes first, raising the
+    inflation to its priority so long-idle entries eventually age out. An
+    analytics entry that took 50 ms to compute thus outlives a handful of
+    single-paper lookups of the same total size that took 1 ms each.
+    Expirations and evictions are reported to app.metrics.
+    """
+    ENTRY_OVERHEAD = 256  # key, entry tuple and dict slots
+    MIN_COST = 0.001  # seconds assumed for entries stored without a measured cost
+
+    def __init__(self, max_bytes: int, ttl: float, namespace: str):
+        super().__init__(maxsize=max_bytes, ttl=ttl, getsizeof=self._weight)
+        self.namespace = namespace
+        # Keys in TTLCache's expiry order, which is insertion order for a fixed TTL
+        self._expiries: "OrderedDict[str, float]" = OrderedDict()
+        self._inflation = 0.0
+        self._hits: Dict[str, int] = {}
+        self._priorities: Dict[str, float] = {}
+        # (priority, key); entries whose priority has since changed are skipped
+        self._heap: List[Tuple[float, str]] = []
+        self._pop_reason = "capacity"
+
+    @classmethod
+    def _weight(cls, entry: "_Entry") -> int:
+        return cls.ENTRY_OVERHEAD + _value_size(entry.value)
+
+    def _prioritize(self, key: str) -> None:
+        entry = Cache.__getitem__(self, key)
+        priority = self._inflation + self._hits[key] * max(entry.cost, self.MIN_COST) / self.getsizeof(entry)
+        self._priorities[key] = priority
+        heapq.heappush(self._heap, (priority, key))
+        if len(self._heap) > 2 * len(self._priorities) + 64:
+            self._heap = [(priority, key) for key, priority in self._priorities.items()]
+            heapq.heapify(self._heap)
+
+    def touch(self, key: str) -> None:
+        """Count a hit on key, raising its priority"""
+        if key in self._priorities:
+            self._hits[key] += 1
+            self._prioritize(key)
+
+    def __setitem__(self, key, value) -> None:
+        # The timer is frozen inside the block, so the expiry matches TTLCache's own
+        with self.timer as time:
+            super().__setitem__(key, value)
+        self._expiries[key] = time + self.ttl
+        self._expiries.move_to_end(key)
+        self._hits[key] = 1
+        self._prioritize(key)
+
+    def __delitem__(self, key) -> None:
+        super().__delitem__(key)
+        self._forget(key)
+
+    def _forget(self, key) -> None:
+        self._expiries.pop(key, None)
+        self._hits.pop(key, None)
+        self._priorities.pop(key, None)
+
+    def expire(self, time=None):
+        if time is None:
+            time = self.timer()
+        super().expire(time)
+        while self._expiries:
+            key, expires = next(iter(self._expiries.items()))
+            if time < expires:
+                break
+            self._forget(key)
+            record_eviction(self.namespace, key, "l1", "expired")
+
+    def popitem(self):
+        self.expire()
+        while self._heap:
+            priority, key = heapq.heappop(self._heap)
+            if self._priorities.get(key) != priority:
+                continue
+            if not Cache.__contains__(self, key):
+                self._forget(key)
+                continue
+            self._inflation = priority
+            value = self.pop(key)
+            record_eviction(self.namespace, key, "l1", self._pop_reason)
+            return key, value
+        raise KeyError(f"{type(self).__name__} is empty")
+
+    def clear(self) -> None:
+        self._pop_reason = "invalidated"
+        try:
+            super().clear()
+        finally:
+            self._pop_reason = "capacity"
+
+_refresh_executor: Optional[ThreadPoolExecutor] = None
+_refresh_executor_lock = threading.Lock()
+
+def _get_refresh_executor() -> ThreadPoolExecutor:
+    global _refresh_executor
+    with _refresh_executor_lock:
+        if _refresh_executor is None:
+            _refresh_executor = ThreadPoolExecutor(
+                max_workers=settings.cache_refresh_workers, thread_name_prefix="cache-refresh"
+            )
+        return _refresh_executor
+
+class TieredCache(MutableMapping):
+    """In-process L1 cache in front of a shared L2 backend.
+
+    Reads try the worker's own L1 first and fall back to the backend, keeping
+    what they find in L1; writes go to both. Values cross processes pickled,
+    so an entry computed by one worker is served by all of them and outlives
+    a restart. Both levels only hold entries of the current data generation.
+
+    Entries carry tags naming the data they depend on (see app.cache_tags);
+    writes through a tagged() view set them, other writes are tagged global.
+    When the data changes, invalidate_cache_tags() drops the entries sharing
+    a tag with the change and carries the rest over to the new generation;
+    other workers replay the recorded tags on their next access. A
+    generation change without a record (e.g. a rebuilt database) drops L1.
+
+    Mapping access only sees fresh entries. get_or_compute() additionally
+    coalesces concurrent misses of a key into one computation and, with a
+    stale_ttl, keeps serving an expired entry for that long while a
+    background thread recomputes it.
+
+    A value is only stored for the data generation its computation started
+    in: the generation is read when the miss starts (the mapping-style miss
+    in this thread, or the start of a get_or_compute() computation), and a
+    write committed in between makes set() drop the value rather than file
+    pre-write results under the post-write generation.
+
+    Lookups, evictions and compute time are counted in app.metrics by key
+    family. Entries written after a mapping-style miss are charged the time
+    since that miss in the same thread; hits are credited with it as saved.
+    """
+
+    def __init__(
+        self,
+        namespace: str,
+        max_bytes: int,
+        ttl: int,
+        backend: Optional[CacheBackend],
+        stale_ttl: int = 0,
+    ):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.backend = backend
+        # Entries stay in L1 through their stale window
+        self.local = _BudgetedTTLCache(max_bytes, ttl + stale_ttl, namespace)
+        self._lock = threading.RLock()
+        self._generation: Optional[int] = None
+        self._flights: Dict[str, Future] = {}
+        self._misses = threading.local()
+        registry.add_collector(self._gauges)
+
+    def _gauges(self):
+        labels = {"cache": self.namespace}
+        with self._lock:
+            yield "ppc_cache_entries", labels, len(self.local)
+            yield "ppc_cache_bytes", labels, self.local.currsize
+        yield "ppc_cache_budget_bytes", labels, self.local.maxsize
+
+    def _record_lookup(self, key: str, result: str, entry: Optional[_Entry] = None) -> None:
+        family = key_family(key)
+        registry.inc("ppc_cache_requests_total", cache=self.namespace, family=family, result=result)
+        if entry is not None:
+            with self._lock:
+                self.local.touch(key)
+            if entry.cost:
+                registry.inc("ppc_cache_saved_seconds_total", entry.cost, cache=self.namespace, family=family)
+
+    def _store_local(self, key: str, entry: _Entry) -> None:
+        with self._lock:
+            try:
+                self.local[key] = entry
+            except ValueError:
+                # Larger than the whole budget: served from L2 only
+                self.local.pop(key, None)
+                record_eviction(self.namespace, key, "l1", "oversize")
+
+    def _start_miss(self, key: str, generation: Optional[int]) -> None:
+        misses = getattr(self._misses, "started", None)
+        if misses is None or len(misses) > 256:
+            # Misses that never led to a write (errors) are forgotten here
+            misses = self._misses.started = {}
+        misses[key] = (time.perf_counter(), generation)
+
+    def _end_miss(self, key: str) -> Tuple[float, Any]:
+        """Seconds since this thread's miss of key and the generation it saw (_MISSING without a miss)"""
+        misses = getattr(self._misses, "started", None)
+        started = misses.pop(key, None) if misses else None
+        if started is None:
+            return 0.0, _MISSING
+        return time.perf_counter() - started[0], started[1]
+
+    def _current_generation(self) -> Optional[int]:
+        try:
+            generation = current_data_version().generation
+        except Exception:
+            generation = None
+        if generation != self._generation:
+            with self._lock:
+                if generation != self._generation:
+                    tags = None
+                    if None not in (self._generation, generation) and self.backend is not None:
+                        tags = self.backend.invalidated_tags(self._generation, generation)
+                    if tags is None:
+                        self.local.clear()
+                    else:
+                        self._drop_local(tags)
+                    self._generation = generation
+        return generation
+
+    def _drop_local(self, tags: Set[str]) -> None:
+        for key, entry in list(self.local.items()):
+            if tags.intersection(entry.tags):
+                self.local.pop(key, None)
+                record_eviction(self.namespace, key, "l1", "invalidated")
+
+    def apply_invalidation(self, tags: Set[str], from_generation: Optional[int], to_generation: Optional[int]) -> None:
+        """Drop L1 entries sharing a tag with a write this worker just committed"""
+        with self._lock:
+            if self._generation in (from_generation, None):
+                self._drop_local(tags)
+            else:
+                self.local.clear()
+            self._generation = to_generation
+
+    def tagged(self, tags: Iterable[str]) -> "TaggedCache":
+        """View of this cache whose writes carry the given tags"""
+        return TaggedCache(self, tuple(tags))
+
+    def _lookup(self, key: str) -> Tuple[Optional[_Entry], str, Optional[int]]:
+        """Entry for key from L1 or L2, fresh or stale, the level it came from and the current generation"""
+        generation = self._current_generation()
+        with self._lock:
+            entry = self.local.get(key)
+        if entry is not None or self.backend is None:
+            return entry, "l1", generation
+        data = self.backend.get(self.namespace, key, generation)
+        if data is None:
+            return None, "l2", generation
+        try:
+            entry = pickle.loads(data)
+            if not isinstance(entry, _Entry):
+                raise TypeError(f"expected a cache entry, got {type(entry).__name__}")
+        except Exception as e:
+            logger.warning(f"Dropping unreadable shared cache entry {key}: {e}")
+            self.backend.delete(self.namespace, key)
+            return None, "l2", generation
+        with self._lock:
+            # An invalidation since the read above may cover this entry
+            if self._generation == generation:
+                self._store_local(key, entry)
+        return entry, "l2", generation
+
+    def _fresh(self, key: str) -> Any:
+        entry, _, _ = self._lookup(key)
+        if entry is None or entry.fresh_until <= time.time():
+            return _MISSING
+        return entry.value
+
+    def __contains__(self, key: object) -> bool:
+        entry, level, generation = self._lookup(key)
+        if entry is None or entry.fresh_until <= time.time():
+            self._record_lookup(key, "miss")
+            self._start_miss(key, generation)
+            return False
+        self._record_lookup(key, f"{level}_hit", entry)
+        return True
+
+    def __getitem__(self, key: str) -> Any:
+        value = self._fresh(key)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.set(key, value)
+
+    def set(
+        self,
+        key: str,
+        value: Any,
+        tags: Sequence[str] = _DEFAULT_TAGS,
+        cost: Optional[float] = None,
+        generation: Any = _MISSING,
+    ) -> None:
+        """Store value under key, computed from the data of the given generation.
+
+        cost and generation default to the time since this thread's miss of
+        key and the generation that miss saw. The value is dropped when the
+        data has moved to another generation since then.
+        """
+        miss_cost, miss_generation = self._end_miss(key)
+        if cost is None:
+            cost = miss_cost
+        if generation is _MISSING:
+            generation = miss_generation
+        registry.inc("ppc_cache_compute_seconds_total", cost, cache=self.namespace, family=key_family(key))
+        entry = _Entry(value, time.time() + self.ttl, tuple(tags), cost)
+        with self._lock:
+            # Checked and stored under the lock apply_invalidation() takes, so
+            # an invalidation either sees this entry or has already moved the
+            # generation on
+            current = self._current_generation()
+            if generation is not _MISSING and generation != current:
+                logger.debug(f"Not caching {key}: the data changed while it was computed")
+                return
+            generation = current
+            self._store_local(key, entry)
+        if self.backend is not None:
+            self.backend.set(
+                self.namespace, key, pickle.dumps(entry, pickle.HIGHEST_PROTOCOL),
+                self.ttl + self.stale_ttl, generation, entry.tags
+            )
+
+    def __delitem__(self, key: str) -> None:
+        with self._lock:
+            found = self.local.pop(key, None) is not None
+        if self.backend is not None:
+            found = self.backend.delete(self.namespace, key) or found
+        if not found:
+            raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self.local))
+
+    def __len__(self) -> int:
+        return len(self.local)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.local.clear()
+        if self.backend is not None:
+            self.backend.clear(self.namespace)
+
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[sqlite3.Connection], Any],
+        conn: sqlite3.Connection,
+        tags: Sequence[str] = _DEFAULT_TAGS,
+    ) -> Any:
+        """Cached value for key, computing it with compute(conn) on a miss.
+
+        Concurrent misses of one key in this worker wait for a single
+        computation (up to settings.cache_single_flight_timeout, after which
+        they compute on their own) and share its result or exception. Within
+        the stale window an expired value is returned immediately and
+        compute runs again in the background, on a connection of its own.
+        """
+        entry, level, _ = self._lookup(key)
+        if entry is not None:
+            if entry.fresh_until > time.time():
+                self._record_lookup(key, f"{level}_hit", entry)
+                return entry.value
+            if self.stale_ttl:
+                self._record_lookup(key, "stale_hit", entry)
+                flight, leader = self._join_flight(key)
+                if leader:
+                    _get_refresh_executor().submit(self._refresh, key, compute, flight, tags)
+                return entry.value
+
+        self._record_lookup(key, "miss")
+        flight, leader = self._join_flight(key)
+        if not leader:
+            try:
+                return flight.result(timeout=settings.cache_single_flight_timeout)
+            except FutureTimeoutError:
+                return compute(conn)
+        return self._complete_flight(key, flight, lambda: compute(conn), tags)
+
+    def refresh(
+        self,
+        key: str,
+        compute: Callable[[sqlite3.Connection], Any],
+        conn: sqlite3.Connection,
+        tags: Sequence[str] = _DEFAULT_TAGS,
+    ) -> Any:
+        """Recompute key with compute(conn) and store it, joining a computation already in progress"""
+        flight, leader = self._join_flight(key)
+        if not leader:
+            return flight.result(timeout=settings.cache_single_flight_timeout)
+        return self._complete_flight(key, flight, lambda: compute(conn), tags)
+
+    def _join_flight(self, key: str) -> Tuple[Future, bool]:
+        """The in-progress computation of key, and whether the caller has to run it"""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None:
+                return flight, False
+            flight = self._flights[key] = Future()
+            return flight, True
+
+    def _complete_flight(self, key: str, flight: Future, run: Callable[[], Any], tags: Sequence[str]) -> Any:
+        try:
+            generation = self._current_generation()
+            started = time.perf_counter()
+            value = run()
+            self.set(key, value, tags, time.perf_counter() - started, generation)
+            flight.set_result(value)
+            return value
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+
+    def _refresh(
+        self, key: str, compute: Callable[[sqlite3.Connection], Any], flight: Future, tags: Sequence[str]
+    ) -> None:
+        def run():
+            with db_manager.connection_context() as conn:
+                return compute(conn)
+        try:
+            self._complete_flight(key, flight, run, tags)
+        except Exception as e:
+            # The stale value keeps being served; the next request retries
+            logger.warning(f"Background refresh of {key} failed: {e}")
+
+class TaggedCache:
+    """View of a TieredCache that tags the entries written through it"""
+
+    def __init__(self, cache: TieredCache, tags: Tuple[str, ...]):
+        self.cache = cache
+        self.tags = tags
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.cache
+
+    def __getitem__(self, key: str) -> Any:
+        return self.cache[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.cache.set(key, value, self.tags)
+
+    def __delitem__(self, key: str) -> None:
+        del self.cache[key]
+
+    def tagged(self, tags: Iterable[str]) -> "TaggedCache":
+        return TaggedCache(self.cache, tuple(tags))
+
+    def get_or_compute(self, key: str, compute: Callable[[sqlite3.Connection], Any], conn: sqlite3.Connection) -> Any:
+        return self.cache.get_or_compute(key, compute, conn, self.tags)
+
+    def refresh(self, key: str, compute: Callable[[sqlite3.Connection], Any], conn: sqlite3.Connection) -> Any:
+        return self.cache.refresh(key, compute, conn, self.tags)
+
+# Shared by both caches below; None when running with in-process caches only
+cache_backend = create_cache_backend()
 
 # Initialize a global cache instance for general data
 # TTLCache evicts items after a certain time-to-live (ttl) has passed.
-cache = TTLCache(maxsize=1024, ttl=settings.cache_ttl)
+cache = TieredCache("general", settings.cache_max_bytes, settings.cache_ttl, cache_backend)
 
-# Initialize a separate cache instance for analytics data with longer TTL
-analytics_cache = TTLCache(maxsize=512, ttl=settings.analytics_cache_ttl)
+# Initialize a separate cache instance for analytics data with longer TTL;
+# its entries are served stale while they are being recomputed
+analytics_cache = TieredCache(
+    "analytics", settings.analytics_cache_max_bytes, settings.analytics_cache_ttl, cache_backend,
+    stale_ttl=settings.analytics_stale_ttl
+)
 
 def get_cache():
     """Dependency to get the general cache instance."""
     return cache
 
+def invalidate_cache_tags(tags: Set[str], from_generation: Optional[int], to_generation: Optional[int]) -> None:
+    """Drop cached entries depending on any of tags, after a committed write moved the data between generations"""
+    if cache_backend is not None:
+        cache_backend.invalidate(tags, from_generation, to_generation)
+    for tiered in (cache, analytics_cache):
+        tiered.apply_invalidation(tags, from_generation, to_generation)
+
+def cached_tags_with_prefix(prefix: str) -> Set[str]:
+    """Tags starting with prefix on any entry cached by this or, through the backend, another worker"""
+    tags = cache_backend.tags_with_prefix(prefix) if cache_backend is not None else set()
+    for tiered in (cache, analytics_cache):
+        with tiered._lock:
+            entries = list(tiered.local.values())
+        tags.update(tag for entry in entries for tag in entry.tags if tag.startswith(prefix))
+    return tags
+
 def get_analytics_cache():
     """Dependency to get the analytics cache instance."""
     return analytics_cache
+
+def encode_json(content: Any) -> bytes:
+    """Encode content to the compact JSON body FastAPI would have rendered"""
+    if orjson is not None:
+        return orjson.dumps(content, default=jsonable_encoder, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+def _accepted_encodings(scope: Scope) -> List[str]:
+    """Content codings the client accepts, from its Accept-Encoding header"""
+    accepted = []
+    for name, value in scope.get("headers", []):
+        if name != b"accept-encoding":
+            continue
+        for item in value.decode("latin-1").split(","):
+            coding, *params = item.split(";")
+            quality = 1.0
+            for param in params:
+                key, _, number = param.strip().partition("=")
+                if key == "q":
+                    try:
+                        quality = float(number)
+                    except ValueError:
+                        quality = 0.0
+            if quality > 0:
+                accepted.append(coding.strip().lower())
+    return accepted
+
+class EncodedJSONResponse(Response):
+    """JSON response encoded once and replayed byte-for-byte on every cache hit.
+
+    The body is rendered when the response is built, together with gzip (and,
+    when the brotli package is installed, br) variants for bodies of at least
+    settings.response_compression_min_size bytes. Sending only picks the
+    variant the client accepts, so a cached instance can be returned from any
+    number of requests without validation, serialization or compression.
+    """
+    media_type = "application/json"
+
+    def __init__(
+        self,
+        content: Any = None,
+        status_code: int = 200,
+        *,
+        body: Optional[bytes] = None,
+        compress: bool = True,
+    ):
+        super().__init__(content=encode_json(content) if body is None else body, status_code=status_code)
+        self.variants: Dict[str, bytes] = {}
+        if compress and len(self.body) >= settings.response_compression_min_size:
+            if brotli is not None:
+                self._add_variant("br", brotli.compress(self.body, quality=settings.brotli_quality))
+            self._add_variant("gzip", gzip.compress(self.body, compresslevel=settings.gzip_level))
+
+    def _add_variant(self, coding: str, data: bytes) -> None:
+        if len(data) < len(self.body):
+            self.variants[coding] = data
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        body, coding = self.body, None
+        if self.variants:
+            accepted = _accepted_encodings(scope)
+            for candidate in self.variants:  # br first when available
+                if candidate in accepted:
+                    body, coding = self.variants[candidate], candidate
+                    break
+
+        # Headers are built per send so the shared instance is never mutated
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+        ]
+        if self.variants:
+            headers.append((b"vary", b"Accept-Encoding"))
+        if coding is not None:
+            headers.append((b"content-encoding", coding.encode("latin-1")))
+
+        await send({"type": "http.response.start", "status": self.status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,113 @@
+import logging
+import sqlite3
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+
+from app.author_index import PAPER_AUTHORS_TABLE, has_author_index
+from app.cache import GLOBAL_TAG, cached_tags_with_prefix
+from app.filters import CATEGORICAL_COLUMNS, get_categorical_dictionary
+from app.paper_details import has_paper_details, paper_column_sql
+from app.search import FTS_TABLE, build_match_query, has_fts_index
+
+logger = logging.getLogger(__name__)
+
+# Cached entries are tagged with the data they were computed from, so a write
+# drops only the entries sharing a tag with the papers it touched:
+#   global                    anything not narrowed down further (the default)
+#   paper:<PPC_Id>            a single paper
+#   <column>:<value>          papers with that categorical value or sub_year
+#   author:<normalized name>  papers listing that author
+#   query:<text>              full-text search results for that query
+QUERY_TAG_PREFIX = "query:"
+
+def paper_tag(ppc_id: str) -> str:
+    return f"paper:{ppc_id}"
+
+def author_tag(author_norm: str) -> str:
+    return f"author:{author_norm}"
+
+def query_tag(query: str) -> str:
+    return f"{QUERY_TAG_PREFIX}{query}"
+
+def value_tags(column: str, values: Iterable) -> Tuple[str, ...]:
+    return tuple(f"{column}:{value}" for value in values)
+
+def categorical_tags(conn: sqlite3.Connection, column: str, text) -> Optional[Tuple[str, ...]]:
+    """Tags of a ``column LIKE '%text%'`` filter, or None when text does not filter"""
+    if not text:
+        return None
+    return value_tags(column, get_categorical_dictionary(conn).resolve(column, str(text)))
+
+def year_tags(year_from: Optional[int], year_to: Optional[int]) -> Optional[Tuple[str, ...]]:
+    """Tags of a closed sub_year range, or None when either bound is open"""
+    if year_from is None or year_to is None:
+        return None
+    return value_tags("sub_year", range(year_from, year_to + 1))
+
+def narrowest_tags(*candidates: Optional[Sequence[str]]) -> Tuple[str, ...]:
+    """Smallest tag set among the filters a result depends on.
+
+    A result filtered on several dimensions only contains papers matching
+    all of them, so tagging it with any one dimension is enough; the one
+    with the fewest values is the least likely to be hit by a write.
+    """
+    tag_sets = [tuple(tags) for tags in candidates if tags is not None]
+    if not tag_sets:
+        return (GLOBAL_TAG,)
+    return min(tag_sets, key=len)
+
+def _query_matches_paper(conn: sqlite3.Connection, query: str, rowid: int, fts: bool) -> bool:
+    if fts:
+        match_query = build_match_query(query)
+        if match_query is None:
+            return False
+        row = conn.execute(
+            f"SELECT 1 FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ? AND rowid = ?", (match_query, rowid)
+        ).fetchone()
+    else:
+        authors = paper_column_sql("all_authors", has_paper_details(conn))
+        pattern = f"%{query}%"
+        row = conn.execute(
+            f"""SELECT 1 FROM papers WHERE rowid = ?
+                AND (preprint_title LIKE ? OR preprint_doi LIKE ? OR {authors} LIKE ?)""",
+            (rowid, pattern, pattern, pattern)
+        ).fetchone()
+    return row is not None
+
+def paper_change_tags(conn: sqlite3.Connection, ppc_id: str) -> Set[str]:
+    """Tags of every cached result a change to the paper can affect.
+
+    Read before the change is made, while the paper's row still holds the
+    values it is filed under. Cached searches are matched against the paper
+    one by one, so only the queries that find it are invalidated.
+    """
+    tags = {GLOBAL_TAG, paper_tag(ppc_id)}
+    columns = ", ".join(CATEGORICAL_COLUMNS)
+    row = conn.execute(f"SELECT rowid, sub_year, {columns} FROM papers WHERE PPC_Id = ?", (ppc_id,)).fetchone()
+    if row is None:
+        return tags
+
+    rowid, sub_year = row[0], row[1]
+    for column, value in zip(CATEGORICAL_COLUMNS, row[2:]):
+        if value is not None:
+            tags.add(f"{column}:{value}")
+    if sub_year is not None:
+        tags.add(f"sub_year:{sub_year}")
+
+    if has_author_index(conn):
+        authors: List[str] = [
+            r[0] for r in conn.execute(
+                f"SELECT DISTINCT author_norm FROM {PAPER_AUTHORS_TABLE} WHERE PPC_Id = ?", (ppc_id,)
+            )
+        ]
+        tags.update(author_tag(norm) for norm in authors)
+
+    fts = has_fts_index(conn)
+    for tag in cached_tags_with_prefix(QUERY_TAG_PREFIX):
+        try:
+            if _query_matches_paper(conn, tag[len(QUERY_TAG_PREFIX):], rowid, fts):
+                tags.add(tag)
+        except sqlite3.Error as e:
+            # Cannot tell whether the search finds the paper: drop it to be safe
+            logger.warning(f"Could not match cached search against {ppc_id}: {e}")
+            tags.add(tag)
+    return tags
@@ -0,0 +1,290 @@
+import logging
+import sqlite3
+import string
+import threading
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.data_version import current_data_version
+from app.filters import get_categorical_dictionary, like_contains_pattern
+from app.paper_details import has_paper_details
+from app.rollup import dimension_sql
+
+logger = logging.getLogger(__name__)
+
+# Endpoints that can answer from the in-memory columns instead of SQL; each
+# is switched on by listing its name in settings.columnar_endpoints
+COLUMNAR_ENDPOINTS = (
+    "publication-timeline", "submission-type-analytics", "version-analytics",
+    "license-analytics", "publication-status", "subject-analysis",
+)
+
+# Columns held as dictionary codes (-1 is NULL) and as float64 arrays (NaN is NULL)
+CATEGORICAL_COLUMNS = ("preprint_subject", "preprint_server", "country_name", "submission_license", "submission_type")
+NUMERIC_COLUMNS = ("sub_year", "sub_month", "sub_ym", "total_citation", "no_of_days_for_publish", "version_count")
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+def columnar_enabled(endpoint: str) -> bool:
+    """Whether settings.columnar_endpoints routes the endpoint to the columnar engine"""
+    return endpoint in settings.columnar_endpoints
+
+def sql_round(value: Optional[float], digits: int) -> Optional[float]:
+    """SQLite's ROUND(): half away from zero on the shortest decimal form of the value"""
+    if value is None:
+        return None
+    quantum = Decimal(1).scaleb(-digits)
+    return float(Decimal(repr(float(value))).quantize(quantum, rounding=ROUND_HALF_UP))
+
+def group_rows(fields: Dict[str, List], order: Iterable[int]) -> List[Dict[str, Any]]:
+    """Result rows of per-group field values, in the given group order"""
+    return [{name: values[i] for name, values in fields.items()} for i in order]
+
+def year_labels(years: List[Optional[int]]) -> List[Optional[str]]:
+    """YEAR_LABEL of each sub_year"""
+    return [None if year is None else str(year) for year in years]
+
+def month_labels(months: List[Optional[int]]) -> List[str]:
+    """MONTH_LABEL of each sub_ym (printf renders NULL parts as 0)"""
+    return [f"{(month or 0) // 100:04d}-{(month or 0) % 100:02d}" for month in months]
+
+def _sort_key(value):
+    # SQLite orders NULL before every value
+    return (0, 0) if value is None else (1, value)
+
+def sql_order(count: int, *keys: Tuple[Sequence, bool]) -> List[int]:
+    """Positions 0..count-1 in ORDER BY order for (values, descending) keys"""
+    order = list(range(count))
+    for values, descending in reversed(keys):
+        order.sort(key=lambda i: _sort_key(values[i]), reverse=descending)
+    return order
+
+class ColumnarPapers:
+    """Filter and group-by columns of papers held in memory as NumPy arrays.
+
+    Categorical columns are dictionary encoded: one int32 code per paper
+    indexing the sorted distinct values. Filters are evaluated as boolean
+    masks and group-bys with np.unique and np.bincount, so any filter
+    combination costs a few passes over contiguous arrays.
+    """
+
+    def __init__(self, conn: sqlite3.Connection, version: Optional[int] = None):
+        self.version = version
+        version_count = dimension_sql("version_count", split=has_paper_details(conn))
+        numeric = [f"{version_count} AS version_count" if c == "version_count" else c for c in NUMERIC_COLUMNS]
+        rows = conn.execute(f"""
+            SELECT {", ".join(CATEGORICAL_COLUMNS)}, {", ".join(numeric)},
+                   preprint_submission_date IS NOT NULL,
+                   published_DOI IS NOT NULL AND published_DOI != ''
+            FROM papers
+        """).fetchall()
+        columns = list(zip(*rows)) if rows else [()] * (len(CATEGORICAL_COLUMNS) + len(NUMERIC_COLUMNS) + 2)
+        self.size = len(rows)
+
+        self.values: Dict[str, List[str]] = {}
+        self.codes: Dict[str, np.ndarray] = {}
+        for column, data in zip(CATEGORICAL_COLUMNS, columns):
+            values = sorted({value for value in data if value is not None})
+            lookup = {value: code for code, value in enumerate(values)}
+            self.values[column] = values
+            self.codes[column] = np.fromiter(
+                (-1 if value is None else lookup[value] for value in data), dtype=np.int32, count=self.size
+            )
+
+        self.numeric: Dict[str, np.ndarray] = {}
+        # Columns holding REAL values are reported as floats, like SQLite does
+        self.real: Dict[str, bool] = {}
+        for column, data in zip(NUMERIC_COLUMNS, columns[len(CATEGORICAL_COLUMNS):]):
+            self.numeric[column] = np.array([np.nan if value is None else value for value in data], dtype=np.float64)
+            self.real[column] = any(isinstance(value, float) for value in data)
+
+        # Same publication delay buckets as the rollups
+        days = self.numeric["no_of_days_for_publish"]
+        self.numeric["days_bucket"] = np.select(
+            [np.isnan(days), days <= 0, days <= 30, days <= 90, days <= 180, days <= 365],
+            [np.nan, 0, 1, 2, 3, 4], 5
+        )
+        self.real["days_bucket"] = False
+
+        dated, published = columns[-2:]
+        self.dated = np.array(dated, dtype=bool)
+        self.published = np.array(published, dtype=bool)
+        logger.info(f"Columnar papers loaded: {self.size} rows")
+
+    # -- filters -------------------------------------------------------------
+
+    def all(self) -> np.ndarray:
+        return np.ones(self.size, dtype=bool)
+
+    def in_values(self, column: str, values: Iterable[str]) -> np.ndarray:
+        """Mask of ``column IN (values)``"""
+        lookup = {value: code for code, value in enumerate(self.values[column])}
+        codes = [lookup[value] for value in values if value in lookup]
+        return np.isin(self.codes[column], codes)
+
+    def contains(self, conn: sqlite3.Connection, column: str, text: Any) -> np.ndarray:
+        """Mask of the categorical filter ``column LIKE '%text%'``"""
+        return self.in_values(column, get_categorical_dictionary(conn).resolve(column, str(text)))
+
+    def like_any(self, column: str, texts: Sequence[str]) -> np.ndarray:
+        """Mask of ``column LIKE '%text%' OR ...`` over the distinct values of a column"""
+        patterns = [like_contains_pattern(text) for text in texts]
+        matching = [
+            value for value in self.values[column]
+            if any(pattern.fullmatch(value.translate(_ASCII_LOWER)) for pattern in patterns)
+        ]
+        return self.in_values(column, matching)
+
+    def not_empty(self, column: str) -> np.ndarray:
+        """Mask of ``column IS NOT NULL AND column != ''``"""
+        codes = self.codes[column]
+        mask = codes >= 0
+        if "" in self.values[column]:
+            mask &= codes != self.values[column].index("")
+        return mask
+
+    def column(self, column: str) -> np.ndarray:
+        """Values of a numeric column; comparisons with its NaNs are False, as with NULL"""
+        return self.numeric[column]
+
+    def not_null(self, column: str) -> np.ndarray:
+        return ~np.isnan(self.numeric[column])
+
+    # -- group-bys -----------------------------------------------------------
+
+    def group_by(self, mask: np.ndarray, *columns: str) -> "ColumnarGroups":
+        return ColumnarGroups(self, mask, columns)
+
+class ColumnarGroups:
+    """Aggregates of the masked rows of ColumnarPapers per distinct key.
+
+    With no columns, the masked rows form one group even when empty, like a
+    SQL aggregate without GROUP BY.
+    """
+
+    def __init__(self, papers: ColumnarPapers, mask: np.ndarray, columns: Sequence[str]):
+        self.papers = papers
+        self.rows = np.flatnonzero(mask)
+        self._keys: Dict[str, List] = {}
+        if not columns:
+            self.size = 1
+            self.inverse = np.zeros(len(self.rows), dtype=np.int64)
+            return
+
+        # Factorize each key column, then combine the factors into one integer key
+        combined = np.zeros(len(self.rows), dtype=np.int64)
+        factors = []
+        for column in columns:
+            if column in papers.codes:
+                codes = papers.codes[column][self.rows].astype(np.int64) + 1
+                uniques = np.arange(len(papers.values[column]) + 1)
+            else:
+                data = papers.numeric[column][self.rows]
+                # NULLs become -inf, which sorts before every value
+                uniques, codes = np.unique(np.where(np.isnan(data), -np.inf, data), return_inverse=True)
+            factors.append((column, uniques))
+            combined = combined * len(uniques) + codes
+        keys, self.inverse = np.unique(combined, return_inverse=True)
+        self.inverse = self.inverse.reshape(-1)
+        self.size = len(keys)
+
+        for column, uniques in reversed(factors):
+            positions = keys % len(uniques)
+            keys = keys // len(uniques)
+            if column in papers.codes:
+                values = papers.values[column]
+                self._keys[column] = [None if code == 0 else values[code - 1] for code in uniques[positions]]
+            else:
+                self._keys[column] = [None if np.isinf(value) else int(value) for value in uniques[positions]]
+
+    def key(self, column: str) -> List:
+        """Value of a group column for every group (NULL is None)"""
+        return self._keys[column]
+
+    def _column(self, column: str) -> np.ndarray:
+        return self.papers.numeric[column][self.rows]
+
+    def _number(self, column: str, value: float):
+        return float(value) if self.papers.real[column] else int(value)
+
+    def count(self) -> List[int]:
+        """COUNT(*)"""
+        return [int(n) for n in np.bincount(self.inverse, minlength=self.size)]
+
+    def count_if(self, mask: np.ndarray) -> List[int]:
+        """SUM(CASE WHEN condition THEN 1 ELSE 0 END) over non-empty groups"""
+        return [int(n) for n in np.bincount(self.inverse, weights=mask[self.rows].astype(np.float64), minlength=self.size)]
+
+    def _sums(self, column: str) -> Tuple[np.ndarray, np.ndarray]:
+        data = self._column(column)
+        present = ~np.isnan(data)
+        counts = np.bincount(self.inverse, weights=present, minlength=self.size)
+        sums = np.bincount(self.inverse, weights=np.where(present, data, 0.0), minlength=self.size)
+        return counts, sums
+
+    def count_of(self, column: str) -> List[int]:
+        """COUNT(column)"""
+        counts, _ = self._sums(column)
+        return [int(n) for n in counts]
+
+    def sum(self, column: str) -> List:
+        """SUM(column)"""
+        counts, sums = self._sums(column)
+        return [self._number(column, total) if n else None for n, total in zip(counts, sums)]
+
+    def avg(self, column: str, digits: int) -> List[Optional[float]]:
+        """ROUND(AVG(column), digits)"""
+        counts, sums = self._sums(column)
+        return [sql_round(total / n, digits) if n else None for n, total in zip(counts, sums)]
+
+    def _extreme(self, column: str, reduce) -> List:
+        data = self._column(column)
+        order = np.argsort(self.inverse, kind="stable")
+        starts = np.searchsorted(self.inverse[order], np.arange(self.size))
+        if len(order) == 0:
+            return [None] * self.size
+        values = reduce.reduceat(data[order], np.minimum(starts, len(order) - 1))
+        counts = np.bincount(self.inverse, minlength=self.size)
+        return [
+            None if n == 0 or np.isnan(value) else self._number(column, value)
+            for n, value in zip(counts, values)
+        ]
+
+    def min(self, column: str) -> List:
+        """MIN(column)"""
+        return self._extreme(column, np.fmin)
+
+    def max(self, column: str) -> List:
+        """MAX(column)"""
+        return self._extreme(column, np.fmax)
+
+_papers: Optional[ColumnarPapers] = None
+_papers_lock = threading.Lock()
+
+def _data_version() -> Optional[int]:
+    try:
+        return current_data_version().generation
+    except Exception:
+        return None
+
+def load_columnar_papers(conn: sqlite3.Connection) -> ColumnarPapers:
+    """Read the analytics columns of papers into memory"""
+    global _papers
+    unknown = set(settings.columnar_endpoints) - set(COLUMNAR_ENDPOINTS)
+    if unknown:
+        logger.warning(f"Unknown columnar endpoints ignored: {', '.join(sorted(unknown))}")
+    _papers = ColumnarPapers(conn, _data_version())
+    return _papers
+
+def get_columnar_papers(conn: sqlite3.Connection) -> ColumnarPapers:
+    """Current columns, reloaded whenever the database contents have changed"""
+    papers = _papers
+    if papers is None or papers.version != _data_version():
+        with _papers_lock:
+            papers = _papers
+            if papers is None or papers.version != _data_version():
+                papers = load_columnar_papers(conn)
+    return papers
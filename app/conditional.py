@@ -0,0 +1,123 @@
+import logging
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.dependencies.models import Dependant
+from fastapi.dependencies.utils import get_flat_dependant, request_params_to_args
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders, QueryParams
+from starlette.responses import Response
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.data_version import DataVersion, current_data_version
+
+logger = logging.getLogger(__name__)
+
+# Path prefix of each endpoint family whose responses only change with the data
+# -> Settings attribute holding its Cache-Control max-age
+CONDITIONAL_FAMILIES = {
+    "/api/analytics/": "analytics_max_age",
+    "/api/subjects/": "subjects_max_age",
+    "/api/advanced-analytics/": "advanced_analytics_max_age",
+}
+
+def _family_max_age(path: str) -> Optional[int]:
+    for prefix, setting in CONDITIONAL_FAMILIES.items():
+        if path.startswith(prefix):
+            return getattr(settings, setting)
+    return None
+
+def _not_modified(headers: Headers, version: DataVersion) -> bool:
+    """Evaluate If-None-Match, or If-Modified-Since when no ETag was sent"""
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        # Weak comparison: W/"x" and "x" name the same version
+        current = version.etag[2:]
+        return "*" in tags or any(tag.removeprefix("W/") == current for tag in tags)
+
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have whole-second precision
+        return int(version.updated_at) <= since
+    return False
+
+class ConditionalGetMiddleware:
+    """ETag / Last-Modified validation for endpoints that only change with the data.
+
+    Validators come from the database data version, so a request carrying a
+    current If-None-Match (or If-Modified-Since) gets a 304 before any
+    dependency, cache lookup or SQL runs. Only requests a family route would
+    answer with 200 qualify: the path must match a GET route of the family
+    and its declared query and path parameters must validate, so unknown
+    paths still get their 404 and invalid parameters their 422. Successful
+    responses get the validators and the family's Cache-Control max-age.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        # GET routes of the families with their flattened parameters, read
+        # from the application's routes on the first request
+        self._routes: Optional[List[Tuple[APIRoute, Dependant]]] = None
+
+    def _family_routes(self, scope: Scope) -> List[Tuple[APIRoute, Dependant]]:
+        if self._routes is None:
+            self._routes = [
+                (route, get_flat_dependant(route.dependant, skip_repeats=True))
+                for route in scope["app"].routes
+                if isinstance(route, APIRoute) and "GET" in route.methods and _family_max_age(route.path) is not None
+            ]
+        return self._routes
+
+    def _routes_validly(self, scope: Scope) -> bool:
+        """Whether a family route matches the request and accepts its parameters"""
+        for route, dependant in self._family_routes(scope):
+            match, child_scope = route.matches(scope)
+            if match != Match.FULL:
+                continue
+            _, query_errors = request_params_to_args(dependant.query_params, QueryParams(scope["query_string"]))
+            _, path_errors = request_params_to_args(dependant.path_params, child_scope.get("path_params", {}))
+            return not query_errors and not path_errors
+        return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+        max_age = _family_max_age(scope["path"])
+        if max_age is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            # Reading the version may stat the database files and query it
+            version = await run_in_threadpool(current_data_version)
+        except Exception as e:
+            logger.warning(f"Data version unavailable, skipping conditional GET: {e}")
+            await self.app(scope, receive, send)
+            return
+
+        validators: Dict[str, str] = {
+            "ETag": version.etag,
+            "Last-Modified": version.last_modified,
+            "Cache-Control": f"public, max-age={max_age}",
+        }
+        if _not_modified(Headers(scope=scope), version) and self._routes_validly(scope):
+            await Response(status_code=304, headers=validators)(scope, receive, send)
+            return
+
+        async def send_with_validators(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] == 200:
+                headers = MutableHeaders(scope=message)
+                for name, value in validators.items():
+                    headers[name] = value
+            await send(message)
+
+        await self.app(scope, receive, send_with_validators)
@@ -1,5 +1,5 @@
 import os
-from typing import List
+from typing import Any, Dict, List
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -29,10 +29,65 @@ class Settings(BaseSettings):
     # Pagination
     default_page_size: int = 10
     max_page_size: int = 100
+    count_estimate_cap: int = 10000  # count_mode=estimate stops counting here
+    max_batch_size: int = 500  # PPC_Ids per POST /api/papers/batch
+    export_batch_size: int = 1000  # rows fetched and encoded per chunk of an export stream
+    
+    # Autocomplete
+    suggest_max_results: int = 50
     
     # Cache
     cache_ttl: int = 300
     analytics_cache_ttl: int = 3600  # 1 hour for analytics data
+    analytics_stale_ttl: int = 600  # expired analytics entries are served this long while they refresh
+    # Memory budget of each worker's L1 caches, weighed by encoded payload size
+    cache_max_bytes: int = 32 * 1024 * 1024
+    analytics_cache_max_bytes: int = 64 * 1024 * 1024
+    cache_single_flight_timeout: float = 30.0  # seconds a request waits for another's computation of its key
+    cache_refresh_workers: int = 2  # background threads recomputing stale entries
+    response_compression_min_size: int = 1024  # smaller cached bodies are stored uncompressed
+    gzip_level: int = 6
+    brotli_quality: int = 5
+    # Shared L2 behind the per-worker caches: "sqlite" (a WAL-mode file all
+    # workers read and write, kept across restarts) or "memory" (per-worker only)
+    cache_backend: str = "sqlite"
+    cache_path: str = "response_cache.db"
+    cache_busy_timeout: float = 1.0  # seconds to wait for another worker's write
+    
+    # Startup warmup: GET endpoints (path and query parameters) computed into
+    # the caches before the worker reports ready, then recomputed
+    # warmup_refresh_margin seconds before their cache TTL runs out
+    warmup_manifest: List[Dict[str, Any]] = [
+        {"path": "/api/analytics/dashboard"},
+        {"path": "/api/analytics/country-data"},
+        {"path": "/api/analytics/citations"},
+        {"path": "/api/subjects/analysis"},
+        {"path": "/api/papers/subjects"},
+        {"path": "/api/papers/servers"},
+        {"path": "/api/papers/countries"},
+        {"path": "/api/papers/licenses"},
+    ]
+    warmup_refresh_margin: int = 60
+    
+    # Metrics: GET /metrics in Prometheus text format. Each worker publishes its
+    # counters to a shared SQLite file (metrics_backend "sqlite") every
+    # metrics_publish_interval seconds so a scrape reports all workers;
+    # "memory" reports only the worker answering the scrape
+    metrics_backend: str = "sqlite"
+    metrics_path: str = "metrics.db"
+    metrics_publish_interval: float = 15.0
+    
+    # Columnar engine: endpoints listed here answer from NumPy arrays of the
+    # papers columns loaded at startup instead of SQL (publication-timeline,
+    # submission-type-analytics, version-analytics, license-analytics,
+    # publication-status, subject-analysis)
+    columnar_endpoints: List[str] = []
+    
+    # HTTP caching: Cache-Control max-age (seconds) per endpoint family;
+    # ETag / Last-Modified follow the database data version
+    analytics_max_age: int = 300
+    subjects_max_age: int = 300
+    advanced_analytics_max_age: int = 300
     
     class Config:
         env_file = ".env"
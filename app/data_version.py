@@ -0,0 +1,92 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from email.utils import formatdate
+from typing import NamedTuple, Optional, Tuple
+
+from app.database import db_manager
+
+logger = logging.getLogger(__name__)
+
+# Single-row table written by create_db.py and bumped by every write endpoint
+DATA_VERSION_TABLE = "data_version"
+
+class DataVersion(NamedTuple):
+    """Generation of the database contents and when it was last changed"""
+    generation: int
+    updated_at: float  # Unix time
+
+    @property
+    def etag(self) -> str:
+        # Weak, since each generation is served in several content codings
+        return f'W/"{self.generation}"'
+
+    @property
+    def last_modified(self) -> str:
+        return formatdate(self.updated_at, usegmt=True)
+
+def _file_signature() -> Tuple:
+    """Modification time and size of the database and its WAL; every commit changes one of them"""
+    signature = []
+    for path in (db_manager.db_path, f"{db_manager.db_path}-wal"):
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+def _read_data_version(signature: Tuple) -> DataVersion:
+    with db_manager.connection_context() as conn:
+        try:
+            row = conn.execute(f"SELECT generation, updated_at FROM {DATA_VERSION_TABLE}").fetchone()
+        except sqlite3.OperationalError:
+            row = None
+    if row is not None:
+        return DataVersion(int(row[0]), float(row[1]))
+    # Databases built without the table: fall back to the file timestamps
+    mtime_ns = max((entry[0] for entry in signature if entry), default=0)
+    return DataVersion(mtime_ns // 1000, mtime_ns / 1e9)
+
+_current: Optional[Tuple[Tuple, DataVersion]] = None
+_lock = threading.Lock()
+
+def current_data_version() -> DataVersion:
+    """Current data version, re-read from the database only after a commit touched its files"""
+    global _current
+    signature = _file_signature()
+    current = _current
+    if current is None or current[0] != signature:
+        with _lock:
+            current = _current
+            if current is None or current[0] != signature:
+                current = (signature, _read_data_version(signature))
+                _current = current
+    return current[1]
+
+def bump_data_version(conn: sqlite3.Connection) -> None:
+    """Advance the data version inside the caller's transaction (the caller commits)"""
+    now = time.time()
+    try:
+        conn.execute(
+            f"UPDATE {DATA_VERSION_TABLE} SET generation = MAX(generation + 1, ?), updated_at = ?",
+            (int(now * 1000), now)
+        )
+    except sqlite3.OperationalError:
+        # Older databases have no table; their version follows the file timestamps
+        logger.warning(f"No {DATA_VERSION_TABLE} table; rebuild the database with create_db.py")
+
+def read_generation(conn: sqlite3.Connection) -> Optional[int]:
+    """Generation as seen by the caller's transaction (None for databases without the table)"""
+    try:
+        row = conn.execute(f"SELECT generation FROM {DATA_VERSION_TABLE}").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return int(row[0]) if row is not None else None
+
+def invalidate_data_version() -> None:
+    """Forget the memoized version, e.g. right after committing a bump"""
+    global _current
+    _current = None
@@ -2,7 +2,7 @@ import sqlite3
 import logging
 import threading
 from contextlib import contextmanager
-from typing import Generator
+from typing import Any, Dict, Generator, Iterable, List, Optional, Sequence
 from app.config import settings
 
 logger = logging.getLogger(__name__)
@@ -42,6 +42,20 @@ class ThreadSafeDatabaseManager:
             conn.rollback()
             raise
 
+    @contextmanager
+    def dedicated_connection(self) -> Generator[sqlite3.Connection, None, None]:
+        """Private connection for work that outlives a single request thread.
+
+        Streamed responses are produced on whichever threadpool thread is
+        free, so they cannot use the thread-local connection. Rows are plain
+        tuples.
+        """
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
     def health_check(self) -> bool:
         """Check if database is accessible"""
         try:
@@ -59,3 +73,54 @@ def get_db_connection():
     """Dependency for FastAPI to get database connection"""
     with db_manager.connection_context() as conn:
         yield conn
+
+# Lightweight result layer: plain dicts straight from sqlite3 cursors, so
+# request handlers do not pay for a DataFrame per query.
+
+def _execute(conn: sqlite3.Connection, sql: str, params: Sequence = ()) -> sqlite3.Cursor:
+    cursor = conn.cursor()
+    cursor.row_factory = None  # plain tuples; rows are zipped with column names below
+    cursor.execute(sql, list(params))
+    return cursor
+
+def coerce_int_columns(rows: List[Dict[str, Any]], columns: Iterable[str], default: int = 0) -> List[Dict[str, Any]]:
+    """Convert the given columns to int in place, replacing NULL with ``default``"""
+    columns = tuple(columns)
+    for row in rows:
+        for column in columns:
+            if column in row:
+                value = row[column]
+                row[column] = default if value is None else int(value)
+    return rows
+
+def query_all(conn: sqlite3.Connection, sql: str, params: Sequence = (), int_columns: Iterable[str] = ()) -> List[Dict[str, Any]]:
+    """Run a query and return every row as a dict keyed by column name.
+
+    Columns listed in ``int_columns`` are coerced to int with NULL as 0.
+    """
+    cursor = _execute(conn, sql, params)
+    names = [column[0] for column in cursor.description]
+    rows = [dict(zip(names, row)) for row in cursor.fetchall()]
+    if int_columns:
+        coerce_int_columns(rows, int_columns)
+    return rows
+
+def query_one(conn: sqlite3.Connection, sql: str, params: Sequence = (), int_columns: Iterable[str] = ()) -> Optional[Dict[str, Any]]:
+    """First row of a query as a dict, or None when it returns no rows"""
+    cursor = _execute(conn, sql, params)
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    result = dict(zip([column[0] for column in cursor.description], row))
+    if int_columns:
+        coerce_int_columns([result], int_columns)
+    return result
+
+def query_scalar(conn: sqlite3.Connection, sql: str, params: Sequence = ()) -> Any:
+    """First column of the first row, or None when the query returns no rows"""
+    row = _execute(conn, sql, params).fetchone()
+    return row[0] if row is not None else None
+
+def query_column(conn: sqlite3.Connection, sql: str, params: Sequence = ()) -> List[Any]:
+    """First column of every row"""
+    return [row[0] for row in _execute(conn, sql, params).fetchall()]
@@ -0,0 +1,131 @@
+import csv
+import io
+import logging
+import sqlite3
+import zlib
+from contextlib import ExitStack
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+from fastapi.responses import StreamingResponse
+
+from app.cache import encode_json
+from app.config import settings
+from app.database import db_manager
+from app.fields import select_columns
+from app.models import PAPER_INT_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# Accepted values for the format query parameter of export endpoints
+EXPORT_FORMAT_PATTERN = "^(ndjson|csv)$"
+
+_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",  # Starlette appends the charset
+}
+
+def _batches(cursor, first_batch: list) -> Iterator[list]:
+    """The already fetched first batch, then the rest of the cursor batch by batch"""
+    batch = first_batch
+    while batch:
+        yield batch
+        batch = cursor.fetchmany(settings.export_batch_size)
+
+def _encode_batches(batches: Iterable[list], columns: List[str], export_format: str) -> Iterator[bytes]:
+    """Encode row batches one at a time, holding one batch in memory at a time"""
+    int_positions = [i for i, column in enumerate(columns) if column in PAPER_INT_COLUMNS]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush_csv() -> bytes:
+        data = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    if export_format == "csv":
+        writer.writerow(columns)
+        yield flush_csv()
+
+    for batch in batches:
+        if int_positions:
+            # Same integer rendering as the paginated endpoints
+            batch = [list(row) for row in batch]
+            for row in batch:
+                for i in int_positions:
+                    row[i] = 0 if row[i] is None else int(row[i])
+        if export_format == "csv":
+            writer.writerows(batch)
+            yield flush_csv()
+        else:
+            yield b"".join(encode_json(dict(zip(columns, row))) + b"\n" for row in batch)
+
+def _stream_rows(
+    connection: ExitStack, cursor, first_batch: list, export_format: str, compress: bool
+) -> Iterator[bytes]:
+    with connection:
+        try:
+            columns = [description[0] for description in cursor.description]
+            compressor = zlib.compressobj(settings.gzip_level, zlib.DEFLATED, 31) if compress else None
+            for chunk in _encode_batches(_batches(cursor, first_batch), columns, export_format):
+                if compressor is None:
+                    yield chunk
+                else:
+                    compressed = compressor.compress(chunk)
+                    if compressed:
+                        yield compressed
+            if compressor is not None:
+                yield compressor.flush()
+        except Exception as e:
+            # Headers are already sent: re-raise so the server aborts the
+            # connection instead of ending a truncated download cleanly
+            logger.error(f"Export failed mid-stream: {e}")
+            raise
+
+def export_response(
+    conn: sqlite3.Connection,
+    from_sql: str,
+    conditions: List[str],
+    params: list,
+    fields: Sequence[str],
+    export_format: str,
+    compress: bool,
+    filename: str,
+    alias: Optional[str] = None,
+) -> StreamingResponse:
+    """Stream every row a listing matches, in listing order, as NDJSON or CSV.
+
+    ``from_sql`` is the FROM part of the listing query and ``conn`` is only
+    used to build it: the rows are read from a server-side cursor on a
+    dedicated connection, so memory use does not grow with the size of the
+    result set. With ``compress`` the stream is gzipped and offered as a .gz
+    download. The query runs and its first batch is fetched before the
+    response starts, so a failing query raises here instead of producing
+    an empty download.
+    """
+    citation_col = f"{alias}.total_citation" if alias else "total_citation"
+    id_col = f"{alias}.PPC_Id" if alias else "PPC_Id"
+    where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
+    query = f"""
+        SELECT {select_columns(conn, fields, alias)} {from_sql}{where_clause}
+        ORDER BY {citation_col} DESC, {id_col} DESC
+    """
+
+    filename = f"{filename}.{export_format}"
+    media_type = _MEDIA_TYPES[export_format]
+    if compress:
+        filename += ".gz"
+        media_type = "application/gzip"
+
+    connection = ExitStack()
+    try:
+        cursor = connection.enter_context(db_manager.dedicated_connection()).execute(query, list(params))
+        first_batch = cursor.fetchmany(settings.export_batch_size)
+    except BaseException:
+        connection.close()
+        raise
+    return StreamingResponse(
+        _stream_rows(connection, cursor, first_batch, export_format, compress),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
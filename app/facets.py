@@ -0,0 +1,80 @@
+import sqlite3
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from cachetools import Cache
+from fastapi import HTTPException
+
+from app.database import query_all
+
+# Facet name accepted by ?facets= -> papers column it counts
+FACET_COLUMNS = {
+    "subject": "preprint_subject",
+    "server": "preprint_server",
+    "country": "country_name",
+    "license": "submission_license",
+    "year": "sub_year",
+}
+
+def parse_facets(facets: Optional[str]) -> List[str]:
+    """Validate a comma-separated facets parameter, keeping the requested order"""
+    if not facets:
+        return []
+    names = []
+    for name in facets.split(","):
+        name = name.strip().lower()
+        if not name or name in names:
+            continue
+        if name not in FACET_COLUMNS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown facet '{name}'. Valid facets: {', '.join(FACET_COLUMNS)}"
+            )
+        names.append(name)
+    return names
+
+def compute_facets(
+    conn: sqlite3.Connection,
+    cache: Cache,
+    facet_key: str,
+    from_sql: str,
+    params: list,
+    facets: List[str],
+    alias: Optional[str] = None,
+) -> Optional[Dict[str, List[Dict]]]:
+    """Per-facet value counts over every row a listing matches.
+
+    All requested facets come from a single GROUP BY over the matching rows;
+    the per-facet totals are then summed in Python. Like count_matches,
+    ``facet_key`` must identify the filters only, so every page of a result
+    set shares one computation. Values are ordered by count, years by year.
+    """
+    if not facets:
+        return None
+    cache_key = f"{facet_key}_{','.join(sorted(facets))}"
+    if cache_key in cache:
+        return cache[cache_key]
+
+    prefix = f"{alias}." if alias else ""
+    columns = [f"{prefix}{FACET_COLUMNS[name]}" for name in facets]
+    labels = [f"{column} AS {name}" for column, name in zip(columns, facets)]
+    query = f"SELECT {', '.join(labels)}, COUNT(*) AS row_count {from_sql} GROUP BY {', '.join(columns)}"
+
+    counts = {name: defaultdict(int) for name in facets}
+    for row in query_all(conn, query, params):
+        for name in facets:
+            if row[name] is not None:
+                counts[name][row[name]] += row["row_count"]
+
+    result = {}
+    for name in facets:
+        if name == "year":
+            items = sorted(counts[name].items())
+        else:
+            items = sorted(counts[name].items(), key=lambda item: (-item[1], str(item[0])))
+        result[name] = [
+            {"value": int(value) if name == "year" else value, "count": count}
+            for value, count in items
+        ]
+    cache[cache_key] = result
+    return result
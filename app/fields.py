@@ -0,0 +1,65 @@
+import sqlite3
+from typing import Any, Dict, List, Optional, Sequence
+
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from app.models import Paper
+from app.paper_details import has_paper_details, paper_column_sql
+
+# Paper fields accepted by ?fields=; each one is a papers (or paper_details) column
+PAPER_FIELDS = tuple(Paper.model_fields)
+
+# Listings are keyed on (total_citation, PPC_Id), so both are always selected
+_LISTING_KEY_FIELDS = ("PPC_Id", "total_citation")
+
+# Default for exports: everything but the citation and versions JSON
+EXPORT_FIELDS = tuple(f for f in PAPER_FIELDS if f not in ("citation", "versions"))
+
+def parse_fields(fields: Optional[str], default: Sequence[str] = PAPER_FIELDS) -> List[str]:
+    """Validate a comma-separated fields parameter into a projection in model order"""
+    if not fields:
+        requested = set(default)
+    else:
+        requested = set()
+        for name in fields.split(","):
+            name = name.strip()
+            if not name:
+                continue
+            if name not in Paper.model_fields:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Unknown field '{name}'. Valid fields: {', '.join(PAPER_FIELDS)}"
+                )
+            requested.add(name)
+    requested.update(_LISTING_KEY_FIELDS)
+    return [name for name in PAPER_FIELDS if name in requested]
+
+def select_columns(conn: sqlite3.Connection, fields: Sequence[str], alias: Optional[str] = None) -> str:
+    """SELECT column list for a projection, reading split-out text columns from paper_details"""
+    split = has_paper_details(conn)
+    columns = []
+    for name in fields:
+        column = paper_column_sql(name, split, alias)
+        columns.append(column if column in (name, f"{alias}.{name}") else f"{column} AS {name}")
+    return ", ".join(columns)
+
+def fields_key(fields: Sequence[str], explicit: bool = True) -> str:
+    """Short cache-key component for a projection and whether it was requested explicitly"""
+    if not explicit:
+        return "default"
+    return "all" if len(fields) == len(PAPER_FIELDS) else ",".join(fields)
+
+def dump_projected(model: BaseModel, fields: Sequence[str], explicit: bool = True) -> Dict[str, Any]:
+    """JSON-ready dict of a Paper, or of a response listing papers, for a projection.
+
+    An explicit fields= request keeps only the projected paper fields. The
+    default projection keeps every key, with null for the fields it does
+    not select, so responses keep the shape clients already rely on.
+    """
+    excluded = set(PAPER_FIELDS).difference(fields)
+    if not excluded or not explicit:
+        return model.model_dump(mode="json")
+    if isinstance(model, Paper):
+        return model.model_dump(mode="json", exclude=excluded)
+    return model.model_dump(mode="json", exclude={"papers": {"__all__": excluded}})
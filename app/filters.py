@@ -0,0 +1,124 @@
+import logging
+import re
+import sqlite3
+import string
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Pattern, Tuple
+
+from fastapi import HTTPException
+
+from app.data_version import current_data_version
+
+logger = logging.getLogger(__name__)
+
+# Rolling windows accepted by the time_range query parameter
+TIME_RANGE_YEARS = {
+    "last_year": 1,
+    "last_5_years": 5,
+    "last_10_years": 10,
+}
+
+# Submission date parts materialized by create_db.py. Year and month labels are
+# rendered from the integer columns so responses keep the 'YYYY' and 'YYYY-MM'
+# strings that strftime() used to produce.
+DATE_COLUMNS = ("sub_year", "sub_month", "sub_day", "sub_ym", "sub_dow")
+YEAR_LABEL = "CAST(sub_year AS TEXT)"
+MONTH_LABEL = "printf('%04d-%02d', sub_year, sub_month)"
+
+def time_range_start_year(time_range: str) -> Optional[int]:
+    """First submission year included by a time_range value (None means no filter)"""
+    years = TIME_RANGE_YEARS.get(time_range)
+    if years is None:
+        return None
+    return datetime.now().year - years
+
+def parse_year(value: Any, name: str = "year") -> Optional[int]:
+    """Parse a year filter into the integer compared against sub_year"""
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Invalid {name}: expected a year such as 2020")
+
+# Low-cardinality columns whose substring filters are resolved in memory
+CATEGORICAL_COLUMNS = ("preprint_subject", "preprint_server", "country_name", "submission_license")
+
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+def like_contains_pattern(text: str) -> Pattern:
+    """Regex equivalent of SQLite's ``LIKE '%text%'``.
+
+    Like SQLite, only ASCII letters are case-insensitive, ``%`` matches any
+    run of characters and ``_`` exactly one. Match it against values passed
+    through the same ASCII lowercasing.
+    """
+    parts = []
+    for ch in text.translate(_ASCII_LOWER):
+        if ch == "%":
+            parts.append(".*")
+        elif ch == "_":
+            parts.append(".")
+        else:
+            parts.append(re.escape(ch))
+    return re.compile(".*" + "".join(parts) + ".*", re.DOTALL)
+
+class CategoricalDictionary:
+    """Distinct values of the categorical columns, keyed by column"""
+
+    def __init__(self, values: Dict[str, List[str]], version: Optional[int] = None):
+        self.values = values
+        self.version = version
+        self._folded = {
+            column: [value.translate(_ASCII_LOWER) for value in column_values]
+            for column, column_values in values.items()
+        }
+
+    def resolve(self, column: str, text: str) -> List[str]:
+        """Canonical values a ``column LIKE '%text%'`` filter would match"""
+        pattern = like_contains_pattern(text)
+        return [
+            value for value, folded in zip(self.values[column], self._folded[column])
+            if pattern.fullmatch(folded)
+        ]
+
+_dictionary: Optional[CategoricalDictionary] = None
+_dictionary_lock = threading.Lock()
+
+def _data_version() -> Optional[int]:
+    """Generation of the database contents; ingest and every write change it"""
+    try:
+        return current_data_version().generation
+    except Exception:
+        return None
+
+def load_categorical_dictionary(conn: sqlite3.Connection) -> CategoricalDictionary:
+    """Read the distinct values of every categorical column from the database"""
+    global _dictionary
+    version = _data_version()
+    values = {}
+    for column in CATEGORICAL_COLUMNS:
+        rows = conn.execute(f"SELECT DISTINCT {column} FROM papers WHERE {column} IS NOT NULL").fetchall()
+        values[column] = sorted(str(row[0]) for row in rows)
+    _dictionary = CategoricalDictionary(values, version)
+    logger.info("Categorical dictionary loaded: " + ", ".join(f"{c}={len(v)}" for c, v in values.items()))
+    return _dictionary
+
+def get_categorical_dictionary(conn: sqlite3.Connection) -> CategoricalDictionary:
+    """Current dictionary, reloaded whenever the data version has changed"""
+    dictionary = _dictionary
+    if dictionary is None or dictionary.version != _data_version():
+        with _dictionary_lock:
+            dictionary = _dictionary
+            if dictionary is None or dictionary.version != _data_version():
+                dictionary = load_categorical_dictionary(conn)
+    return dictionary
+
+def categorical_condition(conn: sqlite3.Connection, column: str, text: Any) -> Tuple[str, list]:
+    """Exact-match ``IN (...)`` condition equivalent to ``column LIKE '%text%'``"""
+    values = get_categorical_dictionary(conn).resolve(column, str(text))
+    if not values:
+        return "1 = 0", []
+    placeholders = ",".join(["?"] * len(values))
+    return f"{column} IN ({placeholders})", values
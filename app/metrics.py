@@ -0,0 +1,288 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Metric name -> (Prometheus type, help text)
+METRICS = {
+    "ppc_http_request_duration_seconds": ("histogram", "Request latency by route template"),
+    "ppc_cache_requests_total": ("counter", "Cache lookups by key family and result (l1_hit, l2_hit, stale_hit, miss)"),
+    "ppc_cache_evictions_total": ("counter", "Entries removed from the cache, by level and reason"),
+    "ppc_cache_compute_seconds_total": ("counter", "Time spent computing the values stored in the cache"),
+    "ppc_cache_saved_seconds_total": ("counter", "Compute time avoided by cache hits"),
+    "ppc_cache_entries": ("gauge", "Entries held in the per-worker L1 caches, summed over workers"),
+    "ppc_cache_bytes": ("gauge", "Estimated size of the per-worker L1 caches, summed over workers"),
+    "ppc_cache_budget_bytes": ("gauge", "Memory budget of the per-worker L1 caches, summed over workers"),
+    "ppc_cache_l2_entries": ("gauge", "Entries held in the shared L2 cache"),
+    "ppc_cache_l2_bytes": ("gauge", "Size of the values held in the shared L2 cache"),
+    "ppc_workers": ("gauge", "Worker processes reporting metrics"),
+}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Cache key prefixes reported as key families, longest match first; the rest
+# of a key (query text, filters, page) would make the label unbounded
+CACHE_KEY_FAMILIES = sorted((
+    "search_total", "search_facets", "search",
+    "advanced_search_total", "advanced_search_facets", "advanced_search",
+    "author_search_total", "author_search", "author_papers_total", "author_papers",
+    "authors_list_total", "authors_list", "fetch_total", "fetch", "legacy_papers_total",
+    "legacy_papers", "legacy_paper", "legacy_citations",
+    "paper", "subjects_list", "servers_list", "countries_list", "licenses_list",
+    "analytics_dashboard", "analytics_subjects", "country_data", "citations", "subject_analysis",
+    "pub_timeline", "submission_type", "citation_network", "citation_sources",
+    "version_analytics", "license_analytics", "pub_status",
+), key=len, reverse=True)
+
+def key_family(key: str) -> str:
+    """Bounded label for a cache key: the endpoint family it belongs to"""
+    for family in CACHE_KEY_FAMILIES:
+        if key.startswith(family) and (len(key) == len(family) or key[len(family)] == "_"):
+            return family
+    return "other"
+
+LabelKey = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, LabelKey, float]
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+class MetricsRegistry:
+    """Counters and histograms of this worker, and collectors of its gauges.
+
+    Histograms are kept as their cumulative _bucket, _sum and _count samples,
+    so every published sample is a counter that sums across workers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, LabelKey], float] = defaultdict(float)
+        self._collectors: List[Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]] = []
+
+    def inc(self, name: str, amount: float = 1.0, **labels: str) -> None:
+        with self._lock:
+            self._counters[(name, _label_key(labels))] += amount
+
+    def observe(self, name: str, value: float, buckets: Tuple[float, ...] = LATENCY_BUCKETS, **labels: str) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            for bound in buckets:
+                if value <= bound:
+                    self._counters[(f"{name}_bucket", key + (("le", repr(bound)),))] += 1
+            self._counters[(f"{name}_bucket", key + (("le", "+Inf"),))] += 1
+            self._counters[(f"{name}_sum", key)] += value
+            self._counters[(f"{name}_count", key)] += 1
+
+    def add_collector(self, collector: Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]) -> None:
+        """Register a function returning (name, labels, value) gauge samples at collection time"""
+        self._collectors.append(collector)
+
+    def counters(self) -> List[Sample]:
+        with self._lock:
+            return [(name, labels, value) for (name, labels), value in self._counters.items()]
+
+    def gauges(self) -> List[Sample]:
+        samples = []
+        for collector in self._collectors:
+            try:
+                samples.extend((name, _label_key(labels), value) for name, labels, value in collector())
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {e}")
+        return samples
+
+registry = MetricsRegistry()
+
+class SQLiteMetricsStore:
+    """Latest samples of every worker in a SQLite file, summed at scrape time.
+
+    Each worker replaces its own rows with its cumulative values, so a
+    scrape served by any worker reports the totals of all of them. When a
+    worker exits, its counters are folded into the rows of a retired
+    pseudo-worker, keeping totals monotonic, and its gauges are dropped.
+    """
+    RETIRED = "retired"
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        # The pid alone could be reused by a later worker
+        self.worker = f"{os.getpid()}:{time.time():.6f}"
+        self._worker_pid = os.getpid()
+        self._connection().execute("""
+            CREATE TABLE IF NOT EXISTS metric_samples (
+                worker TEXT NOT NULL,
+                name TEXT NOT NULL,
+                labels TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                value REAL NOT NULL,
+                PRIMARY KEY (worker, name, labels)
+            )
+        """)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Thread-local connection, reopened in forked worker processes"""
+        conn = getattr(self._local, "connection", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=settings.cache_busy_timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _worker_id(self) -> str:
+        # Stores created before gunicorn forks belong to each child separately
+        if self._worker_pid != os.getpid():
+            self._worker_pid = os.getpid()
+            self.worker = f"{os.getpid()}:{time.time():.6f}"
+        return self.worker
+
+    def publish(self, counters: List[Sample], gauges: List[Sample]) -> None:
+        worker = self._worker_id()
+        rows = [(worker, name, json.dumps(labels), "counter", value) for name, labels, value in counters]
+        rows += [(worker, name, json.dumps(labels), "gauge", value) for name, labels, value in gauges]
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM metric_samples WHERE worker = ? AND kind = 'gauge'", (worker,))
+            conn.executemany(
+                "INSERT OR REPLACE INTO metric_samples (worker, name, labels, kind, value) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _retire(self, conn: sqlite3.Connection, workers: List[str]) -> None:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for worker in workers:
+                conn.execute("""
+                    INSERT INTO metric_samples (worker, name, labels, kind, value)
+                    SELECT ?, name, labels, kind, value FROM metric_samples WHERE worker = ? AND kind = 'counter'
+                    ON CONFLICT (worker, name, labels) DO UPDATE SET value = value + excluded.value
+                """, (self.RETIRED, worker))
+                conn.execute("DELETE FROM metric_samples WHERE worker = ?", (worker,))
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def collect(self) -> Tuple[List[Sample], int]:
+        """Samples summed over workers, and the number of live workers"""
+        conn = self._connection()
+        workers = [row[0] for row in conn.execute("SELECT DISTINCT worker FROM metric_samples")]
+        live = [worker for worker in workers if worker != self.RETIRED and _worker_alive(worker)]
+        dead = [worker for worker in workers if worker != self.RETIRED and worker not in live]
+        if dead:
+            self._retire(conn, dead)
+
+        totals: Dict[Tuple[str, str], float] = defaultdict(float)
+        for name, labels, value in conn.execute("SELECT name, labels, value FROM metric_samples"):
+            totals[(name, labels)] += value
+        samples = [
+            (name, tuple(tuple(pair) for pair in json.loads(labels)), value)
+            for (name, labels), value in totals.items()
+        ]
+        return samples, len(live)
+
+def _worker_alive(worker: str) -> bool:
+    try:
+        os.kill(int(worker.split(":", 1)[0]), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError):
+        return True
+    return True
+
+def create_metrics_store() -> Optional[SQLiteMetricsStore]:
+    """Shared store selected by settings.metrics_backend ("sqlite" or "memory" for this worker only)"""
+    if settings.metrics_backend == "memory":
+        return None
+    if settings.metrics_backend == "sqlite":
+        try:
+            return SQLiteMetricsStore(settings.metrics_path)
+        except sqlite3.Error as e:
+            logger.warning(f"Shared metrics store unavailable, reporting this worker only: {e}")
+            return None
+    raise ValueError(f"Unknown metrics backend: {settings.metrics_backend}")
+
+metrics_store = create_metrics_store()
+
+def publish_metrics() -> None:
+    """Write this worker's current samples to the shared store"""
+    if metrics_store is None:
+        return
+    try:
+        metrics_store.publish(registry.counters(), registry.gauges())
+    except sqlite3.Error as e:
+        logger.warning(f"Publishing metrics failed: {e}")
+
+async def publish_metrics_periodically() -> None:
+    """Publish this worker's samples every settings.metrics_publish_interval seconds"""
+    while True:
+        await asyncio.sleep(settings.metrics_publish_interval)
+        await asyncio.to_thread(publish_metrics)
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(int(value)) if value == int(value) else repr(value)
+
+def _format_labels(labels: LabelKey) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        f'{name}="' + value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') + '"'
+        for name, value in labels
+    )
+    return "{" + ",".join(escaped) + "}"
+
+def _base_name(sample_name: str) -> str:
+    for suffix in ("_bucket", "_sum", "_count"):
+        if sample_name.endswith(suffix) and sample_name[: -len(suffix)] in METRICS:
+            return sample_name[: -len(suffix)]
+    return sample_name
+
+def _bucket_order(sample: Sample):
+    name, labels, _ = sample
+    le = dict(labels).get("le")
+    other = tuple(pair for pair in labels if pair[0] != "le")
+    return other, name, float(le) if le is not None else 0.0
+
+def render_metrics(samples: List[Sample]) -> str:
+    """Prometheus text exposition (format 0.0.4) of the given samples"""
+    by_metric: Dict[str, List[Sample]] = defaultdict(list)
+    for sample in samples:
+        by_metric[_base_name(sample[0])].append(sample)
+    lines = []
+    for metric in sorted(by_metric):
+        kind, help_text = METRICS.get(metric, ("untyped", ""))
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} {kind}")
+        for name, labels, value in sorted(by_metric[metric], key=_bucket_order):
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+def collect_metrics(extra: Iterable[Sample] = ()) -> str:
+    """Render the samples of every worker, publishing this worker's first"""
+    if metrics_store is not None:
+        publish_metrics()
+        try:
+            samples, workers = metrics_store.collect()
+            return render_metrics(samples + [("ppc_workers", (), workers)] + list(extra))
+        except sqlite3.Error as e:
+            logger.warning(f"Reading shared metrics failed, reporting this worker only: {e}")
+    samples = registry.counters() + registry.gauges()
+    return render_metrics(samples + [("ppc_workers", (), 1)] + list(extra))
@@ -1,6 +1,10 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List, Any
+from typing import Optional, List, Any, Dict, Union
 from datetime import datetime
+from app.config import settings
+
+# Integer paper columns reported as 0 when NULL
+PAPER_INT_COLUMNS = ("total_citation", "no_of_days_for_publish")
 
 class PaperBase(BaseModel):
     PPC_Id: str
@@ -27,6 +31,13 @@ class Paper(PaperBase):
     """Complete paper model"""
     pass
 
+class PaperBatchRequest(BaseModel):
+    ids: List[str] = Field(..., min_length=1, max_length=settings.max_batch_size)
+
+class PaperBatchResponse(BaseModel):
+    papers: List[Paper]  # in requested order, duplicates removed
+    missing: List[str]  # requested ids with no matching paper
+
 class PaperSummary(BaseModel):
     """Summary model for paper listings"""
     PPC_Id: str
@@ -40,12 +51,19 @@ class CountryData(BaseModel):
     year: str
     count: int
 
+class FacetCount(BaseModel):
+    value: Union[int, str]
+    count: int
+
 class SearchResponse(BaseModel):
     papers: List[Paper]
-    total: int
+    total: Optional[int] = None  # None when count_mode=none
+    total_is_estimate: bool = False  # True when count_mode=estimate hit its cap
     page: int
     page_size: int
     has_next: bool
+    next_cursor: Optional[str] = None  # pass back as ?cursor= to fetch the next page
+    facets: Optional[Dict[str, List[FacetCount]]] = None  # only when ?facets= is given
 
 class AnalyticsResponse(BaseModel):
     timelineData: List[dict]
@@ -0,0 +1,145 @@
+import base64
+import binascii
+import json
+import math
+import sqlite3
+from typing import List, Optional, Tuple
+
+from cachetools import Cache
+from fastapi import HTTPException
+
+from app.config import settings
+from app.database import coerce_int_columns, query_all, query_scalar
+
+# Accepted values for the count_mode query parameter of paginated endpoints
+COUNT_MODE_PATTERN = "^(exact|estimate|none)$"
+
+# Listings are ordered by (total_citation DESC, PPC_Id DESC); papers without a
+# citation count sort last, exactly like a plain "ORDER BY total_citation DESC".
+
+def encode_cursor(total_citation, ppc_id: str) -> str:
+    """Encode the sort key of the last row on a page into an opaque cursor"""
+    if total_citation is not None:
+        total_citation = float(total_citation)
+        if math.isnan(total_citation):
+            total_citation = None
+        elif total_citation.is_integer():
+            total_citation = int(total_citation)
+    raw = json.dumps([total_citation, ppc_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[Optional[float], str]:
+    """Decode a cursor produced by encode_cursor, rejecting anything malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        total_citation, ppc_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(ppc_id, str) or not (total_citation is None or isinstance(total_citation, (int, float))):
+            raise ValueError("unexpected cursor contents")
+        return total_citation, ppc_id
+    except (ValueError, TypeError, binascii.Error):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _keyset_segments(cursor: Optional[str], citation_col: str, id_col: str) -> List[Tuple[str, list]]:
+    """Conditions selecting the rows after the cursor, in listing order.
+
+    Rows with a citation count and rows without one are read as separate
+    segments so that each condition stays an index range seek on
+    (total_citation, PPC_Id) instead of an OR the planner cannot use.
+    """
+    if cursor is None:
+        return [("", [])]
+    total_citation, ppc_id = decode_cursor(cursor)
+    if total_citation is None:
+        return [(f"{citation_col} IS NULL AND {id_col} < ?", [ppc_id])]
+    return [
+        (f"({citation_col}, {id_col}) < (?, ?)", [total_citation, ppc_id]),
+        (f"{citation_col} IS NULL", []),
+    ]
+
+def read_page(
+    conn: sqlite3.Connection,
+    select_sql: str,
+    conditions: List[str],
+    params: list,
+    page_size: int,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    alias: Optional[str] = None,
+    int_columns: Tuple[str, ...] = (),
+):
+    """Read one page of a listing ordered by citations.
+
+    ``select_sql`` is the query up to (but excluding) its WHERE clause. With a
+    cursor the page starts right after it and ``offset`` is ignored, so deep
+    pages cost the same as the first one; OFFSET remains for older clients.
+
+    Returns the page rows as dicts (``int_columns`` coerced as in query_all),
+    whether more rows follow, and the cursor for the next page (None on the
+    last page).
+    """
+    citation_col = f"{alias}.total_citation" if alias else "total_citation"
+    id_col = f"{alias}.PPC_Id" if alias else "PPC_Id"
+    if cursor is not None:
+        offset = 0
+
+    rows = []
+    remaining = page_size + 1  # one extra row tells us whether a next page exists
+    for condition, condition_params in _keyset_segments(cursor, citation_col, id_col):
+        where = conditions + ([condition] if condition else [])
+        where_clause = " WHERE " + " AND ".join(where) if where else ""
+        query = f"""
+            {select_sql}{where_clause}
+            ORDER BY {citation_col} DESC, {id_col} DESC
+            LIMIT ? OFFSET ?
+        """
+        segment = query_all(conn, query, list(params) + condition_params + [remaining, offset])
+        rows.extend(segment)
+        remaining -= len(segment)
+        if remaining <= 0:
+            break
+
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    next_cursor = None
+    if has_more:
+        # Encode the raw sort key before NULL citations are coerced to 0
+        last = rows[-1]
+        next_cursor = encode_cursor(last['total_citation'], last['PPC_Id'])
+    if int_columns:
+        coerce_int_columns(rows, int_columns)
+    return rows, has_more, next_cursor
+
+def count_matches(
+    conn: sqlite3.Connection,
+    cache: Cache,
+    count_key: str,
+    from_sql: str,
+    params: list,
+    count_mode: str = "exact",
+) -> Tuple[Optional[int], bool]:
+    """Count the rows matched by a listing, at most once per filter set.
+
+    ``count_key`` must identify the filters only (never the page), so paging
+    through a result set reuses one cached total. ``from_sql`` is the FROM and
+    WHERE part of the listing query.
+
+    count_mode "none" skips counting, and "estimate" counts no further than
+    settings.count_estimate_cap rows. Returns (total, is_estimate).
+    """
+    if count_mode == "none":
+        return None, False
+    if count_key in cache:
+        return cache[count_key], False
+
+    if count_mode == "estimate":
+        cap = settings.count_estimate_cap
+        total = query_scalar(conn, f"SELECT COUNT(*) FROM (SELECT 1 {from_sql} LIMIT ?)", list(params) + [cap])
+        if total >= cap:
+            return total, True
+    else:
+        total = query_scalar(conn, f"SELECT COUNT(*) {from_sql}", params)
+
+    # A capped count that stayed under the cap is exact as well
+    cache[count_key] = total
+    return total, False
@@ -0,0 +1,28 @@
+import sqlite3
+from typing import Optional
+
+# Built by create_db.py: the bulky text of each paper lives in paper_details,
+# keyed by PPC_Id, so scans over papers only read narrow rows
+PAPER_DETAILS_TABLE = "paper_details"
+DETAIL_COLUMNS = ("preprint_abstract", "all_authors", "versions", "citation")
+
+# papers joined with its text columns; content table of the text indexes
+PAPER_TEXT_VIEW = "paper_text"
+
+def has_paper_details(conn: sqlite3.Connection) -> bool:
+    """Check whether the database was built with the text columns split out of papers"""
+    row = conn.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (PAPER_DETAILS_TABLE,)
+    ).fetchone()
+    return row[0] > 0
+
+def paper_column_sql(column: str, split: bool, alias: Optional[str] = None) -> str:
+    """SQL expression for a paper column, wherever the database stores it.
+
+    Detail columns of a split database are read with a primary-key lookup
+    correlated on PPC_Id, so callers keep selecting FROM papers.
+    """
+    if split and column in DETAIL_COLUMNS:
+        return f"(SELECT d.{column} FROM {PAPER_DETAILS_TABLE} d WHERE d.PPC_Id = {alias or 'papers'}.PPC_Id)"
+    return f"{alias}.{column}" if alias else column
@@ -0,0 +1,99 @@
+import sqlite3
+from typing import Dict, Iterable, Sequence
+
+from app.paper_details import has_paper_details
+
+# Rollup tables built by create_db.py: papers pre-aggregated over the columns
+# the analytics endpoints filter and group on. Every measure re-aggregates
+# (counts and sums add up, minima and maxima combine), so a query over any
+# subset of a table's dimensions returns the same numbers as the equivalent
+# query over papers while reading a few thousand cells instead of every row.
+
+# Dimension -> SQL over a papers row; {p} is the row prefix ("" or "old."/"new." in triggers)
+ROLLUP_DIMENSIONS: Dict[str, str] = {
+    "dated": "{p}preprint_submission_date IS NOT NULL",
+    "sub_year": "{p}sub_year",
+    "sub_month": "{p}sub_month",
+    "sub_ym": "{p}sub_ym",
+    "preprint_subject": "{p}preprint_subject",
+    "preprint_server": "{p}preprint_server",
+    "country_name": "{p}country_name",
+    "submission_type": "{p}submission_type",
+    "submission_license": "{p}submission_license",
+    "version_count": "{p}version_count",
+    # Publication delay: NULL unknown, 0 not positive, then 1-5 for
+    # 0-30, 31-90, 91-180, 181-365 and 365+ days
+    "days_bucket": """CASE
+        WHEN {p}no_of_days_for_publish IS NULL THEN NULL
+        WHEN {p}no_of_days_for_publish <= 0 THEN 0
+        WHEN {p}no_of_days_for_publish <= 30 THEN 1
+        WHEN {p}no_of_days_for_publish <= 90 THEN 2
+        WHEN {p}no_of_days_for_publish <= 180 THEN 3
+        WHEN {p}no_of_days_for_publish <= 365 THEN 4
+        ELSE 5
+    END""",
+}
+
+# Measure -> aggregate over the papers rows of a cell
+ROLLUP_MEASURES: Dict[str, str] = {
+    "paper_count": "COUNT(*)",
+    "citation_count": "COUNT(total_citation)",
+    "citation_sum": "SUM(total_citation)",
+    "citation_max": "MAX(total_citation)",
+    "days_count": "COUNT(no_of_days_for_publish)",
+    "days_sum": "SUM(no_of_days_for_publish)",
+    "days_min": "MIN(no_of_days_for_publish)",
+    "days_max": "MAX(no_of_days_for_publish)",
+    "published_count": "SUM(CASE WHEN published_DOI IS NOT NULL AND published_DOI != '' THEN 1 ELSE 0 END)",
+    "first_date": "MIN(preprint_submission_date)",
+    "last_date": "MAX(preprint_submission_date)",
+}
+
+# Rollup table -> its dimensions, smallest table first
+ROLLUP_TABLES: Dict[str, Sequence[str]] = {
+    "rollup_country_year": ("dated", "sub_year", "country_name"),
+    "rollup_monthly": (
+        "dated", "sub_year", "sub_month", "sub_ym", "preprint_subject", "preprint_server", "version_count"
+    ),
+    "rollup_yearly": (
+        "sub_year", "preprint_subject", "preprint_server", "submission_type", "submission_license", "days_bucket"
+    ),
+}
+
+# Older databases keep the versions JSON on papers instead of version_count
+_VERSIONS_JSON_COUNT = "CASE WHEN json_valid({p}versions) THEN json_array_length({p}versions) END"
+
+def dimension_sql(dimension: str, prefix: str = "", split: bool = True) -> str:
+    """SQL for a rollup dimension over the papers row with the given prefix"""
+    template = ROLLUP_DIMENSIONS[dimension]
+    if dimension == "version_count" and not split:
+        template = _VERSIONS_JSON_COUNT
+    return template.format(p=prefix)
+
+def rollup_select_sql(dimensions: Sequence[str], where: str = "", split: bool = True) -> str:
+    """Aggregate papers into one row per combination of the given dimensions"""
+    columns = [f"{dimension_sql(dimension, split=split)} AS {dimension}" for dimension in dimensions]
+    columns += [f"{sql} AS {measure}" for measure, sql in ROLLUP_MEASURES.items()]
+    where_clause = f" WHERE {where}" if where else ""
+    return f"SELECT {', '.join(columns)} FROM papers{where_clause} GROUP BY {', '.join(dimensions)}"
+
+def has_rollup(conn: sqlite3.Connection, table: str) -> bool:
+    """Check whether the database was built with the given rollup table"""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (table,)
+    ).fetchone()
+    return row is not None
+
+def rollup_source(conn: sqlite3.Connection, dimensions: Iterable[str]) -> str:
+    """FROM target for a query over the given rollup dimensions and measures.
+
+    This is the smallest rollup table holding every dimension. Databases
+    built without rollups get papers aggregated to those dimensions on the
+    fly, so callers write one query either way.
+    """
+    dimensions = tuple(dimensions)
+    for table, table_dimensions in ROLLUP_TABLES.items():
+        if set(dimensions) <= set(table_dimensions) and has_rollup(conn, table):
+            return table
+    return f"({rollup_select_sql(dimensions, split=has_paper_details(conn))})"
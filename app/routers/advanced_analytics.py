@@ -1,12 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
+from functools import partial
 from fastapi.responses import JSONResponse
 import sqlite3
-import pandas as pd
 import json
 from typing import Optional, List, Dict, Any
-from app.database import get_db_connection
-from app.cache import get_analytics_cache
-from cachetools import Cache
+from app.database import get_db_connection, query_all
+from app.cache import EncodedJSONResponse, TieredCache, get_analytics_cache
+from app.cache_tags import categorical_tags, narrowest_tags, paper_tag, year_tags
+from app.filters import YEAR_LABEL, categorical_condition, parse_year
+from app.paper_details import has_paper_details, paper_column_sql
+from app.rollup import rollup_source
+from app.columnar import (
+    ColumnarGroups, ColumnarPapers, columnar_enabled, get_columnar_papers, group_rows, sql_order, sql_round,
+    year_labels
+)
 import logging
 
 logger = logging.getLogger(__name__)
@@ -16,227 +23,368 @@ router = APIRouter(prefix="/api/advanced-analytics", tags=["advanced-analytics"]
 # PHASE 1: Publication Timeline Analytics
 # ============================================================================
 
-@router.get("/publication-timeline")
-def get_publication_timeline_analytics(
-    subject: Optional[str] = Query(None, description="Filter by subject"),
-    server: Optional[str] = Query(None, description="Filter by server"),
-    year_from: Optional[str] = Query(None, description="Start year"),
-    year_to: Optional[str] = Query(None, description="End year"),
-    conn: sqlite3.Connection = Depends(get_db_connection),
-    cache: Cache = Depends(get_analytics_cache)
-):
-    """
-    Comprehensive publication timeline analytics showing:
-    - Average time to publish by subject, server, year
-    - Publication speed trends over time
-    - Distribution of publication times
-    """
-    cache_key = f"pub_timeline_{subject}_{server}_{year_from}_{year_to}"
-    if cache_key in cache:
-        return cache[cache_key]
+def _filter_tags(conn: sqlite3.Connection, subject=None, server=None, year_from=None, year_to=None):
+    """Cache tags of a result filtered on subject, server and a sub_year range"""
+    return narrowest_tags(
+        categorical_tags(conn, "preprint_subject", subject),
+        categorical_tags(conn, "preprint_server", server),
+        year_tags(year_from, year_to)
+    )
+
+def _columnar_filter(conn: sqlite3.Connection, papers: ColumnarPapers, subject=None, server=None, year_from=None, year_to=None):
+    """Mask of the subject, server and sub_year range filters shared by these endpoints"""
+    mask = papers.all()
+    if subject:
+        mask &= papers.contains(conn, "preprint_subject", subject)
+    if server:
+        mask &= papers.contains(conn, "preprint_server", server)
+    if year_from is not None:
+        mask &= papers.column("sub_year") >= year_from
+    if year_to is not None:
+        mask &= papers.column("sub_year") <= year_to
+    return mask
+
+def _publication_delay(groups: ColumnarGroups) -> Dict[str, list]:
+    """paper_count, avg_days, min_days and max_days of each group"""
+    return {
+        "paper_count": groups.count(),
+        "avg_days": groups.avg("no_of_days_for_publish", 1),
+        "min_days": groups.min("no_of_days_for_publish"),
+        "max_days": groups.max("no_of_days_for_publish"),
+    }
+
+def _publication_timeline_columnar(conn: sqlite3.Connection, subject, server, year_from, year_to):
+    """bySubject, byServer, trendOverTime, distribution and statistics from the columnar engine"""
+    papers = get_columnar_papers(conn)
+    mask = _columnar_filter(conn, papers, subject, server, year_from, year_to)
+    mask &= papers.column("no_of_days_for_publish") > 0
+
+    by_subject = papers.group_by(mask, "preprint_subject")
+    fields = {"preprint_subject": by_subject.key("preprint_subject"), **_publication_delay(by_subject)}
+    fields["avg_citations"] = by_subject.avg("total_citation", 1)
+    order = sql_order(by_subject.size, (fields["avg_days"], False), (fields["preprint_subject"], False))
+    subject_rows = group_rows(fields, [i for i in order if fields["paper_count"][i] >= 5])
+
+    by_server = papers.group_by(mask, "preprint_server")
+    fields = {"preprint_server": by_server.key("preprint_server"), **_publication_delay(by_server)}
+    order = sql_order(by_server.size, (fields["avg_days"], False), (fields["preprint_server"], False))
+    server_rows = group_rows(fields, order)
+
+    by_year = papers.group_by(mask, "sub_year")
+    fields = {"year": year_labels(by_year.key("sub_year")), **_publication_delay(by_year)}
+    trend_rows = group_rows(fields, sql_order(by_year.size, (by_year.key("sub_year"), False)))
+
+    by_bucket = papers.group_by(mask, "days_bucket")
+    labels = {1: "0-30 days", 2: "31-90 days", 3: "91-180 days", 4: "181-365 days"}
+    fields = {
+        "time_bucket": [labels.get(bucket, "365+ days") for bucket in by_bucket.key("days_bucket")],
+        "count": by_bucket.count(),
+    }
+    distribution_rows = group_rows(fields, sql_order(by_bucket.size, (by_bucket.key("days_bucket"), False)))
+
+    overall = papers.group_by(mask)
+    stats = _publication_delay(overall)
+    stats_rows = group_rows({
+        "total_published": stats["paper_count"],
+        "overall_avg_days": stats["avg_days"],
+        "fastest_publish": stats["min_days"],
+        "slowest_publish": stats["max_days"],
+    }, [0])
+    return subject_rows, server_rows, trend_rows, distribution_rows, stats_rows
+
+def compute_publication_timeline(
+    conn: sqlite3.Connection,
+    subject: Optional[str],
+    server: Optional[str],
+    year_from: Optional[str],
+    year_to: Optional[str],
+) -> EncodedJSONResponse:
+    """Publication delay by subject, server and year, its trend and distribution"""
+    year_from_value = parse_year(year_from, "year_from")
+    year_to_value = parse_year(year_to, "year_to")
     
-    try:
-        # Build filters
-        filters = ["no_of_days_for_publish IS NOT NULL", "no_of_days_for_publish > 0"]
+    if columnar_enabled("publication-timeline"):
+        subject_rows, server_rows, trend_rows, distribution_rows, stats_rows = _publication_timeline_columnar(
+            conn, subject, server, year_from_value, year_to_value
+        )
+    else:
+        # Build filters (days_bucket > 0: a positive number of days to publish)
+        filters = ["days_bucket > 0"]
         params = []
-        
+    
         if subject:
-            filters.append("preprint_subject LIKE ?")
-            params.append(f"%{subject}%")
+            condition, condition_params = categorical_condition(conn, "preprint_subject", subject)
+            filters.append(condition)
+            params.extend(condition_params)
         if server:
-            filters.append("preprint_server LIKE ?")
-            params.append(f"%{server}%")
-        if year_from:
-            filters.append("strftime('%Y', preprint_submission_date) >= ?")
-            params.append(year_from)
-        if year_to:
-            filters.append("strftime('%Y', preprint_submission_date) <= ?")
-            params.append(year_to)
-        
+            condition, condition_params = categorical_condition(conn, "preprint_server", server)
+            filters.append(condition)
+            params.extend(condition_params)
+        if year_from_value is not None:
+            filters.append("sub_year >= ?")
+            params.append(year_from_value)
+        if year_to_value is not None:
+            filters.append("sub_year <= ?")
+            params.append(year_to_value)
+    
         where_clause = " AND ".join(filters)
-        
+        source = rollup_source(conn, ("sub_year", "preprint_subject", "preprint_server", "days_bucket"))
+    
         # Average by subject
         subject_query = f"""
             SELECT preprint_subject,
-                   COUNT(*) as paper_count,
-                   ROUND(AVG(no_of_days_for_publish), 1) as avg_days,
-                   MIN(no_of_days_for_publish) as min_days,
-                   MAX(no_of_days_for_publish) as max_days,
-                   ROUND(AVG(total_citation), 1) as avg_citations
-            FROM papers
+                   SUM(paper_count) as paper_count,
+                   ROUND(SUM(days_sum) * 1.0 / SUM(days_count), 1) as avg_days,
+                   MIN(days_min) as min_days,
+                   MAX(days_max) as max_days,
+                   ROUND(SUM(citation_sum) * 1.0 / SUM(citation_count), 1) as avg_citations
+            FROM {source}
             WHERE {where_clause}
             GROUP BY preprint_subject
-            HAVING paper_count >= 5
-            ORDER BY avg_days
+            HAVING SUM(paper_count) >= 5
+            ORDER BY avg_days, preprint_subject
         """
-        subject_df = pd.read_sql_query(subject_query, conn, params=params)
-        
+        subject_rows = query_all(conn, subject_query, params)
+    
         # Average by server
         server_query = f"""
             SELECT preprint_server,
-                   COUNT(*) as paper_count,
-                   ROUND(AVG(no_of_days_for_publish), 1) as avg_days,
-                   MIN(no_of_days_for_publish) as min_days,
-                   MAX(no_of_days_for_publish) as max_days
-            FROM papers
+                   SUM(paper_count) as paper_count,
+                   ROUND(SUM(days_sum) * 1.0 / SUM(days_count), 1) as avg_days,
+                   MIN(days_min) as min_days,
+                   MAX(days_max) as max_days
+            FROM {source}
             WHERE {where_clause}
             GROUP BY preprint_server
-            ORDER BY avg_days
+            ORDER BY avg_days, preprint_server
         """
-        server_df = pd.read_sql_query(server_query, conn, params=params)
-        
+        server_rows = query_all(conn, server_query, params)
+    
         # Trend over years
         trend_query = f"""
-            SELECT strftime('%Y', preprint_submission_date) as year,
-                   COUNT(*) as paper_count,
-                   ROUND(AVG(no_of_days_for_publish), 1) as avg_days,
-                   MIN(no_of_days_for_publish) as min_days,
-                   MAX(no_of_days_for_publish) as max_days
-            FROM papers
+            SELECT {YEAR_LABEL} as year,
+                   SUM(paper_count) as paper_count,
+                   ROUND(SUM(days_sum) * 1.0 / SUM(days_count), 1) as avg_days,
+                   MIN(days_min) as min_days,
+                   MAX(days_max) as max_days
+            FROM {source}
             WHERE {where_clause}
-            GROUP BY strftime('%Y', preprint_submission_date)
-            ORDER BY year
+            GROUP BY sub_year
+            ORDER BY sub_year
         """
-        trend_df = pd.read_sql_query(trend_query, conn, params=params)
-        
+        trend_rows = query_all(conn, trend_query, params)
+    
         # Distribution buckets
         distribution_query = f"""
             SELECT 
-                CASE 
-                    WHEN no_of_days_for_publish <= 30 THEN '0-30 days'
-                    WHEN no_of_days_for_publish <= 90 THEN '31-90 days'
-                    WHEN no_of_days_for_publish <= 180 THEN '91-180 days'
-                    WHEN no_of_days_for_publish <= 365 THEN '181-365 days'
+                CASE days_bucket
+                    WHEN 1 THEN '0-30 days'
+                    WHEN 2 THEN '31-90 days'
+                    WHEN 3 THEN '91-180 days'
+                    WHEN 4 THEN '181-365 days'
                     ELSE '365+ days'
                 END as time_bucket,
-                COUNT(*) as count
-            FROM papers
+                SUM(paper_count) as count
+            FROM {source}
             WHERE {where_clause}
-            GROUP BY time_bucket
-            ORDER BY 
-                CASE time_bucket
-                    WHEN '0-30 days' THEN 1
-                    WHEN '31-90 days' THEN 2
-                    WHEN '91-180 days' THEN 3
-                    WHEN '181-365 days' THEN 4
-                    ELSE 5
-                END
+            GROUP BY days_bucket
+            ORDER BY days_bucket
         """
-        distribution_df = pd.read_sql_query(distribution_query, conn, params=params)
-        
+        distribution_rows = query_all(conn, distribution_query, params)
+    
         # Overall statistics
         stats_query = f"""
             SELECT 
-                COUNT(*) as total_published,
-                ROUND(AVG(no_of_days_for_publish), 1) as overall_avg_days,
-                MIN(no_of_days_for_publish) as fastest_publish,
-                MAX(no_of_days_for_publish) as slowest_publish
-            FROM papers
+                COALESCE(SUM(paper_count), 0) as total_published,
+                ROUND(SUM(days_sum) * 1.0 / SUM(days_count), 1) as overall_avg_days,
+                MIN(days_min) as fastest_publish,
+                MAX(days_max) as slowest_publish
+            FROM {source}
             WHERE {where_clause}
         """
-        stats_df = pd.read_sql_query(stats_query, conn, params=params)
-        
-        response = {
-            "bySubject": subject_df.to_dict("records"),
-            "byServer": server_df.to_dict("records"),
-            "trendOverTime": trend_df.to_dict("records"),
-            "distribution": distribution_df.to_dict("records"),
-            "statistics": stats_df.to_dict("records")[0] if not stats_df.empty else {},
-            "metadata": {
-                "filters": {"subject": subject, "server": server, "year_from": year_from, "year_to": year_to}
-            }
+        stats_rows = query_all(conn, stats_query, params)
+    
+    response = {
+        "bySubject": subject_rows,
+        "byServer": server_rows,
+        "trendOverTime": trend_rows,
+        "distribution": distribution_rows,
+        "statistics": stats_rows[0] if stats_rows else {},
+        "metadata": {
+            "filters": {"subject": subject, "server": server, "year_from": year_from, "year_to": year_to}
         }
-        
-        cache[cache_key] = response
-        return response
-        
-    except Exception as e:
-        logger.error(f"Publication timeline analytics error: {e}")
-        raise HTTPException(status_code=500, detail="Failed to fetch publication timeline analytics")
-
+    }
+    
+    return EncodedJSONResponse(response)
 
-@router.get("/submission-type-analytics")
-def get_submission_type_analytics(
+@router.get("/publication-timeline")
+def get_publication_timeline_analytics(
     subject: Optional[str] = Query(None, description="Filter by subject"),
+    server: Optional[str] = Query(None, description="Filter by server"),
     year_from: Optional[str] = Query(None, description="Start year"),
     year_to: Optional[str] = Query(None, description="End year"),
     conn: sqlite3.Connection = Depends(get_db_connection),
-    cache: Cache = Depends(get_analytics_cache)
+    cache: TieredCache = Depends(get_analytics_cache)
 ):
     """
-    Submission type analytics showing:
-    - Distribution of submission types
-    - Citation patterns by type
-    - Trends over time
+    Comprehensive publication timeline analytics showing:
+    - Average time to publish by subject, server, year
+    - Publication speed trends over time
+    - Distribution of publication times
     """
-    cache_key = f"submission_type_{subject}_{year_from}_{year_to}"
-    if cache_key in cache:
-        return cache[cache_key]
+    cache_key = f"pub_timeline_{subject}_{server}_{year_from}_{year_to}"
+    
+    year_from_value = parse_year(year_from, "year_from")
+    year_to_value = parse_year(year_to, "year_to")
     
     try:
+        compute = partial(compute_publication_timeline, subject=subject, server=server, year_from=year_from, year_to=year_to)
+        tags = _filter_tags(conn, subject, server, year_from_value, year_to_value)
+        return cache.tagged(tags).get_or_compute(cache_key, compute, conn)
+        
+    except Exception as e:
+        logger.error(f"Publication timeline analytics error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch publication timeline analytics")
+
+
+def _submission_type_columnar(conn: sqlite3.Connection, subject, year_from, year_to):
+    """typeDistribution, bySubject and trendOverTime from the columnar engine"""
+    papers = get_columnar_papers(conn)
+    mask = _columnar_filter(conn, papers, subject, None, year_from, year_to) & papers.not_empty("submission_type")
+
+    by_type = papers.group_by(mask, "submission_type")
+    fields = {
+        "submission_type": by_type.key("submission_type"),
+        "count": by_type.count(),
+        "avg_citations": by_type.avg("total_citation", 1),
+        "avg_days_to_publish": by_type.avg("no_of_days_for_publish", 1),
+    }
+    type_dist_rows = group_rows(fields, sql_order(by_type.size, (fields["count"], True), (fields["submission_type"], False)))
+
+    by_subject = papers.group_by(mask, "preprint_subject", "submission_type")
+    fields = {
+        "preprint_subject": by_subject.key("preprint_subject"),
+        "submission_type": by_subject.key("submission_type"),
+        "count": by_subject.count(),
+    }
+    order = sql_order(
+        by_subject.size, (fields["preprint_subject"], False), (fields["count"], True), (fields["submission_type"], False)
+    )
+    subject_type_rows = group_rows(fields, order)
+
+    by_year = papers.group_by(mask, "sub_year", "submission_type")
+    fields = {
+        "year": year_labels(by_year.key("sub_year")),
+        "submission_type": by_year.key("submission_type"),
+        "count": by_year.count(),
+    }
+    order = sql_order(by_year.size, (by_year.key("sub_year"), False), (fields["submission_type"], False))
+    trend_rows = group_rows(fields, order)
+    return type_dist_rows, subject_type_rows, trend_rows
+
+def compute_submission_type(
+    conn: sqlite3.Connection,
+    subject: Optional[str],
+    year_from: Optional[str],
+    year_to: Optional[str],
+) -> EncodedJSONResponse:
+    """Submission type distribution, citations by type and trends over time"""
+    year_from_value = parse_year(year_from, "year_from")
+    year_to_value = parse_year(year_to, "year_to")
+    
+    if columnar_enabled("submission-type-analytics"):
+        type_dist_rows, subject_type_rows, trend_rows = _submission_type_columnar(
+            conn, subject, year_from_value, year_to_value
+        )
+    else:
         filters = ["submission_type IS NOT NULL", "submission_type != ''"]
         params = []
-        
+    
         if subject:
-            filters.append("preprint_subject LIKE ?")
-            params.append(f"%{subject}%")
-        if year_from:
-            filters.append("strftime('%Y', preprint_submission_date) >= ?")
-            params.append(year_from)
-        if year_to:
-            filters.append("strftime('%Y', preprint_submission_date) <= ?")
-            params.append(year_to)
-        
+            condition, condition_params = categorical_condition(conn, "preprint_subject", subject)
+            filters.append(condition)
+            params.extend(condition_params)
+        if year_from_value is not None:
+            filters.append("sub_year >= ?")
+            params.append(year_from_value)
+        if year_to_value is not None:
+            filters.append("sub_year <= ?")
+            params.append(year_to_value)
+    
         where_clause = " AND ".join(filters)
-        
+        source = rollup_source(conn, ("sub_year", "preprint_subject", "submission_type"))
+    
         # Distribution by type
         type_dist_query = f"""
             SELECT submission_type,
-                   COUNT(*) as count,
-                   ROUND(AVG(total_citation), 1) as avg_citations,
-                   ROUND(AVG(no_of_days_for_publish), 1) as avg_days_to_publish
-            FROM papers
+                   SUM(paper_count) as count,
+                   ROUND(SUM(citation_sum) * 1.0 / SUM(citation_count), 1) as avg_citations,
+                   ROUND(SUM(days_sum) * 1.0 / SUM(days_count), 1) as avg_days_to_publish
+            FROM {source}
             WHERE {where_clause}
             GROUP BY submission_type
-            ORDER BY count DESC
+            ORDER BY count DESC, submission_type
         """
-        type_dist_df = pd.read_sql_query(type_dist_query, conn, params=params)
-        
+        type_dist_rows = query_all(conn, type_dist_query, params)
+    
         # By subject
         subject_type_query = f"""
             SELECT preprint_subject,
                    submission_type,
-                   COUNT(*) as count
-            FROM papers
+                   SUM(paper_count) as count
+            FROM {source}
             WHERE {where_clause}
             GROUP BY preprint_subject, submission_type
-            ORDER BY preprint_subject, count DESC
+            ORDER BY preprint_subject, count DESC, submission_type
         """
-        subject_type_df = pd.read_sql_query(subject_type_query, conn, params=params)
-        
+        subject_type_rows = query_all(conn, subject_type_query, params)
+    
         # Trend over time
         trend_query = f"""
-            SELECT strftime('%Y', preprint_submission_date) as year,
+            SELECT {YEAR_LABEL} as year,
                    submission_type,
-                   COUNT(*) as count
-            FROM papers
+                   SUM(paper_count) as count
+            FROM {source}
             WHERE {where_clause}
-            GROUP BY year, submission_type
-            ORDER BY year, submission_type
+            GROUP BY sub_year, submission_type
+            ORDER BY sub_year, submission_type
         """
-        trend_df = pd.read_sql_query(trend_query, conn, params=params)
-        
-        response = {
-            "typeDistribution": type_dist_df.to_dict("records"),
-            "bySubject": subject_type_df.to_dict("records"),
-            "trendOverTime": trend_df.to_dict("records"),
-            "metadata": {
-                "filters": {"subject": subject, "year_from": year_from, "year_to": year_to}
-            }
+        trend_rows = query_all(conn, trend_query, params)
+    
+    response = {
+        "typeDistribution": type_dist_rows,
+        "bySubject": subject_type_rows,
+        "trendOverTime": trend_rows,
+        "metadata": {
+            "filters": {"subject": subject, "year_from": year_from, "year_to": year_to}
         }
-        
-        cache[cache_key] = response
-        return response
+    }
+    
+    return EncodedJSONResponse(response)
+
+@router.get("/submission-type-analytics")
+def get_submission_type_analytics(
+    subject: Optional[str] = Query(None, description="Filter by subject"),
+    year_from: Optional[str] = Query(None, description="Start year"),
+    year_to: Optional[str] = Query(None, description="End year"),
+    conn: sqlite3.Connection = Depends(get_db_connection),
+    cache: TieredCache = Depends(get_analytics_cache)
+):
+    """
+    Submission type analytics showing:
+    - Distribution of submission types
+    - Citation patterns by type
+    - Trends over time
+    """
+    cache_key = f"submission_type_{subject}_{year_from}_{year_to}"
+    
+    year_from_value = parse_year(year_from, "year_from")
+    year_to_value = parse_year(year_to, "year_to")
+    
+    try:
+        compute = partial(compute_submission_type, subject=subject, year_from=year_from, year_to=year_to)
+        tags = _filter_tags(conn, subject, None, year_from_value, year_to_value)
+        return cache.tagged(tags).get_or_compute(cache_key, compute, conn)
         
     except Exception as e:
         logger.error(f"Submission type analytics error: {e}")
@@ -247,143 +395,155 @@ def get_submission_type_analytics(
 # PHASE 2: Enhanced Citation Analytics
 # ============================================================================
 
+def compute_citation_network(conn: sqlite3.Connection, limit: int, min_citations: int) -> EncodedJSONResponse:
+    """Nodes and edges of the most cited papers' citation graph"""
+    # Get top cited papers with their citation data
+    citation = paper_column_sql("citation", has_paper_details(conn))
+    query = f"""
+        SELECT PPC_Id, preprint_title, total_citation, {citation} AS citation, preprint_subject
+        FROM papers
+        WHERE total_citation >= ? AND {citation} IS NOT NULL AND {citation} != ''
+        ORDER BY total_citation DESC
+        LIMIT ?
+    """
+    rows = query_all(conn, query, (min_citations, limit))
+    
+    nodes = []
+    edges = []
+    
+    for row in rows:
+        nodes.append({
+            "id": row['PPC_Id'],
+            "title": row['preprint_title'],
+            "citations": int(row['total_citation']),
+            "subject": row['preprint_subject']
+        })
+        
+        # Parse citation JSON to create edges
+        try:
+            citation_data = row['citation'].replace("'", '"')
+            citations = json.loads(citation_data)
+            for cite in citations:
+                if isinstance(cite, dict) and 'doi' in cite:
+                    edges.append({
+                        "source": row['PPC_Id'],
+                        "target": cite.get('doi', ''),
+                        "count": cite.get('count', 1)
+                    })
+        except:
+            pass
+    
+    response = {
+        "nodes": nodes,
+        "edges": edges,
+        "metadata": {
+            "total_nodes": len(nodes),
+            "total_edges": len(edges),
+            "min_citations": min_citations
+        }
+    }
+    
+    return EncodedJSONResponse(response)
+
 @router.get("/citation-network")
 def get_citation_network_data(
     limit: int = Query(100, ge=10, le=500, description="Number of papers to analyze"),
     min_citations: int = Query(10, ge=1, description="Minimum citations threshold"),
     conn: sqlite3.Connection = Depends(get_db_connection),
-    cache: Cache = Depends(get_analytics_cache)
+    cache: TieredCache = Depends(get_analytics_cache)
 ):
     """
     Citation network data for graph visualization
     Returns nodes (papers) and edges (citation relationships)
     """
     cache_key = f"citation_network_{limit}_{min_citations}"
-    if cache_key in cache:
-        return cache[cache_key]
     
     try:
-        # Get top cited papers with their citation data
-        query = """
-            SELECT PPC_Id, preprint_title, total_citation, citation, preprint_subject
+        compute = partial(compute_citation_network, limit=limit, min_citations=min_citations)
+        return cache.get_or_compute(cache_key, compute, conn)
+        
+    except Exception as e:
+        logger.error(f"Citation network error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch citation network data")
+
+
+def compute_citation_sources(
+    conn: sqlite3.Connection,
+    ppc_id: Optional[str],
+    top_n: int,
+) -> EncodedJSONResponse:
+    """Citation sources of one paper or of the most cited papers"""
+    citation = paper_column_sql("citation", has_paper_details(conn))
+    if ppc_id:
+        # Single paper analysis
+        query = f"""
+            SELECT PPC_Id, preprint_title, {citation} AS citation, total_citation
             FROM papers
-            WHERE total_citation >= ? AND citation IS NOT NULL AND citation != ''
+            WHERE PPC_Id = ? AND {citation} IS NOT NULL
+        """
+        rows = query_all(conn, query, (ppc_id,))
+    else:
+        # Top papers analysis
+        query = f"""
+            SELECT PPC_Id, preprint_title, {citation} AS citation, total_citation
+            FROM papers
+            WHERE {citation} IS NOT NULL AND {citation} != ''
             ORDER BY total_citation DESC
             LIMIT ?
         """
-        df = pd.read_sql_query(query, conn, params=(min_citations, limit))
-        
-        nodes = []
-        edges = []
-        
-        for _, row in df.iterrows():
-            nodes.append({
-                "id": row['PPC_Id'],
+        rows = query_all(conn, query, (top_n,))
+    
+    papers_analysis = []
+    
+    for row in rows:
+        try:
+            citation_data = row['citation'].replace("'", '"')
+            citations = json.loads(citation_data)
+            
+            citation_sources = []
+            for cite in citations:
+                if isinstance(cite, dict):
+                    citation_sources.append({
+                        "doi": cite.get('doi', 'Unknown'),
+                        "count": cite.get('count', 1)
+                    })
+            
+            papers_analysis.append({
+                "ppc_id": row['PPC_Id'],
                 "title": row['preprint_title'],
-                "citations": int(row['total_citation']),
-                "subject": row['preprint_subject']
+                "total_citations": int(row['total_citation']),
+                "citation_sources": citation_sources,
+                "unique_sources": len(citation_sources)
             })
-            
-            # Parse citation JSON to create edges
-            try:
-                citation_data = row['citation'].replace("'", '"')
-                citations = json.loads(citation_data)
-                for cite in citations:
-                    if isinstance(cite, dict) and 'doi' in cite:
-                        edges.append({
-                            "source": row['PPC_Id'],
-                            "target": cite.get('doi', ''),
-                            "count": cite.get('count', 1)
-                        })
-            except:
-                pass
-        
-        response = {
-            "nodes": nodes,
-            "edges": edges,
-            "metadata": {
-                "total_nodes": len(nodes),
-                "total_edges": len(edges),
-                "min_citations": min_citations
-            }
+        except:
+            continue
+    
+    response = {
+        "papers": papers_analysis,
+        "metadata": {
+            "total_papers_analyzed": len(papers_analysis)
         }
-        
-        cache[cache_key] = response
-        return response
-        
-    except Exception as e:
-        logger.error(f"Citation network error: {e}")
-        raise HTTPException(status_code=500, detail="Failed to fetch citation network data")
-
+    }
+    
+    return EncodedJSONResponse(response)
 
 @router.get("/citation-sources")
 def get_citation_sources_analytics(
     ppc_id: Optional[str] = Query(None, description="Specific paper ID"),
     top_n: int = Query(20, ge=5, le=100, description="Top N papers by citations"),
     conn: sqlite3.Connection = Depends(get_db_connection),
-    cache: Cache = Depends(get_analytics_cache)
+    cache: TieredCache = Depends(get_analytics_cache)
 ):
     """
     Analyze citation sources - where citations come from
     """
     cache_key = f"citation_sources_{ppc_id}_{top_n}"
-    if cache_key in cache:
-        return cache[cache_key]
     
     try:
+        compute = partial(compute_citation_sources, ppc_id=ppc_id, top_n=top_n)
         if ppc_id:
-            # Single paper analysis
-            query = """
-                SELECT PPC_Id, preprint_title, citation, total_citation
-                FROM papers
-                WHERE PPC_Id = ? AND citation IS NOT NULL
-            """
-            df = pd.read_sql_query(query, conn, params=(ppc_id,))
-        else:
-            # Top papers analysis
-            query = """
-                SELECT PPC_Id, preprint_title, citation, total_citation
-                FROM papers
-                WHERE citation IS NOT NULL AND citation != ''
-                ORDER BY total_citation DESC
-                LIMIT ?
-            """
-            df = pd.read_sql_query(query, conn, params=(top_n,))
-        
-        papers_analysis = []
-        
-        for _, row in df.iterrows():
-            try:
-                citation_data = row['citation'].replace("'", '"')
-                citations = json.loads(citation_data)
-                
-                citation_sources = []
-                for cite in citations:
-                    if isinstance(cite, dict):
-                        citation_sources.append({
-                            "doi": cite.get('doi', 'Unknown'),
-                            "count": cite.get('count', 1)
-                        })
-                
-                papers_analysis.append({
-                    "ppc_id": row['PPC_Id'],
-                    "title": row['preprint_title'],
-                    "total_citations": int(row['total_citation']),
-                    "citation_sources": citation_sources,
-                    "unique_sources": len(citation_sources)
-                })
-            except:
-                continue
-        
-        response = {
-            "papers": papers_analysis,
-            "metadata": {
-                "total_papers_analyzed": len(papers_analysis)
-            }
-        }
-        
-        cache[cache_key] = response
-        return response
+            cache = cache.tagged((paper_tag(ppc_id),))
+        return cache.get_or_compute(cache_key, compute, conn)
         
     except Exception as e:
         logger.error(f"Citation sources analytics error: {e}")
@@ -394,100 +554,153 @@ def get_citation_sources_analytics(
 # PHASE 2: Version History Analytics
 # ============================================================================
 
-@router.get("/version-analytics")
-def get_version_analytics(
-    subject: Optional[str] = Query(None, description="Filter by subject"),
-    server: Optional[str] = Query(None, description="Filter by server"),
-    conn: sqlite3.Connection = Depends(get_db_connection),
-    cache: Cache = Depends(get_analytics_cache)
-):
-    """
-    Version history analytics showing:
-    - Revision patterns
-    - Time between versions
-    - Correlation with citations
-    """
-    cache_key = f"version_analytics_{subject}_{server}"
-    if cache_key in cache:
-        return cache[cache_key]
-    
-    try:
-        filters = ["versions IS NOT NULL", "versions != ''", "versions != '[]'"]
+def _version_analytics_columnar(conn: sqlite3.Connection, subject, server):
+    """versionDistribution, bySubject, byServer and statistics from the columnar engine"""
+    papers = get_columnar_papers(conn)
+    mask = _columnar_filter(conn, papers, subject, server) & (papers.column("version_count") > 0)
+
+    by_versions = papers.group_by(mask, "version_count")
+    fields = {
+        "version_count": by_versions.key("version_count"),
+        "paper_count": by_versions.count(),
+        "avg_citations": by_versions.avg("total_citation", 1),
+        "avg_days_to_publish": by_versions.avg("no_of_days_for_publish", 1),
+    }
+    version_dist_rows = group_rows(fields, sql_order(by_versions.size, (fields["version_count"], False)))
+
+    version_rows = {}
+    for column in ("preprint_subject", "preprint_server"):
+        groups = papers.group_by(mask, column, "version_count")
+        fields = {
+            column: groups.key(column),
+            "version_count": groups.key("version_count"),
+            "paper_count": groups.count(),
+            "avg_citations": groups.avg("total_citation", 1),
+        }
+        order = sql_order(groups.size, (fields[column], False), (fields["version_count"], False))
+        version_rows[column] = group_rows(fields, order)
+
+    overall = papers.group_by(mask)
+    total = overall.count()
+    stats_rows = group_rows({
+        "total_papers_with_versions": total,
+        "avg_versions": overall.avg("version_count", 1),
+        "max_versions": overall.max("version_count"),
+        "multi_version_papers": [
+            n if t else None for n, t in zip(overall.count_if(papers.column("version_count") >= 2), total)
+        ],
+    }, [0])
+    return version_dist_rows, version_rows["preprint_subject"], version_rows["preprint_server"], stats_rows
+
+def compute_version_analytics(
+    conn: sqlite3.Connection,
+    subject: Optional[str],
+    server: Optional[str],
+) -> EncodedJSONResponse:
+    """Version count distribution overall, by subject and by server"""
+    if columnar_enabled("version-analytics"):
+        version_dist_rows, subject_version_rows, server_version_rows, stats_rows = _version_analytics_columnar(
+            conn, subject, server
+        )
+    else:
+        filters = ["version_count > 0"]
         params = []
-        
+    
         if subject:
-            filters.append("preprint_subject LIKE ?")
-            params.append(f"%{subject}%")
+            condition, condition_params = categorical_condition(conn, "preprint_subject", subject)
+            filters.append(condition)
+            params.extend(condition_params)
         if server:
-            filters.append("preprint_server LIKE ?")
-            params.append(f"%{server}%")
-        
+            condition, condition_params = categorical_condition(conn, "preprint_server", server)
+            filters.append(condition)
+            params.extend(condition_params)
+    
         where_clause = " AND ".join(filters)
-        
+        source = rollup_source(conn, ("preprint_subject", "preprint_server", "version_count"))
+    
         # Version count distribution
         version_dist_query = f"""
             SELECT 
-                json_array_length(versions) as version_count,
-                COUNT(*) as paper_count,
-                ROUND(AVG(total_citation), 1) as avg_citations,
-                ROUND(AVG(no_of_days_for_publish), 1) as avg_days_to_publish
-            FROM papers
+                version_count,
+                SUM(paper_count) as paper_count,
+                ROUND(SUM(citation_sum) * 1.0 / SUM(citation_count), 1) as avg_citations,
+                ROUND(SUM(days_sum) * 1.0 / SUM(days_count), 1) as avg_days_to_publish
+            FROM {source}
             WHERE {where_clause}
-            GROUP BY json_array_length(versions)
+            GROUP BY version_count
             ORDER BY version_count
         """
-        version_dist_df = pd.read_sql_query(version_dist_query, conn, params=params)
-        
+        version_dist_rows = query_all(conn, version_dist_query, params)
+    
         # By subject
         subject_version_query = f"""
             SELECT preprint_subject,
-                   json_array_length(versions) as version_count,
-                   COUNT(*) as paper_count,
-                   ROUND(AVG(total_citation), 1) as avg_citations
-            FROM papers
+                   version_count,
+                   SUM(paper_count) as paper_count,
+                   ROUND(SUM(citation_sum) * 1.0 / SUM(citation_count), 1) as avg_citations
+            FROM {source}
             WHERE {where_clause}
             GROUP BY preprint_subject, version_count
             ORDER BY preprint_subject, version_count
         """
-        subject_version_df = pd.read_sql_query(subject_version_query, conn, params=params)
-        
+        subject_version_rows = query_all(conn, subject_version_query, params)
+    
         # By server
         server_version_query = f"""
             SELECT preprint_server,
-                   json_array_length(versions) as version_count,
-                   COUNT(*) as paper_count,
-                   ROUND(AVG(total_citation), 1) as avg_citations
-            FROM papers
+                   version_count,
+                   SUM(paper_count) as paper_count,
+                   ROUND(SUM(citation_sum) * 1.0 / SUM(citation_count), 1) as avg_citations
+            FROM {source}
             WHERE {where_clause}
             GROUP BY preprint_server, version_count
             ORDER BY preprint_server, version_count
         """
-        server_version_df = pd.read_sql_query(server_version_query, conn, params=params)
-        
+        server_version_rows = query_all(conn, server_version_query, params)
+    
         # Statistics
         stats_query = f"""
             SELECT 
-                COUNT(*) as total_papers_with_versions,
-                ROUND(AVG(json_array_length(versions)), 1) as avg_versions,
-                MAX(json_array_length(versions)) as max_versions,
-                SUM(CASE WHEN json_array_length(versions) >= 2 THEN 1 ELSE 0 END) as multi_version_papers
-            FROM papers
+                COALESCE(SUM(paper_count), 0) as total_papers_with_versions,
+                ROUND(SUM(version_count * paper_count) * 1.0 / SUM(paper_count), 1) as avg_versions,
+                MAX(version_count) as max_versions,
+                SUM(CASE WHEN version_count >= 2 THEN paper_count ELSE 0 END) as multi_version_papers
+            FROM {source}
             WHERE {where_clause}
         """
-        stats_df = pd.read_sql_query(stats_query, conn, params=params)
-        
-        response = {
-            "versionDistribution": version_dist_df.to_dict("records"),
-            "bySubject": subject_version_df.to_dict("records"),
-            "byServer": server_version_df.to_dict("records"),
-            "statistics": stats_df.to_dict("records")[0] if not stats_df.empty else {},
-            "metadata": {
-                "filters": {"subject": subject, "server": server}
-            }
+        stats_rows = query_all(conn, stats_query, params)
+    
+    response = {
+        "versionDistribution": version_dist_rows,
+        "bySubject": subject_version_rows,
+        "byServer": server_version_rows,
+        "statistics": stats_rows[0] if stats_rows else {},
+        "metadata": {
+            "filters": {"subject": subject, "server": server}
         }
-        
-        cache[cache_key] = response
-        return response
+    }
+    
+    return EncodedJSONResponse(response)
+
+@router.get("/version-analytics")
+def get_version_analytics(
+    subject: Optional[str] = Query(None, description="Filter by subject"),
+    server: Optional[str] = Query(None, description="Filter by server"),
+    conn: sqlite3.Connection = Depends(get_db_connection),
+    cache: TieredCache = Depends(get_analytics_cache)
+):
+    """
+    Version history analytics showing:
+    - Revision patterns
+    - Time between versions
+    - Correlation with citations
+    """
+    cache_key = f"version_analytics_{subject}_{server}"
+    
+    try:
+        compute = partial(compute_version_analytics, subject=subject, server=server)
+        tags = _filter_tags(conn, subject, server)
+        return cache.tagged(tags).get_or_compute(cache_key, compute, conn)
         
     except Exception as e:
         logger.error(f"Version analytics error: {e}")
@@ -498,81 +711,132 @@ def get_version_analytics(
 # PHASE 2: License Analytics
 # ============================================================================
 
-@router.get("/license-analytics")
-def get_license_analytics(
-    subject: Optional[str] = Query(None, description="Filter by subject"),
-    year_from: Optional[str] = Query(None, description="Start year"),
-    year_to: Optional[str] = Query(None, description="End year"),
-    conn: sqlite3.Connection = Depends(get_db_connection),
-    cache: Cache = Depends(get_analytics_cache)
-):
-    """
-    License analytics showing:
-    - License distribution
-    - Citation impact by license
-    - Trends over time
-    - Subject preferences
-    """
-    cache_key = f"license_analytics_{subject}_{year_from}_{year_to}"
-    if cache_key in cache:
-        return cache[cache_key]
+def _license_analytics_columnar(conn: sqlite3.Connection, subject, year_from, year_to):
+    """licenseDistribution, bySubject, trendOverTime and openAccessComparison from the columnar engine"""
+    papers = get_columnar_papers(conn)
+    mask = _columnar_filter(conn, papers, subject, None, year_from, year_to) & papers.not_empty("submission_license")
+    total = int(mask.sum())
+
+    by_license = papers.group_by(mask, "submission_license")
+    counts = by_license.count()
+    fields = {
+        "submission_license": by_license.key("submission_license"),
+        "paper_count": counts,
+        "avg_citations": by_license.avg("total_citation", 1),
+        "max_citations": by_license.max("total_citation"),
+        "avg_days_to_publish": by_license.avg("no_of_days_for_publish", 1),
+        "percentage": [sql_round(count * 100.0 / total, 1) for count in counts],
+    }
+    order = sql_order(by_license.size, (counts, True), (fields["submission_license"], False))
+    license_dist_rows = group_rows(fields, order)
+
+    by_subject = papers.group_by(mask, "preprint_subject", "submission_license")
+    fields = {
+        "preprint_subject": by_subject.key("preprint_subject"),
+        "submission_license": by_subject.key("submission_license"),
+        "paper_count": by_subject.count(),
+        "avg_citations": by_subject.avg("total_citation", 1),
+    }
+    order = sql_order(
+        by_subject.size,
+        (fields["preprint_subject"], False), (fields["paper_count"], True), (fields["submission_license"], False)
+    )
+    subject_license_rows = group_rows(fields, order)
+
+    by_year = papers.group_by(mask, "sub_year", "submission_license")
+    fields = {
+        "year": year_labels(by_year.key("sub_year")),
+        "submission_license": by_year.key("submission_license"),
+        "paper_count": by_year.count(),
+    }
+    order = sql_order(by_year.size, (by_year.key("sub_year"), False), (fields["submission_license"], False))
+    trend_rows = group_rows(fields, order)
+
+    open_access = papers.like_any("submission_license", ("CC", "Creative Commons"))
+    oa_rows = []
+    for category, category_mask in (("Open Access", mask & open_access), ("Other", mask & ~open_access)):
+        if category_mask.any():
+            groups = papers.group_by(category_mask)
+            oa_rows.append({
+                "license_category": category,
+                "paper_count": groups.count()[0],
+                "avg_citations": groups.avg("total_citation", 1)[0],
+            })
+    return license_dist_rows, subject_license_rows, trend_rows, oa_rows
+
+def compute_license_analytics(
+    conn: sqlite3.Connection,
+    subject: Optional[str],
+    year_from: Optional[str],
+    year_to: Optional[str],
+) -> EncodedJSONResponse:
+    """License distribution, citation impact, trends and open access comparison"""
+    year_from_value = parse_year(year_from, "year_from")
+    year_to_value = parse_year(year_to, "year_to")
     
-    try:
+    if columnar_enabled("license-analytics"):
+        license_dist_rows, subject_license_rows, trend_rows, oa_rows = _license_analytics_columnar(
+            conn, subject, year_from_value, year_to_value
+        )
+    else:
         filters = ["submission_license IS NOT NULL", "submission_license != ''"]
         params = []
-        
+    
         if subject:
-            filters.append("preprint_subject LIKE ?")
-            params.append(f"%{subject}%")
-        if year_from:
-            filters.append("strftime('%Y', preprint_submission_date) >= ?")
-            params.append(year_from)
-        if year_to:
-            filters.append("strftime('%Y', preprint_submission_date) <= ?")
-            params.append(year_to)
-        
+            condition, condition_params = categorical_condition(conn, "preprint_subject", subject)
+            filters.append(condition)
+            params.extend(condition_params)
+        if year_from_value is not None:
+            filters.append("sub_year >= ?")
+            params.append(year_from_value)
+        if year_to_value is not None:
+            filters.append("sub_year <= ?")
+            params.append(year_to_value)
+    
         where_clause = " AND ".join(filters)
-        
+        source = rollup_source(conn, ("sub_year", "preprint_subject", "submission_license"))
+    
         # License distribution with impact
         license_dist_query = f"""
             SELECT submission_license,
-                   COUNT(*) as paper_count,
-                   ROUND(AVG(total_citation), 1) as avg_citations,
-                   MAX(total_citation) as max_citations,
-                   ROUND(AVG(no_of_days_for_publish), 1) as avg_days_to_publish,
-                   ROUND(COUNT(*) * 100.0 / (SELECT COUNT(*) FROM papers WHERE {where_clause}), 1) as percentage
-            FROM papers
+                   SUM(paper_count) as paper_count,
+                   ROUND(SUM(citation_sum) * 1.0 / SUM(citation_count), 1) as avg_citations,
+                   MAX(citation_max) as max_citations,
+                   ROUND(SUM(days_sum) * 1.0 / SUM(days_count), 1) as avg_days_to_publish,
+                   ROUND(SUM(paper_count) * 100.0 / (SELECT SUM(paper_count) FROM {source} WHERE {where_clause}), 1) as percentage
+            FROM {source}
             WHERE {where_clause}
             GROUP BY submission_license
-            ORDER BY paper_count DESC
+            ORDER BY paper_count DESC, submission_license
         """
-        license_dist_df = pd.read_sql_query(license_dist_query, conn, params=params)
-        
+        # where_clause appears twice (subquery and outer query), so bind params twice
+        license_dist_rows = query_all(conn, license_dist_query, params + params)
+    
         # By subject
         subject_license_query = f"""
             SELECT preprint_subject,
                    submission_license,
-                   COUNT(*) as paper_count,
-                   ROUND(AVG(total_citation), 1) as avg_citations
-            FROM papers
+                   SUM(paper_count) as paper_count,
+                   ROUND(SUM(citation_sum) * 1.0 / SUM(citation_count), 1) as avg_citations
+            FROM {source}
             WHERE {where_clause}
             GROUP BY preprint_subject, submission_license
-            ORDER BY preprint_subject, paper_count DESC
+            ORDER BY preprint_subject, paper_count DESC, submission_license
         """
-        subject_license_df = pd.read_sql_query(subject_license_query, conn, params=params)
-        
+        subject_license_rows = query_all(conn, subject_license_query, params)
+    
         # Trend over time
         trend_query = f"""
-            SELECT strftime('%Y', preprint_submission_date) as year,
+            SELECT {YEAR_LABEL} as year,
                    submission_license,
-                   COUNT(*) as paper_count
-            FROM papers
+                   SUM(paper_count) as paper_count
+            FROM {source}
             WHERE {where_clause}
-            GROUP BY year, submission_license
-            ORDER BY year, submission_license
+            GROUP BY sub_year, submission_license
+            ORDER BY sub_year, submission_license
         """
-        trend_df = pd.read_sql_query(trend_query, conn, params=params)
-        
+        trend_rows = query_all(conn, trend_query, params)
+    
         # Open access vs others
         oa_query = f"""
             SELECT 
@@ -580,26 +844,50 @@ def get_license_analytics(
                     WHEN submission_license LIKE '%CC%' OR submission_license LIKE '%Creative Commons%' THEN 'Open Access'
                     ELSE 'Other'
                 END as license_category,
-                COUNT(*) as paper_count,
-                ROUND(AVG(total_citation), 1) as avg_citations
-            FROM papers
+                SUM(paper_count) as paper_count,
+                ROUND(SUM(citation_sum) * 1.0 / SUM(citation_count), 1) as avg_citations
+            FROM {source}
             WHERE {where_clause}
             GROUP BY license_category
         """
-        oa_df = pd.read_sql_query(oa_query, conn, params=params)
-        
-        response = {
-            "licenseDistribution": license_dist_df.to_dict("records"),
-            "bySubject": subject_license_df.to_dict("records"),
-            "trendOverTime": trend_df.to_dict("records"),
-            "openAccessComparison": oa_df.to_dict("records"),
-            "metadata": {
-                "filters": {"subject": subject, "year_from": year_from, "year_to": year_to}
-            }
+        oa_rows = query_all(conn, oa_query, params)
+    
+    response = {
+        "licenseDistribution": license_dist_rows,
+        "bySubject": subject_license_rows,
+        "trendOverTime": trend_rows,
+        "openAccessComparison": oa_rows,
+        "metadata": {
+            "filters": {"subject": subject, "year_from": year_from, "year_to": year_to}
         }
-        
-        cache[cache_key] = response
-        return response
+    }
+    
+    return EncodedJSONResponse(response)
+
+@router.get("/license-analytics")
+def get_license_analytics(
+    subject: Optional[str] = Query(None, description="Filter by subject"),
+    year_from: Optional[str] = Query(None, description="Start year"),
+    year_to: Optional[str] = Query(None, description="End year"),
+    conn: sqlite3.Connection = Depends(get_db_connection),
+    cache: TieredCache = Depends(get_analytics_cache)
+):
+    """
+    License analytics showing:
+    - License distribution
+    - Citation impact by license
+    - Trends over time
+    - Subject preferences
+    """
+    cache_key = f"license_analytics_{subject}_{year_from}_{year_to}"
+    
+    year_from_value = parse_year(year_from, "year_from")
+    year_to_value = parse_year(year_to, "year_to")
+    
+    try:
+        compute = partial(compute_license_analytics, subject=subject, year_from=year_from, year_to=year_to)
+        tags = _filter_tags(conn, subject, None, year_from_value, year_to_value)
+        return cache.tagged(tags).get_or_compute(cache_key, compute, conn)
         
     except Exception as e:
         logger.error(f"License analytics error: {e}")
@@ -610,120 +898,177 @@ def get_license_analytics(
 # Publication Status Analytics
 # ============================================================================
 
-@router.get("/publication-status")
-def get_publication_status_analytics(
-    subject: Optional[str] = Query(None, description="Filter by subject"),
-    server: Optional[str] = Query(None, description="Filter by server"),
-    year_from: Optional[str] = Query(None, description="Start year"),
-    year_to: Optional[str] = Query(None, description="End year"),
-    conn: sqlite3.Connection = Depends(get_db_connection),
-    cache: Cache = Depends(get_analytics_cache)
-):
-    """
-    Publication status analytics showing:
-    - Publication success rate
-    - Unpublished high-citation papers
-    - Publication patterns
+def _publication_rates(groups: ColumnarGroups, published: List[int]) -> Dict[str, List]:
+    totals = groups.count()
+    return {
+        "total_preprints": totals,
+        "published_count": published,
+        "publication_rate": [sql_round(p * 100.0 / n, 1) if n else None for p, n in zip(published, totals)],
+    }
+
+def _publication_status_columnar(conn: sqlite3.Connection, subject, server, year_from, year_to):
+    """overallRate, bySubject, byServer and trendOverTime from the columnar engine"""
+    papers = get_columnar_papers(conn)
+    mask = _columnar_filter(conn, papers, subject, server, year_from, year_to)
+
+    overall = papers.group_by(mask)
+    fields = _publication_rates(overall, overall.count_if(papers.published))
+    if not overall.count()[0]:
+        fields["published_count"] = [None]
+    pub_rate_rows = group_rows(fields, [0])
+
+    rows = {}
+    for column in ("preprint_subject", "preprint_server"):
+        groups = papers.group_by(mask, column)
+        fields = {column: groups.key(column), **_publication_rates(groups, groups.count_if(papers.published))}
+        order = sql_order(groups.size, (fields["publication_rate"], True), (fields[column], False))
+        if column == "preprint_subject":
+            order = [i for i in order if fields["total_preprints"][i] >= 10]
+        rows[column] = group_rows(fields, order)
+
+    by_year = papers.group_by(mask, "sub_year")
+    fields = {"year": year_labels(by_year.key("sub_year")), **_publication_rates(by_year, by_year.count_if(papers.published))}
+    trend_rows = group_rows(fields, sql_order(by_year.size, (by_year.key("sub_year"), False)))
+    return pub_rate_rows, rows["preprint_subject"], rows["preprint_server"], trend_rows
+
+def compute_publication_status(
+    conn: sqlite3.Connection,
+    subject: Optional[str],
+    server: Optional[str],
+    year_from: Optional[str],
+    year_to: Optional[str],
+) -> EncodedJSONResponse:
+    """Publication rates overall, by subject, server and year, and unpublished highly cited papers"""
+    year_from_value = parse_year(year_from, "year_from")
+    year_to_value = parse_year(year_to, "year_to")
+    
+    filters = []
+    params = []
+    
+    if subject:
+        condition, condition_params = categorical_condition(conn, "preprint_subject", subject)
+        filters.append(condition)
+        params.extend(condition_params)
+    if server:
+        condition, condition_params = categorical_condition(conn, "preprint_server", server)
+        filters.append(condition)
+        params.extend(condition_params)
+    if year_from_value is not None:
+        filters.append("sub_year >= ?")
+        params.append(year_from_value)
+    if year_to_value is not None:
+        filters.append("sub_year <= ?")
+        params.append(year_to_value)
+    
+    where_clause = " AND ".join(filters) if filters else "1=1"
+    
+    # Unpublished gems (high citations but not published)
+    unpublished_gems_query = f"""
+        SELECT PPC_Id, preprint_title, total_citation, preprint_submission_date, preprint_subject
+        FROM papers
+        WHERE (published_DOI IS NULL OR published_DOI = '')
+          AND total_citation >= 10
+          AND {where_clause}
+        ORDER BY total_citation DESC
+        LIMIT 50
     """
-    cache_key = f"pub_status_{subject}_{server}_{year_from}_{year_to}"
-    if cache_key in cache:
-        return cache[cache_key]
+    unpublished_gems_rows = query_all(conn, unpublished_gems_query, params)
+    
+    if columnar_enabled("publication-status"):
+        pub_rate_rows, subject_pub_rows, server_pub_rows, trend_rows = _publication_status_columnar(
+            conn, subject, server, year_from_value, year_to_value
+        )
+    else:
+        source = rollup_source(conn, ("sub_year", "preprint_subject", "preprint_server"))
     
-    try:
-        filters = []
-        params = []
-        
-        if subject:
-            filters.append("preprint_subject LIKE ?")
-            params.append(f"%{subject}%")
-        if server:
-            filters.append("preprint_server LIKE ?")
-            params.append(f"%{server}%")
-        if year_from:
-            filters.append("strftime('%Y', preprint_submission_date) >= ?")
-            params.append(year_from)
-        if year_to:
-            filters.append("strftime('%Y', preprint_submission_date) <= ?")
-            params.append(year_to)
-        
-        where_clause = " AND ".join(filters) if filters else "1=1"
-        
         # Overall publication rate
         pub_rate_query = f"""
             SELECT 
-                COUNT(*) as total_preprints,
-                SUM(CASE WHEN published_DOI IS NOT NULL AND published_DOI != '' THEN 1 ELSE 0 END) as published_count,
-                ROUND(SUM(CASE WHEN published_DOI IS NOT NULL AND published_DOI != '' THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 1) as publication_rate
-            FROM papers
+                COALESCE(SUM(paper_count), 0) as total_preprints,
+                SUM(published_count) as published_count,
+                ROUND(SUM(published_count) * 100.0 / SUM(paper_count), 1) as publication_rate
+            FROM {source}
             WHERE {where_clause}
         """
-        pub_rate_df = pd.read_sql_query(pub_rate_query, conn, params=params)
-        
+        pub_rate_rows = query_all(conn, pub_rate_query, params)
+    
         # By subject
         subject_pub_query = f"""
             SELECT preprint_subject,
-                   COUNT(*) as total_preprints,
-                   SUM(CASE WHEN published_DOI IS NOT NULL AND published_DOI != '' THEN 1 ELSE 0 END) as published_count,
-                   ROUND(SUM(CASE WHEN published_DOI IS NOT NULL AND published_DOI != '' THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 1) as publication_rate
-            FROM papers
+                   SUM(paper_count) as total_preprints,
+                   SUM(published_count) as published_count,
+                   ROUND(SUM(published_count) * 100.0 / SUM(paper_count), 1) as publication_rate
+            FROM {source}
             WHERE {where_clause}
             GROUP BY preprint_subject
-            HAVING total_preprints >= 10
-            ORDER BY publication_rate DESC
+            HAVING SUM(paper_count) >= 10
+            ORDER BY publication_rate DESC, preprint_subject
         """
-        subject_pub_df = pd.read_sql_query(subject_pub_query, conn, params=params)
-        
+        subject_pub_rows = query_all(conn, subject_pub_query, params)
+    
         # By server
         server_pub_query = f"""
             SELECT preprint_server,
-                   COUNT(*) as total_preprints,
-                   SUM(CASE WHEN published_DOI IS NOT NULL AND published_DOI != '' THEN 1 ELSE 0 END) as published_count,
-                   ROUND(SUM(CASE WHEN published_DOI IS NOT NULL AND published_DOI != '' THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 1) as publication_rate
-            FROM papers
+                   SUM(paper_count) as total_preprints,
+                   SUM(published_count) as published_count,
+                   ROUND(SUM(published_count) * 100.0 / SUM(paper_count), 1) as publication_rate
+            FROM {source}
             WHERE {where_clause}
             GROUP BY preprint_server
-            ORDER BY publication_rate DESC
-        """
-        server_pub_df = pd.read_sql_query(server_pub_query, conn, params=params)
-        
-        # Unpublished gems (high citations but not published)
-        unpublished_gems_query = f"""
-            SELECT PPC_Id, preprint_title, total_citation, preprint_submission_date, preprint_subject
-            FROM papers
-            WHERE (published_DOI IS NULL OR published_DOI = '')
-              AND total_citation >= 10
-              AND {where_clause}
-            ORDER BY total_citation DESC
-            LIMIT 50
+            ORDER BY publication_rate DESC, preprint_server
         """
-        unpublished_gems_df = pd.read_sql_query(unpublished_gems_query, conn, params=params)
-        
+        server_pub_rows = query_all(conn, server_pub_query, params)
+    
         # Trend over time
         trend_query = f"""
-            SELECT strftime('%Y', preprint_submission_date) as year,
-                   COUNT(*) as total_preprints,
-                   SUM(CASE WHEN published_DOI IS NOT NULL AND published_DOI != '' THEN 1 ELSE 0 END) as published_count,
-                   ROUND(SUM(CASE WHEN published_DOI IS NOT NULL AND published_DOI != '' THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 1) as publication_rate
-            FROM papers
+            SELECT {YEAR_LABEL} as year,
+                   SUM(paper_count) as total_preprints,
+                   SUM(published_count) as published_count,
+                   ROUND(SUM(published_count) * 100.0 / SUM(paper_count), 1) as publication_rate
+            FROM {source}
             WHERE {where_clause}
-            GROUP BY year
-            ORDER BY year
+            GROUP BY sub_year
+            ORDER BY sub_year
         """
-        trend_df = pd.read_sql_query(trend_query, conn, params=params)
-        
-        response = {
-            "overallRate": pub_rate_df.to_dict("records")[0] if not pub_rate_df.empty else {},
-            "bySubject": subject_pub_df.to_dict("records"),
-            "byServer": server_pub_df.to_dict("records"),
-            "unpublishedGems": unpublished_gems_df.to_dict("records"),
-            "trendOverTime": trend_df.to_dict("records"),
-            "metadata": {
-                "filters": {"subject": subject, "server": server, "year_from": year_from, "year_to": year_to}
-            }
+        trend_rows = query_all(conn, trend_query, params)
+    
+    response = {
+        "overallRate": pub_rate_rows[0] if pub_rate_rows else {},
+        "bySubject": subject_pub_rows,
+        "byServer": server_pub_rows,
+        "unpublishedGems": unpublished_gems_rows,
+        "trendOverTime": trend_rows,
+        "metadata": {
+            "filters": {"subject": subject, "server": server, "year_from": year_from, "year_to": year_to}
         }
-        
-        cache[cache_key] = response
-        return response
+    }
+    
+    return EncodedJSONResponse(response)
+
+@router.get("/publication-status")
+def get_publication_status_analytics(
+    subject: Optional[str] = Query(None, description="Filter by subject"),
+    server: Optional[str] = Query(None, description="Filter by server"),
+    year_from: Optional[str] = Query(None, description="Start year"),
+    year_to: Optional[str] = Query(None, description="End year"),
+    conn: sqlite3.Connection = Depends(get_db_connection),
+    cache: TieredCache = Depends(get_analytics_cache)
+):
+    """
+    Publication status analytics showing:
+    - Publication success rate
+    - Unpublished high-citation papers
+    - Publication patterns
+    """
+    cache_key = f"pub_status_{subject}_{server}_{year_from}_{year_to}"
+    
+    year_from_value = parse_year(year_from, "year_from")
+    year_to_value = parse_year(year_to, "year_to")
+    
+    try:
+        compute = partial(compute_publication_status, subject=subject, server=server, year_from=year_from, year_to=year_to)
+        tags = _filter_tags(conn, subject, server, year_from_value, year_to_value)
+        return cache.tagged(tags).get_or_compute(cache_key, compute, conn)
         
     except Exception as e:
         logger.error(f"Publication status analytics error: {e}")
@@ -1,12 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import JSONResponse
 import sqlite3
-import pandas as pd
 from typing import Optional, Dict, Any
-from app.database import get_db_connection
-from app.models import Paper, SearchResponse, PaperSummary
+from app.database import get_db_connection, query_all
+from app.models import PAPER_INT_COLUMNS, Paper, SearchResponse, PaperSummary
 from app.config import settings
-from app.cache import get_cache
+from app.cache import EncodedJSONResponse, get_cache
+from app.pagination import COUNT_MODE_PATTERN, count_matches, read_page
+from app.fields import dump_projected, fields_key, parse_fields, select_columns
+from app.author_index import (
+    AUTHOR_STATS_TABLE, author_papers_condition, author_search_condition, has_author_index,
+    matching_author_norms, sync_author_index
+)
+from app.cache_tags import author_tag
 from cachetools import Cache
 import logging
 import json
@@ -14,64 +20,64 @@ import json
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/authors", tags=["authors"])
 
+# Default projection of author search results
+AUTHOR_SEARCH_FIELDS = (
+    "PPC_Id", "preprint_title", "preprint_doi", "submission_contact", "preprint_submission_date",
+    "total_citation", "preprint_server", "preprint_subject", "country_name"
+)
+
 @router.get("/search")
 def search_authors(
     query: str = Query(..., min_length=1, description="Search query for authors"),
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(10, ge=1, le=settings.max_page_size, description="Items per page"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor"),
+    count_mode: str = Query("exact", pattern=COUNT_MODE_PATTERN, description="Total count: exact | estimate | none"),
+    fields: Optional[str] = Query(None, description="Comma-separated Paper fields to return (default: summary fields)"),
     conn: sqlite3.Connection = Depends(get_db_connection),
     cache: Cache = Depends(get_cache)
 ):
-    """Search papers by author name using submission_contact field"""
-    cache_key = f"author_search_{query}_{page}_{page_size}"
+    """Search papers by author name (any author on the byline)"""
+    paper_fields = parse_fields(fields, AUTHOR_SEARCH_FIELDS)
+    cache_key = f"author_search_{query}_{page}_{page_size}_{cursor}_{count_mode}_{fields_key(paper_fields, bool(fields))}"
     if cache_key in cache:
         return cache[cache_key]
 
     try:
+        # Index the authors of papers added since the tables were built
+        sync_author_index(conn)
         offset = (page - 1) * page_size
 
-        # Count total results - search in submission_contact field
-        count_query = """
-            SELECT COUNT(*) as total
-            FROM papers
-            WHERE submission_contact LIKE ?
-        """
-        count_df = pd.read_sql_query(count_query, conn, params=(f"%{query}%",))
-        total = int(count_df.iloc[0]['total'])
+        condition, condition_params = author_search_condition(conn, query)
 
-        # Get paginated results
-        search_query = """
-            SELECT PPC_Id, preprint_title, preprint_doi, submission_contact,
-                   preprint_submission_date, total_citation, preprint_server,
-                   preprint_subject, country_name
-            FROM papers
-            WHERE submission_contact LIKE ?
-            ORDER BY total_citation DESC
-            LIMIT ? OFFSET ?
-        """
-        df = pd.read_sql_query(
-            search_query,
-            conn,
-            params=(f"%{query}%", page_size, offset)
+        # Count total results
+        total, is_estimate = count_matches(
+            conn, cache, f"author_search_total_{query}",
+            f"FROM papers WHERE {condition}", condition_params, count_mode
         )
 
-        # Handle NaN values in total_citation and no_of_days_for_publish to prevent Pydantic validation errors
-        df['total_citation'] = df['total_citation'].fillna(0).astype(int)
-        if 'no_of_days_for_publish' in df.columns:
-            df['no_of_days_for_publish'] = df['no_of_days_for_publish'].fillna(0).astype(int)
-
-        has_next = offset + page_size < total
+        # Get paginated results
+        rows, has_next, next_cursor = read_page(
+            conn, f"SELECT {select_columns(conn, paper_fields)} FROM papers",
+            [condition], condition_params,
+            page_size, offset=offset, cursor=cursor, int_columns=PAPER_INT_COLUMNS
+        )
 
         response = SearchResponse(
-            papers=df.to_dict("records"),
+            papers=rows,
             total=total,
+            total_is_estimate=is_estimate,
             page=page,
             page_size=page_size,
-            has_next=has_next
+            has_next=has_next,
+            next_cursor=next_cursor
         )
+        response = EncodedJSONResponse(dump_projected(response, paper_fields, bool(fields)))
         cache[cache_key] = response
         return response
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Author search error: {e}")
         raise HTTPException(status_code=500, detail="Author search failed")
@@ -80,48 +86,63 @@ def search_authors(
 def list_authors(
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(50, ge=1, le=200, description="Items per page"),
+    count_mode: str = Query("exact", pattern=COUNT_MODE_PATTERN, description="Total count: exact | estimate | none"),
     conn: sqlite3.Connection = Depends(get_db_connection),
     cache: Cache = Depends(get_cache)
 ):
     """Get a list of unique authors for autocomplete/suggestions"""
-    cache_key = f"authors_list_{page}_{page_size}"
+    cache_key = f"authors_list_{page}_{page_size}_{count_mode}"
     if cache_key in cache:
         return cache[cache_key]
 
     try:
+        sync_author_index(conn)
         offset = (page - 1) * page_size
 
+        if has_author_index(conn):
+            # Precomputed per-author stats, read in paper_count order from its index
+            count_sql = f"FROM {AUTHOR_STATS_TABLE}"
+            query = f"""
+                SELECT author_name, paper_count, max_citations, total_citations
+                FROM {AUTHOR_STATS_TABLE}
+                ORDER BY paper_count DESC, author_norm
+                LIMIT ? OFFSET ?
+            """
+        else:
+            count_sql = """FROM (
+                SELECT DISTINCT submission_contact FROM papers
+                WHERE submission_contact IS NOT NULL AND submission_contact != ''
+            )"""
+            query = """
+                SELECT submission_contact as author_name,
+                       COUNT(*) as paper_count,
+                       MAX(total_citation) as max_citations,
+                       COALESCE(SUM(total_citation), 0) as total_citations
+                FROM papers
+                WHERE submission_contact IS NOT NULL AND submission_contact != ''
+                GROUP BY submission_contact
+                ORDER BY paper_count DESC
+                LIMIT ? OFFSET ?
+            """
+
         # Count total unique authors
-        count_query = """
-            SELECT COUNT(DISTINCT submission_contact) as total
-            FROM papers
-            WHERE submission_contact IS NOT NULL AND submission_contact != ''
-        """
-        count_df = pd.read_sql_query(count_query, conn)
-        total = int(count_df.iloc[0]['total'])
+        total, is_estimate = count_matches(conn, cache, "authors_list_total", count_sql, [], count_mode)
 
         # Get paginated list of unique authors with paper counts
-        query = """
-            SELECT submission_contact as author_name,
-                   COUNT(*) as paper_count,
-                   MAX(total_citation) as max_citations
-            FROM papers
-            WHERE submission_contact IS NOT NULL AND submission_contact != ''
-            GROUP BY submission_contact
-            ORDER BY paper_count DESC
-            LIMIT ? OFFSET ?
-        """
-        df = pd.read_sql_query(query, conn, params=(page_size, offset))
-
-        has_next = offset + page_size < total
+        rows = query_all(conn, query, (page_size + 1, offset))
+
+        has_next = len(rows) > page_size
+        rows = rows[:page_size]
 
         response = {
-            "authors": df.to_dict("records"),
+            "authors": rows,
             "total": total,
+            "total_is_estimate": is_estimate,
             "page": page,
             "page_size": page_size,
             "has_next": has_next
         }
+        response = EncodedJSONResponse(response)
         cache[cache_key] = response
         return response
 
@@ -134,52 +155,56 @@ def get_author_papers(
     author_name: str,
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(10, ge=1, le=settings.max_page_size, description="Items per page"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor"),
+    count_mode: str = Query("exact", pattern=COUNT_MODE_PATTERN, description="Total count: exact | estimate | none"),
+    fields: Optional[str] = Query(None, description="Comma-separated Paper fields to return (default: all)"),
     conn: sqlite3.Connection = Depends(get_db_connection),
     cache: Cache = Depends(get_cache)
 ):
     """Get all papers by a specific author"""
-    cache_key = f"author_papers_{author_name}_{page}_{page_size}"
+    paper_fields = parse_fields(fields)
+    cache_key = f"author_papers_{author_name}_{page}_{page_size}_{cursor}_{count_mode}_{fields_key(paper_fields, bool(fields))}"
     if cache_key in cache:
         return cache[cache_key]
 
     try:
+        sync_author_index(conn)
+        if has_author_index(conn):
+            author_norms = matching_author_norms(conn, author_name)
+            if author_norms is not None:
+                cache = cache.tagged(tuple(author_tag(author_norm) for author_norm in author_norms))
         offset = (page - 1) * page_size
 
+        condition, condition_params = author_papers_condition(conn, author_name)
+
         # Count total papers by this author
-        count_query = """
-            SELECT COUNT(*) as total
-            FROM papers
-            WHERE submission_contact LIKE ?
-        """
-        count_df = pd.read_sql_query(count_query, conn, params=(f"%{author_name}%",))
-        total = int(count_df.iloc[0]['total'])
+        total, is_estimate = count_matches(
+            conn, cache, f"author_papers_total_{author_name}",
+            f"FROM papers WHERE {condition}", condition_params, count_mode
+        )
 
         # Get paginated results
-        query = """
-            SELECT * FROM papers
-            WHERE submission_contact LIKE ?
-            ORDER BY total_citation DESC
-            LIMIT ? OFFSET ?
-        """
-        df = pd.read_sql_query(query, conn, params=(f"%{author_name}%", page_size, offset))
-
-        # Handle NaN values in total_citation and no_of_days_for_publish to prevent Pydantic validation errors
-        df['total_citation'] = df['total_citation'].fillna(0).astype(int)
-        if 'no_of_days_for_publish' in df.columns:
-            df['no_of_days_for_publish'] = df['no_of_days_for_publish'].fillna(0).astype(int)
-
-        has_next = offset + page_size < total
+        rows, has_next, next_cursor = read_page(
+            conn, f"SELECT {select_columns(conn, paper_fields)} FROM papers",
+            [condition], condition_params,
+            page_size, offset=offset, cursor=cursor, int_columns=PAPER_INT_COLUMNS
+        )
 
         response = SearchResponse(
-            papers=df.to_dict("records"),
+            papers=rows,
             total=total,
+            total_is_estimate=is_estimate,
             page=page,
             page_size=page_size,
-            has_next=has_next
+            has_next=has_next,
+            next_cursor=next_cursor
         )
+        response = EncodedJSONResponse(dump_projected(response, paper_fields, bool(fields)))
         cache[cache_key] = response
         return response
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Get author papers error: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve author papers")
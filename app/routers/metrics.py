@@ -0,0 +1,19 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.cache import cache_backend
+from app.metrics import collect_metrics
+import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter(tags=["metrics"])
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Request latency and cache metrics of all workers, in Prometheus text format"""
+    shared = []
+    if cache_backend is not None:
+        for namespace, (entries, size) in cache_backend.usage().items():
+            labels = (("cache", namespace),)
+            shared.append(("ppc_cache_l2_entries", labels, entries))
+            shared.append(("ppc_cache_l2_bytes", labels, size))
+    return PlainTextResponse(collect_metrics(shared), media_type="text/plain; version=0.0.4")
@@ -1,12 +1,26 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import JSONResponse
 import sqlite3
-import pandas as pd
-from typing import Optional, Dict, Any
-from app.database import get_db_connection
-from app.models import Paper, SearchResponse, PaperSummary
+from typing import Optional, Dict, Any, List, Tuple
+from app.database import coerce_int_columns, get_db_connection, query_all, query_column, query_one
+from app.models import PAPER_INT_COLUMNS, Paper, PaperBatchRequest, PaperBatchResponse, SearchResponse, PaperSummary
 from app.config import settings
-from app.cache import get_cache
+from app.cache import EncodedJSONResponse, encode_json, get_cache, invalidate_cache_tags
+from app.cache_tags import (
+    categorical_tags, narrowest_tags, paper_change_tags, paper_tag, query_tag, value_tags, year_tags
+)
+from app.data_version import bump_data_version, invalidate_data_version, read_generation
+from app.search import (
+    FTS_TABLE, TRIGRAM_TABLE, build_match_query, build_substring_match,
+    has_fts_index, has_trigram_index, bm25_expression
+)
+from app.pagination import COUNT_MODE_PATTERN, count_matches, read_page
+from app.filters import CATEGORICAL_COLUMNS, categorical_condition, parse_year
+from app.facets import compute_facets, parse_facets
+from app.export import EXPORT_FORMAT_PATTERN, export_response
+from app.paper_details import PAPER_DETAILS_TABLE, has_paper_details, paper_column_sql
+from app.author_index import sync_author_index
+from app.fields import EXPORT_FIELDS, PAPER_FIELDS, dump_projected, fields_key, parse_fields, select_columns
 from cachetools import Cache
 import logging
 import json
@@ -14,186 +28,319 @@ import json
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/papers", tags=["papers"])
 
+def _substring_search_condition(conn: sqlite3.Connection, query: str) -> Tuple[str, list]:
+    """WHERE condition on papers for a search without the full-text index"""
+    authors = paper_column_sql("all_authors", has_paper_details(conn))
+    pattern = f"%{query}%"
+    return f"(preprint_title LIKE ? OR preprint_doi LIKE ? OR {authors} LIKE ?)", [pattern, pattern, pattern]
+
 @router.get("/search")
 def search_papers(
     query: str = Query(..., min_length=1, description="Search query"),
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(10, ge=1, le=settings.max_page_size, description="Items per page"),
+    sort: str = Query("citations", pattern="^(citations|relevance)$", description="Sort order: citations | relevance"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor"),
+    count_mode: str = Query("exact", pattern=COUNT_MODE_PATTERN, description="Total count: exact | estimate | none"),
+    facets: Optional[str] = Query(None, description="Comma-separated facet counts to include: subject,server,country,license,year"),
+    fields: Optional[str] = Query(None, description="Comma-separated Paper fields to return (default: all)"),
     conn: sqlite3.Connection = Depends(get_db_connection),
     cache: Cache = Depends(get_cache)
 ):
-    """Search papers with pagination"""
-    cache_key = f"search_{query}_{page}_{page_size}"
+    """Search papers by title, abstract, authors or DOI with pagination"""
+    if cursor is not None and sort == "relevance":
+        raise HTTPException(status_code=400, detail="Cursor pagination is only supported for sort=citations")
+
+    facet_names = parse_facets(facets)
+    paper_fields = parse_fields(fields)
+    cache_key = f"search_{query}_{sort}_{page}_{page_size}_{cursor}_{count_mode}_{facet_names}_{fields_key(paper_fields, bool(fields))}"
     if cache_key in cache:
         return cache[cache_key]
 
     try:
+        cache = cache.tagged((query_tag(query),))
         offset = (page - 1) * page_size
-
-        # Count total results
-        count_query = """
-            SELECT COUNT(*) as total
-            FROM papers
-            WHERE preprint_title LIKE ? OR preprint_doi LIKE ? OR all_authors LIKE ?
-        """
-        count_df = pd.read_sql_query(count_query, conn, params=(f"%{query}%", f"%{query}%", f"%{query}%"))
-        total = int(count_df.iloc[0]['total'])
-
-        # Get paginated results
-        search_query = """
-            SELECT * FROM papers
-            WHERE preprint_title LIKE ? OR preprint_doi LIKE ? OR all_authors LIKE ?
-            ORDER BY total_citation DESC
-            LIMIT ? OFFSET ?
-        """
-        df = pd.read_sql_query(
-            search_query,
-            conn,
-            params=(f"%{query}%", f"%{query}%", f"%{query}%", page_size, offset)
-        )
-
-        # Handle NaN values in total_citation and no_of_days_for_publish to prevent Pydantic validation errors
-        df['total_citation'] = df['total_citation'].fillna(0).astype(int)
-        if 'no_of_days_for_publish' in df.columns:
-            df['no_of_days_for_publish'] = df['no_of_days_for_publish'].fillna(0).astype(int)
-
-        has_next = offset + page_size < total
+        count_key = f"search_total_{query}"
+        next_cursor = None
+        is_estimate = False
+        facet_counts = None
+
+        if has_fts_index(conn):
+            match_query = build_match_query(query)
+            if match_query is None:
+                total = 0
+                rows = []
+                has_next = False
+                facet_counts = {name: [] for name in facet_names} if facet_names else None
+            else:
+                # Count total results from the full-text index
+                total, is_estimate = count_matches(
+                    conn, cache, count_key,
+                    f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH ?", [match_query], count_mode
+                )
+                facet_counts = compute_facets(
+                    conn, cache, f"search_facets_{query}",
+                    f"FROM {FTS_TABLE} JOIN papers p ON p.rowid = {FTS_TABLE}.rowid WHERE {FTS_TABLE} MATCH ?",
+                    [match_query], facet_names, alias="p"
+                )
+
+                # Get paginated results ranked by citations or BM25 relevance
+                select_sql = f"SELECT {select_columns(conn, paper_fields, 'p')} FROM {FTS_TABLE} JOIN papers p ON p.rowid = {FTS_TABLE}.rowid"
+                if sort == "relevance":
+                    search_query = f"""
+                        {select_sql}
+                        WHERE {FTS_TABLE} MATCH ?
+                        ORDER BY {bm25_expression()}, p.total_citation DESC
+                        LIMIT ? OFFSET ?
+                    """
+                    rows = query_all(conn, search_query, (match_query, page_size + 1, offset), int_columns=PAPER_INT_COLUMNS)
+                    has_next = len(rows) > page_size
+                    rows = rows[:page_size]
+                else:
+                    rows, has_next, next_cursor = read_page(
+                        conn, select_sql, [f"{FTS_TABLE} MATCH ?"], [match_query],
+                        page_size, offset=offset, cursor=cursor, alias="p", int_columns=PAPER_INT_COLUMNS
+                    )
+        else:
+            # Databases built before the full-text index fall back to substring scans
+            condition, condition_params = _substring_search_condition(conn, query)
+            total, is_estimate = count_matches(
+                conn, cache, count_key, f"FROM papers WHERE {condition}", condition_params, count_mode
+            )
+            facet_counts = compute_facets(
+                conn, cache, f"search_facets_{query}",
+                f"FROM papers WHERE {condition}", condition_params, facet_names
+            )
+
+            rows, has_next, next_cursor = read_page(
+                conn,
+                f"SELECT {select_columns(conn, paper_fields)} FROM papers",
+                [condition], condition_params,
+                page_size, offset=offset, cursor=cursor, int_columns=PAPER_INT_COLUMNS
+            )
 
         response = SearchResponse(
-            papers=df.to_dict("records"),
+            papers=rows,
             total=total,
+            total_is_estimate=is_estimate,
             page=page,
             page_size=page_size,
-            has_next=has_next
+            has_next=has_next,
+            next_cursor=next_cursor,
+            facets=facet_counts
         )
+        response = EncodedJSONResponse(dump_projected(response, paper_fields, bool(fields)))
         cache[cache_key] = response
         return response
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Search error: {e}")
         raise HTTPException(status_code=500, detail="Search failed")
 
+@router.get("/export")
+def export_search_results(
+    query: str = Query(..., min_length=1, description="Search query"),
+    format: str = Query("ndjson", pattern=EXPORT_FORMAT_PATTERN, description="Export format: ndjson | csv"),
+    fields: Optional[str] = Query(None, description="Comma-separated Paper fields to export (default: all but citation and versions)"),
+    compress: bool = Query(False, description="Gzip the stream and serve it as a .gz file"),
+    conn: sqlite3.Connection = Depends(get_db_connection)
+):
+    """Stream every paper matching a search query, ordered by citations"""
+    paper_fields = parse_fields(fields, EXPORT_FIELDS)
+    try:
+        if has_fts_index(conn):
+            match_query = build_match_query(query)
+            from_sql = f"FROM {FTS_TABLE} JOIN papers p ON p.rowid = {FTS_TABLE}.rowid"
+            # A query without searchable terms matches nothing
+            conditions = [f"{FTS_TABLE} MATCH ?"] if match_query is not None else ["1 = 0"]
+            params = [match_query] if match_query is not None else []
+            alias = "p"
+        else:
+            from_sql = "FROM papers"
+            condition, params = _substring_search_condition(conn, query)
+            conditions = [condition]
+            alias = None
+        return export_response(conn, from_sql, conditions, params, paper_fields, format, compress, "papers_search", alias=alias)
+    except Exception as e:
+        logger.error(f"Search export error: {e}")
+        raise HTTPException(status_code=500, detail="Search export failed")
+
+def _advanced_search_conditions(conn: sqlite3.Connection, search_criteria: Dict[str, Any]) -> Tuple[List[str], list]:
+    """WHERE conditions and parameters selecting the papers that match advanced search criteria"""
+    conditions = []
+    params = []
+
+    # Year range
+    year_from = parse_year(search_criteria.get('year_from'), "year_from")
+    year_to = parse_year(search_criteria.get('year_to'), "year_to")
+    if year_from is not None and year_to is not None:
+        conditions.append("sub_year BETWEEN ? AND ?")
+        params.extend([year_from, year_to])
+    elif year_from is not None:
+        conditions.append("sub_year >= ?")
+        params.append(year_from)
+    elif year_to is not None:
+        conditions.append("sub_year <= ?")
+        params.append(year_to)
+
+    # Month filtering (format: YYYY-MM)
+    if search_criteria.get('month'):
+        # Extract year and month from YYYY-MM format
+        try:
+            year_month = search_criteria['month']
+            if len(year_month) == 7 and year_month[4] == '-':  # YYYY-MM format
+                conditions.append("sub_ym = ?")
+                params.append(int(year_month[:4]) * 100 + int(year_month[5:7]))
+        except (ValueError, IndexError):
+            # If month format is invalid, ignore this filter
+            pass
+
+    # Substring filters on free-text columns
+    split = has_paper_details(conn)
+    substring_filters = {}
+    for criterion, column in (
+        ('subject', 'preprint_subject'),
+        ('server', 'preprint_server'),
+        ('country', 'country_name'),
+        ('authors', 'all_authors'),
+        ('institution', 'corresponding_institution'),
+        ('license', 'submission_license'),
+    ):
+        if not search_criteria.get(criterion):
+            continue
+        value = str(search_criteria[criterion])
+        if column in CATEGORICAL_COLUMNS:
+            # Few distinct values: resolve the substring to exact values in memory
+            condition, condition_params = categorical_condition(conn, column, value)
+            conditions.append(condition)
+            params.extend(condition_params)
+        else:
+            conditions.append(f"{paper_column_sql(column, split)} LIKE ?")
+            params.append(f"%{value}%")
+            substring_filters[column] = value
+
+    # The trigram index narrows the candidates to rows containing every
+    # substring; the LIKE conditions above still decide the final match
+    match = build_substring_match(substring_filters) if has_trigram_index(conn) else None
+    if match:
+        conditions.insert(0, f"rowid IN (SELECT rowid FROM {TRIGRAM_TABLE} WHERE {TRIGRAM_TABLE} MATCH ?)")
+        params.insert(0, match)
+
+    # Citation range
+    if search_criteria.get('citation_min') is not None:
+        conditions.append("total_citation >= ?")
+        params.append(search_criteria['citation_min'])
+    if search_criteria.get('citation_max') is not None:
+        conditions.append("total_citation <= ?")
+        params.append(search_criteria['citation_max'])
+    return conditions, params
+
+def _advanced_search_tags(conn: sqlite3.Connection, search_criteria: Dict[str, Any]) -> Tuple[str, ...]:
+    """Cache tags of an advanced search result: the narrowest of its categorical and date filters"""
+    candidates = [
+        categorical_tags(conn, column, search_criteria.get(criterion))
+        for criterion, column in (
+            ('subject', 'preprint_subject'),
+            ('server', 'preprint_server'),
+            ('country', 'country_name'),
+            ('license', 'submission_license'),
+        )
+    ]
+    candidates.append(year_tags(
+        parse_year(search_criteria.get('year_from'), "year_from"),
+        parse_year(search_criteria.get('year_to'), "year_to")
+    ))
+    year_month = search_criteria.get('month')
+    if isinstance(year_month, str) and len(year_month) == 7 and year_month[:4].isdigit():
+        candidates.append(value_tags("sub_year", [int(year_month[:4])]))
+    return narrowest_tags(*candidates)
+
 @router.post("/advanced-search")
 def advanced_search_papers(
     search_criteria: Dict[str, Any],
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(10, ge=1, le=settings.max_page_size, description="Items per page"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor"),
+    count_mode: str = Query("exact", pattern=COUNT_MODE_PATTERN, description="Total count: exact | estimate | none"),
+    facets: Optional[str] = Query(None, description="Comma-separated facet counts to include: subject,server,country,license,year"),
+    fields: Optional[str] = Query(None, description="Comma-separated Paper fields to return (default: all)"),
     conn: sqlite3.Connection = Depends(get_db_connection),
     cache: Cache = Depends(get_cache)
 ):
     """Advanced search with multiple criteria and operators"""
-    cache_key = f"advanced_search_{json.dumps(search_criteria, sort_keys=True)}_{page}_{page_size}"
+    criteria_key = json.dumps(search_criteria, sort_keys=True)
+    facet_names = parse_facets(facets)
+    paper_fields = parse_fields(fields)
+    cache_key = f"advanced_search_{criteria_key}_{page}_{page_size}_{cursor}_{count_mode}_{facet_names}_{fields_key(paper_fields, bool(fields))}"
     if cache_key in cache:
         return cache[cache_key]
 
     try:
+        cache = cache.tagged(_advanced_search_tags(conn, search_criteria))
         offset = (page - 1) * page_size
 
-        # Build WHERE clause from search criteria
-        conditions = []
-        params = []
-
-        # Year range
-        if search_criteria.get('year_from') or search_criteria.get('year_to'):
-            if search_criteria.get('year_from') and search_criteria.get('year_to'):
-                conditions.append("strftime('%Y', preprint_submission_date) BETWEEN ? AND ?")
-                params.extend([search_criteria['year_from'], search_criteria['year_to']])
-            elif search_criteria.get('year_from'):
-                conditions.append("strftime('%Y', preprint_submission_date) >= ?")
-                params.append(search_criteria['year_from'])
-            elif search_criteria.get('year_to'):
-                conditions.append("strftime('%Y', preprint_submission_date) <= ?")
-                params.append(search_criteria['year_to'])
-
-        # Month filtering (format: YYYY-MM)
-        if search_criteria.get('month'):
-            # Extract year and month from YYYY-MM format
-            try:
-                year_month = search_criteria['month']
-                if len(year_month) == 7 and year_month[4] == '-':  # YYYY-MM format
-                    year = year_month[:4]
-                    month = year_month[5:7]
-                    conditions.append("strftime('%Y', preprint_submission_date) = ? AND strftime('%m', preprint_submission_date) = ?")
-                    params.extend([year, month])
-            except (ValueError, IndexError):
-                # If month format is invalid, ignore this filter
-                pass
-
-        # Subject
-        if search_criteria.get('subject'):
-            conditions.append("preprint_subject LIKE ?")
-            params.append(f"%{search_criteria['subject']}%")
-
-        # Server
-        if search_criteria.get('server'):
-            conditions.append("preprint_server LIKE ?")
-            params.append(f"%{search_criteria['server']}%")
-
-        # Country
-        if search_criteria.get('country'):
-            conditions.append("country_name LIKE ?")
-            params.append(f"%{search_criteria['country']}%")
-
-        # Authors
-        if search_criteria.get('authors'):
-            conditions.append("all_authors LIKE ?")
-            params.append(f"%{search_criteria['authors']}%")
-
-        # Institution
-        if search_criteria.get('institution'):
-            conditions.append("corresponding_institution LIKE ?")
-            params.append(f"%{search_criteria['institution']}%")
-
-        # License
-        if search_criteria.get('license'):
-            conditions.append("submission_license LIKE ?")
-            params.append(f"%{search_criteria['license']}%")
-
-        # Citation range
-        if search_criteria.get('citation_min') is not None:
-            conditions.append("total_citation >= ?")
-            params.append(search_criteria['citation_min'])
-        if search_criteria.get('citation_max') is not None:
-            conditions.append("total_citation <= ?")
-            params.append(search_criteria['citation_max'])
+        conditions, params = _advanced_search_conditions(conn, search_criteria)
 
         # Build WHERE clause
         where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
 
         # Count total results
-        count_query = f"SELECT COUNT(*) as total FROM papers{where_clause}"
-        count_df = pd.read_sql_query(count_query, conn, params=params)
-        total = int(count_df.iloc[0]['total'])
+        total, is_estimate = count_matches(
+            conn, cache, f"advanced_search_total_{criteria_key}",
+            f"FROM papers{where_clause}", params, count_mode
+        )
+        facet_counts = compute_facets(
+            conn, cache, f"advanced_search_facets_{criteria_key}",
+            f"FROM papers{where_clause}", params, facet_names
+        )
 
         # Get paginated results
-        query = f"""
-            SELECT * FROM papers{where_clause}
-            ORDER BY total_citation DESC
-            LIMIT ? OFFSET ?
-        """
-        df = pd.read_sql_query(query, conn, params=params + [page_size, offset])
-
-        # Handle NaN values in total_citation and no_of_days_for_publish to prevent Pydantic validation errors
-        df['total_citation'] = df['total_citation'].fillna(0).astype(int)
-        if 'no_of_days_for_publish' in df.columns:
-            df['no_of_days_for_publish'] = df['no_of_days_for_publish'].fillna(0).astype(int)
-
-        has_next = offset + page_size < total
+        rows, has_next, next_cursor = read_page(
+            conn, f"SELECT {select_columns(conn, paper_fields)} FROM papers", conditions, params,
+            page_size, offset=offset, cursor=cursor, int_columns=PAPER_INT_COLUMNS
+        )
 
         response = SearchResponse(
-            papers=df.to_dict("records"),
+            papers=rows,
             total=total,
+            total_is_estimate=is_estimate,
             page=page,
             page_size=page_size,
-            has_next=has_next
+            has_next=has_next,
+            next_cursor=next_cursor,
+            facets=facet_counts
         )
+        response = EncodedJSONResponse(dump_projected(response, paper_fields, bool(fields)))
         cache[cache_key] = response
         return response
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Advanced search error: {e}")
         raise HTTPException(status_code=500, detail="Advanced search failed")
 
+@router.post("/advanced-search/export")
+def export_advanced_search_results(
+    search_criteria: Dict[str, Any],
+    format: str = Query("ndjson", pattern=EXPORT_FORMAT_PATTERN, description="Export format: ndjson | csv"),
+    fields: Optional[str] = Query(None, description="Comma-separated Paper fields to export (default: all but citation and versions)"),
+    compress: bool = Query(False, description="Gzip the stream and serve it as a .gz file"),
+    conn: sqlite3.Connection = Depends(get_db_connection)
+):
+    """Stream every paper matching advanced search criteria, ordered by citations"""
+    paper_fields = parse_fields(fields, EXPORT_FIELDS)
+    try:
+        conditions, params = _advanced_search_conditions(conn, search_criteria)
+        return export_response(conn, "FROM papers", conditions, params, paper_fields, format, compress, "papers_advanced_search")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Advanced search export error: {e}")
+        raise HTTPException(status_code=500, detail="Advanced search export failed")
+
 @router.get("/subjects")
 def get_subjects(conn: sqlite3.Connection = Depends(get_db_connection), cache: Cache = Depends(get_cache)):
     """Get unique subjects for filter dropdown"""
@@ -203,10 +350,10 @@ def get_subjects(conn: sqlite3.Connection = Depends(get_db_connection), cache: C
 
     try:
         query = "SELECT DISTINCT preprint_subject FROM papers WHERE preprint_subject IS NOT NULL AND preprint_subject != '' ORDER BY preprint_subject"
-        df = pd.read_sql_query(query, conn)
-        subjects = df['preprint_subject'].tolist()
-        cache[cache_key] = subjects
-        return subjects
+        subjects = query_column(conn, query)
+        response = EncodedJSONResponse(subjects)
+        cache[cache_key] = response
+        return response
     except Exception as e:
         logger.error(f"Get subjects error: {e}")
         raise HTTPException(status_code=500, detail="Failed to get subjects")
@@ -220,10 +367,10 @@ def get_servers(conn: sqlite3.Connection = Depends(get_db_connection), cache: Ca
 
     try:
         query = "SELECT DISTINCT preprint_server FROM papers WHERE preprint_server IS NOT NULL AND preprint_server != '' ORDER BY preprint_server"
-        df = pd.read_sql_query(query, conn)
-        servers = df['preprint_server'].tolist()
-        cache[cache_key] = servers
-        return servers
+        servers = query_column(conn, query)
+        response = EncodedJSONResponse(servers)
+        cache[cache_key] = response
+        return response
     except Exception as e:
         logger.error(f"Get servers error: {e}")
         raise HTTPException(status_code=500, detail="Failed to get servers")
@@ -237,10 +384,10 @@ def get_countries(conn: sqlite3.Connection = Depends(get_db_connection), cache:
 
     try:
         query = "SELECT DISTINCT country_name FROM papers WHERE country_name IS NOT NULL AND country_name != '' ORDER BY country_name"
-        df = pd.read_sql_query(query, conn)
-        countries = df['country_name'].tolist()
-        cache[cache_key] = countries
-        return countries
+        countries = query_column(conn, query)
+        response = EncodedJSONResponse(countries)
+        cache[cache_key] = response
+        return response
     except Exception as e:
         logger.error(f"Get countries error: {e}")
         raise HTTPException(status_code=500, detail="Failed to get countries")
@@ -254,34 +401,18 @@ def get_licenses(conn: sqlite3.Connection = Depends(get_db_connection), cache: C
 
     try:
         query = "SELECT DISTINCT submission_license FROM papers WHERE submission_license IS NOT NULL AND submission_license != '' ORDER BY submission_license"
-        df = pd.read_sql_query(query, conn)
-        licenses = df['submission_license'].tolist()
-        cache[cache_key] = licenses
-        return licenses
+        licenses = query_column(conn, query)
+        response = EncodedJSONResponse(licenses)
+        cache[cache_key] = response
+        return response
     except Exception as e:
         logger.error(f"Get licenses error: {e}")
         raise HTTPException(status_code=500, detail="Failed to get licenses")
 
-@router.get("/{ppc_id}")
-def get_paper(ppc_id: str, conn: sqlite3.Connection = Depends(get_db_connection), cache: Cache = Depends(get_cache)):
-    """Get a specific paper by PPC_Id"""
-    cache_key = f"paper_{ppc_id}"
-    if cache_key in cache:
-        return cache[cache_key]
-
-    try:
-        query = "SELECT * FROM papers WHERE PPC_Id = ?"
-        df = pd.read_sql_query(query, conn, params=(ppc_id,))
-
-        if df.empty:
-            raise HTTPException(status_code=404, detail="Paper not found")
-
-        # Handle NaN values in total_citation and no_of_days_for_publish to prevent Pydantic validation errors
-        df['total_citation'] = df['total_citation'].fillna(0).astype(int)
-        if 'no_of_days_for_publish' in df.columns:
-            df['no_of_days_for_publish'] = df['no_of_days_for_publish'].fillna(0).astype(int)
-
-        row = df.iloc[0].to_dict()
+def _papers_from_rows(rows: List[Dict[str, Any]]) -> List[Paper]:
+    """Build full Paper models from rows selected from papers"""
+    papers = []
+    for row in coerce_int_columns(rows, PAPER_INT_COLUMNS):
         # Ensure all expected fields exist (fallbacks)
         row.setdefault('publication_date', row.get('preprint_submission_date'))
         row.setdefault('preprint_abstract', row.get('preprint_abstract'))
@@ -290,10 +421,72 @@ def get_paper(ppc_id: str, conn: sqlite3.Connection = Depends(get_db_connection)
         row.setdefault('submission_contact', row.get('submission_contact'))
         row.setdefault('corresponding_institution', row.get('corresponding_institution'))
         row.setdefault('published_DOI', row.get('published_DOI'))
+        papers.append(Paper(**row))
+    return papers
+
+@router.post("/batch", response_model=PaperBatchResponse)
+def get_papers_batch(
+    request: PaperBatchRequest,
+    conn: sqlite3.Connection = Depends(get_db_connection),
+    cache: Cache = Depends(get_cache)
+):
+    """Get many papers by PPC_Id in one request, in the order requested"""
+    ids = list(dict.fromkeys(request.ids))
+
+    try:
+        # Serve what the per-paper cache already holds, fetch the rest in one lookup
+        found = {}
+        for ppc_id in ids:
+            cache_key = f"paper_{ppc_id}"
+            if cache_key in cache:
+                found[ppc_id] = cache[cache_key]
+
+        to_fetch = [ppc_id for ppc_id in ids if ppc_id not in found]
+        if to_fetch:
+            placeholders = ",".join(["?"] * len(to_fetch))
+            query = f"SELECT {select_columns(conn, PAPER_FIELDS)} FROM papers WHERE PPC_Id IN ({placeholders})"
+            for paper in _papers_from_rows(query_all(conn, query, to_fetch)):
+                if paper.PPC_Id not in found:
+                    # Compressed variants are left to single-paper requests
+                    found[paper.PPC_Id] = EncodedJSONResponse(paper, compress=False)
+                    cache.tagged((paper_tag(paper.PPC_Id),))[f"paper_{paper.PPC_Id}"] = found[paper.PPC_Id]
+
+        # Splice the cached paper bodies into a PaperBatchResponse document
+        papers = b",".join(found[ppc_id].body for ppc_id in ids if ppc_id in found)
+        missing = encode_json([ppc_id for ppc_id in ids if ppc_id not in found])
+        return EncodedJSONResponse(body=b'{"papers":[' + papers + b'],"missing":' + missing + b"}")
+
+    except Exception as e:
+        logger.error(f"Batch get papers error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to retrieve papers")
+
+@router.get("/{ppc_id}")
+def get_paper(
+    ppc_id: str,
+    fields: Optional[str] = Query(None, description="Comma-separated Paper fields to return (default: all)"),
+    conn: sqlite3.Connection = Depends(get_db_connection),
+    cache: Cache = Depends(get_cache)
+):
+    """Get a specific paper by PPC_Id"""
+    paper_fields = parse_fields(fields)
+    # Full papers keep the plain key, which POST /batch reads as well
+    projection = fields_key(paper_fields)
+    cache_key = f"paper_{ppc_id}" if projection == "all" else f"paper_{ppc_id}_{projection}"
+    if cache_key in cache:
+        return cache[cache_key]
 
-        paper = Paper(**row)
-        cache[cache_key] = paper
-        return paper
+    try:
+        cache = cache.tagged((paper_tag(ppc_id),))
+        query = f"SELECT {select_columns(conn, paper_fields)} FROM papers WHERE PPC_Id = ?"
+        row = query_one(conn, query, (ppc_id,))
+
+        if row is None:
+            raise HTTPException(status_code=404, detail="Paper not found")
+
+        paper = _papers_from_rows([row])[0]
+        response = EncodedJSONResponse(dump_projected(paper, paper_fields, bool(fields)))
+        cache[cache_key] = response
+        return response
         
     except HTTPException:
         raise
@@ -301,6 +494,12 @@ def get_paper(ppc_id: str, conn: sqlite3.Connection = Depends(get_db_connection)
         logger.error(f"Get paper error: {e}")
         raise HTTPException(status_code=500, detail="Failed to retrieve paper")
 
+# Default projection of the filtered listing
+FETCH_FIELDS = (
+    "PPC_Id", "preprint_title", "total_citation", "preprint_submission_date", "all_authors",
+    "preprint_subject", "preprint_server", "country_name"
+)
+
 @router.get("/")
 def fetch_papers(
     country: Optional[str] = None,
@@ -308,72 +507,85 @@ def fetch_papers(
     subject: Optional[str] = None,
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=settings.max_page_size),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from a previous page's next_cursor"),
+    count_mode: str = Query("exact", pattern=COUNT_MODE_PATTERN, description="Total count: exact | estimate | none"),
+    fields: Optional[str] = Query(None, description="Comma-separated Paper fields to return (default: summary fields)"),
     conn: sqlite3.Connection = Depends(get_db_connection),
     cache: Cache = Depends(get_cache)
 ):
     """Fetch papers with filters and pagination"""
-    params_dict = {"country": country, "year": year, "subject": subject, "page": page, "page_size": page_size}
+    paper_fields = parse_fields(fields, FETCH_FIELDS)
+    filters_dict = {"country": country, "year": year, "subject": subject}
+    params_dict = {
+        **filters_dict, "page": page, "page_size": page_size, "cursor": cursor, "count_mode": count_mode,
+        "fields": fields_key(paper_fields, bool(fields))
+    }
     cache_key = "fetch_" + json.dumps(params_dict, sort_keys=True)
     if cache_key in cache:
         return cache[cache_key]
 
     try:
+        cache = cache.tagged(narrowest_tags(
+            categorical_tags(conn, "country_name", country),
+            value_tags("sub_year", [year]) if year else None,
+            categorical_tags(conn, "preprint_subject", subject)
+        ))
+
         # Build dynamic query
         conditions = []
         params = []
         
         if country:
-            conditions.append("country_name LIKE ?")
-            params.append(f"%{country}%")
+            condition, condition_params = categorical_condition(conn, "country_name", country)
+            conditions.append(condition)
+            params.extend(condition_params)
             
         if year:
-            conditions.append("strftime('%Y', preprint_submission_date) = ?")
-            params.append(str(year))
+            conditions.append("sub_year = ?")
+            params.append(year)
             
         if subject:
-            conditions.append("preprint_subject LIKE ?")
-            params.append(f"%{subject}%")
+            condition, condition_params = categorical_condition(conn, "preprint_subject", subject)
+            conditions.append(condition)
+            params.extend(condition_params)
         
         where_clause = " WHERE " + " AND ".join(conditions) if conditions else ""
         
         # Count total
-        count_query = f"SELECT COUNT(*) as total FROM papers{where_clause}"
-        count_df = pd.read_sql_query(count_query, conn, params=params)
-        total = int(count_df.iloc[0]['total'])
+        total, is_estimate = count_matches(
+            conn, cache, "fetch_total_" + json.dumps(filters_dict, sort_keys=True),
+            f"FROM papers{where_clause}", params, count_mode
+        )
         
         # Get paginated results
         offset = (page - 1) * page_size
-        query = f"""
-            SELECT PPC_Id, preprint_title, total_citation, preprint_submission_date, all_authors, preprint_subject, preprint_server, country_name
-            FROM papers{where_clause}
-            ORDER BY total_citation DESC
-            LIMIT ? OFFSET ?
-        """
-        df = pd.read_sql_query(query, conn, params=params + [page_size, offset])
-
-        # Handle NaN values in total_citation and no_of_days_for_publish to prevent Pydantic validation errors
-        df['total_citation'] = df['total_citation'].fillna(0).astype(int)
-        if 'no_of_days_for_publish' in df.columns:
-            df['no_of_days_for_publish'] = df['no_of_days_for_publish'].fillna(0).astype(int)
-
-        has_next = offset + page_size < total
+        rows, has_next, next_cursor = read_page(
+            conn, f"SELECT {select_columns(conn, paper_fields)} FROM papers",
+            conditions, params,
+            page_size, offset=offset, cursor=cursor, int_columns=PAPER_INT_COLUMNS
+        )
 
         response = SearchResponse(
-            papers=df.to_dict("records"),
+            papers=rows,
             total=total,
+            total_is_estimate=is_estimate,
             page=page,
             page_size=page_size,
-            has_next=has_next
+            has_next=has_next,
+            next_cursor=next_cursor
         )
+        response = EncodedJSONResponse(dump_projected(response, paper_fields, bool(fields)))
         cache[cache_key] = response
         return response
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Fetch papers error: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch papers")
 
 @router.delete("/{ppc_id}", status_code=204)
-def delete_paper(ppc_id: str, conn: sqlite3.Connection = Depends(get_db_connection), cache: Cache = Depends(get_cache)):
+def delete_paper(ppc_id: str, conn: sqlite3.Connection = Depends(get_db_connection)):
     """Delete a paper by PPC_Id"""
     try:
         # First, check if the paper exists
@@ -384,18 +596,25 @@ def delete_paper(ppc_id: str, conn: sqlite3.Connection = Depends(get_db_connecti
         if not paper:
             raise HTTPException(status_code=404, detail="Paper not found")
 
+        # Collect the cache tags while the row still says where the paper is filed
+        # (and its authors are indexed)
+        sync_author_index(conn)
+        tags = paper_change_tags(conn, ppc_id)
+
         # If it exists, delete it
         cursor.execute("DELETE FROM papers WHERE PPC_Id = ?", (ppc_id,))
+        if has_paper_details(conn):
+            # After papers, so the text-index triggers still see the old text
+            cursor.execute(f"DELETE FROM {PAPER_DETAILS_TABLE} WHERE PPC_Id = ?", (ppc_id,))
+        # The DELETE holds the write lock, so no other write lands between these reads
+        old_generation = read_generation(conn)
+        bump_data_version(conn)
+        new_generation = read_generation(conn)
         conn.commit()
+        invalidate_data_version()
 
-        # Invalidate cache for the deleted paper and any relevant search results
-        cache_key_paper = f"paper_{ppc_id}"
-        if cache_key_paper in cache:
-            del cache[cache_key_paper]
-        
-        # A simple approach to cache invalidation for searches: clear the whole cache
-        # A more sophisticated approach would be to remove specific entries that contain the deleted paper
-        cache.clear()
+        # Drop the cached results that could include the paper, in every worker
+        invalidate_cache_tags(tags, old_generation, new_generation)
 
         return JSONResponse(status_code=204, content=None)
 
@@ -1,31 +1,28 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import JSONResponse
+from functools import partial
 import sqlite3
-import pandas as pd
 from typing import Optional
-from app.database import get_db_connection
+from app.cache import EncodedJSONResponse, TieredCache, get_analytics_cache
+from app.cache_tags import categorical_tags, narrowest_tags, value_tags
+from app.columnar import columnar_enabled, get_columnar_papers, group_rows, month_labels, sql_order, year_labels
+from app.database import get_db_connection, query_all, query_one
+from app.filters import MONTH_LABEL, YEAR_LABEL, categorical_condition, time_range_start_year
+from app.rollup import rollup_source
 import logging
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/subjects", tags=["subjects"])
 
 
-def _build_time_subject_filters(time_range: str, subject: Optional[str], subjects_csv: Optional[str]):
+def _build_time_subject_filters(conn: sqlite3.Connection, time_range: str, subject: Optional[str], subjects_csv: Optional[str]):
     params = []
     time_filter = ""
     subject_filter = ""
 
-    if time_range != "all":
-        current_year = pd.Timestamp.now().year
-        if time_range == "last_year":
-            time_filter = " AND strftime('%Y', preprint_submission_date) >= ?"
-            params.append(str(current_year - 1))
-        elif time_range == "last_5_years":
-            time_filter = " AND strftime('%Y', preprint_submission_date) >= ?"
-            params.append(str(current_year - 5))
-        elif time_range == "last_10_years":
-            time_filter = " AND strftime('%Y', preprint_submission_date) >= ?"
-            params.append(str(current_year - 10))
+    start_year = time_range_start_year(time_range)
+    if start_year is not None:
+        time_filter = " AND sub_year >= ?"
+        params.append(start_year)
 
     if subjects_csv:
         subjects_list = [s.strip() for s in subjects_csv.split(',') if s.strip()]
@@ -34,195 +31,296 @@ def _build_time_subject_filters(time_range: str, subject: Optional[str], subject
             subject_filter = f" AND preprint_subject IN ({placeholders})"
             params.extend(subjects_list)
     elif subject:
-        subject_filter = " AND preprint_subject LIKE ?"
-        params.append(f"%{subject}%")
+        condition, condition_params = categorical_condition(conn, "preprint_subject", subject)
+        subject_filter = f" AND {condition}"
+        params.extend(condition_params)
 
     return time_filter, subject_filter, params
 
+def _subject_tags(conn: sqlite3.Connection, subject: Optional[str], subjects_csv: Optional[str]):
+    """Cache tags matching the subject filter built by _build_time_subject_filters"""
+    subjects_list = [s.strip() for s in subjects_csv.split(',') if s.strip()] if subjects_csv else []
+    if subjects_list:
+        return value_tags("preprint_subject", subjects_list)
+    if subjects_csv:
+        return narrowest_tags()
+    return narrowest_tags(categorical_tags(conn, "preprint_subject", subject))
 
-@router.get("/analysis")
-def get_subject_analysis(
-    time_range: str = Query("all", description="Time range filter: all | last_year | last_5_years | last_10_years"),
-    subject: Optional[str] = Query(None, description="Subject filter (substring match)"),
-    subjects: Optional[str] = Query(None, description="CSV of subjects for comparison, e.g., 'bioinformatics,neuroscience'"),
-    top: int = Query(10, ge=1, le=50, description="Top N subjects to include when no specific subject is selected"),
-    conn: sqlite3.Connection = Depends(get_db_connection)
-):
-    """Unified endpoint that returns subject evolution, citations ranking, and version analysis."""
-    try:
-        time_filter, subject_filter, params = _build_time_subject_filters(time_range, subject, subjects)
+def _subject_analysis_columnar(conn: sqlite3.Connection, time_range: str, subject: Optional[str], subjects_csv: Optional[str]):
+    """Rows of the subject analysis queries from the columnar engine, before the selected-subject filtering"""
+    papers = get_columnar_papers(conn)
+    mask = papers.dated.copy()
+
+    start_year = time_range_start_year(time_range)
+    if start_year is not None:
+        mask &= papers.column("sub_year") >= start_year
+
+    subjects_list = [s.strip() for s in subjects_csv.split(',') if s.strip()] if subjects_csv else []
+    if subjects_list:
+        mask &= papers.in_values("preprint_subject", subjects_list)
+    elif subject and not subjects_csv:
+        mask &= papers.contains(conn, "preprint_subject", subject)
+
+    with_subject = mask & papers.not_empty("preprint_subject")
+    with_citations = with_subject & papers.not_null("total_citation")
+    with_versions = mask & papers.not_null("version_count")
+
+    groups = papers.group_by(with_citations, "preprint_subject")
+    fields = {
+        "subject": groups.key("preprint_subject"),
+        "paper_count": groups.count(),
+        "total_citation": groups.sum("total_citation"),
+        "avg_citation": groups.avg("total_citation", 2),
+    }
+    ranking_rows = group_rows(fields, sql_order(groups.size, (fields["total_citation"], True), (fields["subject"], False)))
+
+    groups = papers.group_by(with_subject, "sub_year", "preprint_subject")
+    fields = {"year": year_labels(groups.key("sub_year")), "subject": groups.key("preprint_subject"), "count": groups.count()}
+    evolution_rows = group_rows(fields, sql_order(groups.size, (groups.key("sub_year"), False), (fields["subject"], False)))
+
+    groups = papers.group_by(with_versions, "version_count")
+    fields = {"versions": groups.key("version_count"), "count": groups.count()}
+    version_rows = group_rows(fields, sql_order(groups.size, (fields["versions"], False)))
+
+    groups = papers.group_by(with_versions, "preprint_subject", "version_count")
+    fields = {"subject": groups.key("preprint_subject"), "versions": groups.key("version_count"), "count": groups.count()}
+    version_by_subject_rows = group_rows(fields, sql_order(groups.size, (fields["subject"], False), (fields["versions"], False)))
+
+    groups = papers.group_by(with_versions)
+    summary = {
+        "total_papers": groups.count()[0],
+        "multi_version_papers": groups.count_if(papers.column("version_count") >= 2)[0],
+    }
+
+    groups = papers.group_by(with_subject, "sub_ym", "preprint_subject")
+    fields = {"month": month_labels(groups.key("sub_ym")), "subject": groups.key("preprint_subject"), "count": groups.count()}
+    monthly_rows = group_rows(fields, sql_order(groups.size, (groups.key("sub_ym"), False), (fields["subject"], False)))
+
+    groups = papers.group_by(with_subject & papers.not_empty("preprint_server"), "preprint_subject", "preprint_server")
+    fields = {"subject": groups.key("preprint_subject"), "server": groups.key("preprint_server"), "count": groups.count()}
+    order = sql_order(groups.size, (fields["subject"], False), (fields["count"], True), (fields["server"], False))
+    server_rows = group_rows(fields, order)
+
+    groups = papers.group_by(with_citations, "sub_year", "preprint_subject")
+    fields = {
+        "year": year_labels(groups.key("sub_year")),
+        "subject": groups.key("preprint_subject"),
+        "paper_count": groups.count(),
+        "avg_citation": groups.avg("total_citation", 2),
+        "max_citation": groups.max("total_citation"),
+    }
+    citation_growth_rows = group_rows(fields, sql_order(groups.size, (groups.key("sub_year"), False), (fields["subject"], False)))
+
+    return (
+        ranking_rows, evolution_rows, version_rows, version_by_subject_rows,
+        summary, monthly_rows, server_rows, citation_growth_rows,
+    )
+
+
+def compute_subject_analysis(
+    conn: sqlite3.Connection,
+    time_range: str,
+    subject: Optional[str],
+    subjects: Optional[str],
+    top: int,
+) -> EncodedJSONResponse:
+    """Subject evolution, citation ranking, version analysis, monthly trends, servers and citation growth"""
+    if columnar_enabled("subject-analysis"):
+        (
+            ranking_rows, evolution_rows, version_rows, version_by_subject_rows,
+            summary, monthly_rows, server_rows, citation_growth_rows,
+        ) = _subject_analysis_columnar(conn, time_range, subject, subjects)
+    else:
+        time_filter, subject_filter, params = _build_time_subject_filters(conn, time_range, subject, subjects)
+        # Every query reads the monthly rollup (or papers aggregated the same way)
+        filtered_dimensions = ("dated", "sub_year", "preprint_subject")
 
         # 1) Subject Citation Ranking (sum and average citations per subject)
         ranking_query = f"""
             SELECT preprint_subject AS subject,
-                   COUNT(*) AS paper_count,
-                   COALESCE(SUM(total_citation), 0) AS total_citation,
-                   ROUND(COALESCE(AVG(total_citation), 0), 2) AS avg_citation
-            FROM papers
+                   SUM(citation_count) AS paper_count,
+                   COALESCE(SUM(citation_sum), 0) AS total_citation,
+                   ROUND(COALESCE(SUM(citation_sum) * 1.0 / SUM(citation_count), 0), 2) AS avg_citation
+            FROM {rollup_source(conn, filtered_dimensions)}
             WHERE preprint_subject IS NOT NULL AND preprint_subject != ''
-              AND total_citation IS NOT NULL
-              AND preprint_submission_date IS NOT NULL
+              AND citation_count > 0
+              AND dated = 1
               {time_filter}
               {subject_filter}
             GROUP BY preprint_subject
-            ORDER BY total_citation DESC
+            ORDER BY total_citation DESC, preprint_subject
         """
-        ranking_df = pd.read_sql_query(ranking_query, conn, params=params)
-
-        # Determine selected subjects
-        subjects_list = [s.strip() for s in subjects.split(',')] if subjects else []
-        selected_subjects = None
-        if subjects_list:
-            available = set(ranking_df['subject'].unique().tolist())
-            selected_subjects = set([s for s in subjects_list if s in available])
-        elif subject:
-            selected_subjects = set(ranking_df['subject'].unique().tolist())
-        else:
-            selected_subjects = set(ranking_df.head(top)['subject'].tolist())
+        ranking_rows = query_all(conn, ranking_query, params)
 
         # 2) Subject Evolution: yearly counts by subject (limited to selected subjects)
         evolution_query = f"""
-            SELECT strftime('%Y', preprint_submission_date) AS year,
+            SELECT {YEAR_LABEL} AS year,
                    preprint_subject AS subject,
-                   COUNT(*) AS count
-            FROM papers
-            WHERE preprint_submission_date IS NOT NULL
+                   SUM(paper_count) AS count
+            FROM {rollup_source(conn, filtered_dimensions)}
+            WHERE dated = 1
               AND preprint_subject IS NOT NULL AND preprint_subject != ''
               {time_filter}
               {subject_filter}
-            GROUP BY strftime('%Y', preprint_submission_date), preprint_subject
-            ORDER BY year, subject
+            GROUP BY sub_year, preprint_subject
+            ORDER BY sub_year, subject
         """
-        evolution_df = pd.read_sql_query(evolution_query, conn, params=params)
-
-        if not evolution_df.empty and selected_subjects:
-            evolution_df = evolution_df[evolution_df['subject'].isin(list(selected_subjects))]
+        evolution_rows = query_all(conn, evolution_query, params)
 
         # 3) Version Analysis: histogram of version counts
-        # Use SQLite JSON1 function json_array_length to compute version count
+        versions = rollup_source(conn, filtered_dimensions + ("version_count",))
         version_query = f"""
-            SELECT json_array_length(versions) AS versions,
-                   COUNT(*) AS count
-            FROM papers
-            WHERE versions IS NOT NULL
-              AND preprint_submission_date IS NOT NULL
+            SELECT version_count AS versions,
+                   SUM(paper_count) AS count
+            FROM {versions}
+            WHERE version_count IS NOT NULL
+              AND dated = 1
               {time_filter}
               {subject_filter}
-            GROUP BY json_array_length(versions)
+            GROUP BY version_count
             ORDER BY versions
         """
-        # For safety, if JSON1 is not available, this query would fail; we assume JSON1 is enabled as DB created locally.
-        version_df = pd.read_sql_query(version_query, conn, params=params)
+        version_rows = query_all(conn, version_query, params)
 
         version_by_subject_query = f"""
             SELECT preprint_subject AS subject,
-                   json_array_length(versions) AS versions,
-                   COUNT(*) AS count
-            FROM papers
-            WHERE versions IS NOT NULL
-              AND preprint_submission_date IS NOT NULL
+                   version_count AS versions,
+                   SUM(paper_count) AS count
+            FROM {versions}
+            WHERE version_count IS NOT NULL
+              AND dated = 1
               {time_filter}
               {subject_filter}
-            GROUP BY preprint_subject, json_array_length(versions)
+            GROUP BY preprint_subject, version_count
             ORDER BY subject, versions
         """
-        version_by_subject_df = pd.read_sql_query(version_by_subject_query, conn, params=params)
+        version_by_subject_rows = query_all(conn, version_by_subject_query, params)
 
         # 4) Version summary stats
         summary_query = f"""
             SELECT 
-                COUNT(*) AS total_papers,
-                SUM(CASE WHEN json_array_length(versions) >= 2 THEN 1 ELSE 0 END) AS multi_version_papers
-            FROM papers
-            WHERE versions IS NOT NULL
-              AND preprint_submission_date IS NOT NULL
+                COALESCE(SUM(paper_count), 0) AS total_papers,
+                SUM(CASE WHEN version_count >= 2 THEN paper_count ELSE 0 END) AS multi_version_papers
+            FROM {versions}
+            WHERE version_count IS NOT NULL
+              AND dated = 1
               {time_filter}
               {subject_filter}
         """
-        summary_df = pd.read_sql_query(summary_query, conn, params=params)
-        total_papers = int(summary_df.iloc[0]['total_papers']) if not summary_df.empty else 0
-        multi_version_papers = int(summary_df.iloc[0]['multi_version_papers']) if not summary_df.empty else 0
-        percent_multi = round((multi_version_papers * 100.0 / total_papers), 2) if total_papers > 0 else 0.0
+        summary = query_one(conn, summary_query, params) or {}
 
         # 5) Monthly trends: publications per month for selected subjects
         monthly_query = f"""
-            SELECT strftime('%Y-%m', preprint_submission_date) AS month,
+            SELECT {MONTH_LABEL} AS month,
                    preprint_subject AS subject,
-                   COUNT(*) AS count
-            FROM papers
-            WHERE preprint_submission_date IS NOT NULL
+                   SUM(paper_count) AS count
+            FROM {rollup_source(conn, filtered_dimensions + ("sub_month", "sub_ym"))}
+            WHERE dated = 1
               AND preprint_subject IS NOT NULL AND preprint_subject != ''
               {time_filter}
               {subject_filter}
-            GROUP BY strftime('%Y-%m', preprint_submission_date), preprint_subject
-            ORDER BY month, subject
+            GROUP BY sub_ym, preprint_subject
+            ORDER BY sub_ym, subject
         """
-        monthly_df = pd.read_sql_query(monthly_query, conn, params=params)
-        if not monthly_df.empty and selected_subjects:
-            monthly_df = monthly_df[monthly_df['subject'].isin(list(selected_subjects))]
+        monthly_rows = query_all(conn, monthly_query, params)
 
         # 6) Server distribution by subject
         server_query = f"""
             SELECT preprint_subject AS subject,
                    preprint_server AS server,
-                   COUNT(*) AS count
-            FROM papers
+                   SUM(paper_count) AS count
+            FROM {rollup_source(conn, filtered_dimensions + ("preprint_server",))}
             WHERE preprint_subject IS NOT NULL AND preprint_subject != ''
               AND preprint_server IS NOT NULL AND preprint_server != ''
-              AND preprint_submission_date IS NOT NULL
+              AND dated = 1
               {time_filter}
               {subject_filter}
             GROUP BY preprint_subject, preprint_server
-            ORDER BY subject, count DESC
+            ORDER BY subject, count DESC, server
         """
-        server_df = pd.read_sql_query(server_query, conn, params=params)
-        if not server_df.empty and selected_subjects:
-            server_df = server_df[server_df['subject'].isin(list(selected_subjects))]
+        server_rows = query_all(conn, server_query, params)
 
         # 7) Citation growth: papers by year with average citations
         citation_growth_query = f"""
-            SELECT strftime('%Y', preprint_submission_date) AS year,
+            SELECT {YEAR_LABEL} AS year,
                    preprint_subject AS subject,
-                   COUNT(*) AS paper_count,
-                   ROUND(AVG(total_citation), 2) AS avg_citation,
-                   MAX(total_citation) AS max_citation
-            FROM papers
-            WHERE preprint_submission_date IS NOT NULL
+                   SUM(citation_count) AS paper_count,
+                   ROUND(SUM(citation_sum) * 1.0 / SUM(citation_count), 2) AS avg_citation,
+                   MAX(citation_max) AS max_citation
+            FROM {rollup_source(conn, filtered_dimensions)}
+            WHERE dated = 1
               AND preprint_subject IS NOT NULL AND preprint_subject != ''
-              AND total_citation IS NOT NULL
+              AND citation_count > 0
               {time_filter}
               {subject_filter}
-            GROUP BY strftime('%Y', preprint_submission_date), preprint_subject
-            ORDER BY year, subject
+            GROUP BY sub_year, preprint_subject
+            ORDER BY sub_year, subject
         """
-        citation_growth_df = pd.read_sql_query(citation_growth_query, conn, params=params)
-        if not citation_growth_df.empty and selected_subjects:
-            citation_growth_df = citation_growth_df[citation_growth_df['subject'].isin(list(selected_subjects))]
-
-        response = {
-            "evolutionData": evolution_df.to_dict("records"),
-            "citationRanking": ranking_df.to_dict("records") if (subject or subjects_list) else ranking_df.head(top).to_dict("records"),
-            "versionDistribution": version_df.to_dict("records"),
-            "versionDistributionBySubject": version_by_subject_df.to_dict("records"),
-            "monthlyTrends": monthly_df.to_dict("records"),
-            "serverDistribution": server_df.to_dict("records"),
-            "citationGrowth": citation_growth_df.to_dict("records"),
-            "versionSummary": {
-                "totalPapers": total_papers,
-                "multiVersionPapers": multi_version_papers,
-                "percentMultiVersion": percent_multi
-            },
-            "metadata": {
-                "time_range": time_range,
-                "subject": subject,
-                "subjects": subjects_list,
-                "top": top,
-                "selectedSubjects": sorted(list(selected_subjects)) if selected_subjects else []
-            }
+        citation_growth_rows = query_all(conn, citation_growth_query, params)
+
+    # Determine selected subjects
+    subjects_list = [s.strip() for s in subjects.split(',')] if subjects else []
+    selected_subjects = None
+    if subjects_list:
+        available = set(row['subject'] for row in ranking_rows)
+        selected_subjects = set([s for s in subjects_list if s in available])
+    elif subject:
+        selected_subjects = set(row['subject'] for row in ranking_rows)
+    else:
+        selected_subjects = set(row['subject'] for row in ranking_rows[:top])
+
+    # Evolution, monthly, server and growth rows cover the selected subjects only
+    if selected_subjects:
+        evolution_rows = [row for row in evolution_rows if row['subject'] in selected_subjects]
+        monthly_rows = [row for row in monthly_rows if row['subject'] in selected_subjects]
+        server_rows = [row for row in server_rows if row['subject'] in selected_subjects]
+        citation_growth_rows = [row for row in citation_growth_rows if row['subject'] in selected_subjects]
+
+    total_papers = int(summary.get('total_papers') or 0)
+    multi_version_papers = int(summary.get('multi_version_papers') or 0)
+    percent_multi = round((multi_version_papers * 100.0 / total_papers), 2) if total_papers > 0 else 0.0
+
+    response = {
+        "evolutionData": evolution_rows,
+        "citationRanking": ranking_rows if (subject or subjects_list) else ranking_rows[:top],
+        "versionDistribution": version_rows,
+        "versionDistributionBySubject": version_by_subject_rows,
+        "monthlyTrends": monthly_rows,
+        "serverDistribution": server_rows,
+        "citationGrowth": citation_growth_rows,
+        "versionSummary": {
+            "totalPapers": total_papers,
+            "multiVersionPapers": multi_version_papers,
+            "percentMultiVersion": percent_multi
+        },
+        "metadata": {
+            "time_range": time_range,
+            "subject": subject,
+            "subjects": subjects_list,
+            "top": top,
+            "selectedSubjects": sorted(list(selected_subjects)) if selected_subjects else []
         }
+    }
+    
+    return EncodedJSONResponse(response)
 
-        return JSONResponse(content=response)
+@router.get("/analysis")
+def get_subject_analysis(
+    time_range: str = Query("all", description="Time range filter: all | last_year | last_5_years | last_10_years"),
+    subject: Optional[str] = Query(None, description="Subject filter (substring match)"),
+    subjects: Optional[str] = Query(None, description="CSV of subjects for comparison, e.g., 'bioinformatics,neuroscience'"),
+    top: int = Query(10, ge=1, le=50, description="Top N subjects to include when no specific subject is selected"),
+    conn: sqlite3.Connection = Depends(get_db_connection),
+    cache: TieredCache = Depends(get_analytics_cache)
+):
+    """Unified endpoint that returns subject evolution, citations ranking, and version analysis."""
+    cache_key = f"subject_analysis_{time_range}_{subject}_{subjects}_{top}"
 
+    try:
+        compute = partial(compute_subject_analysis, time_range=time_range, subject=subject, subjects=subjects, top=top)
+        tags = _subject_tags(conn, subject, subjects)
+        return cache.tagged(tags).get_or_compute(cache_key, compute, conn)
+        
     except Exception as e:
         logger.error(f"Subject analysis error: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch subject analysis data")
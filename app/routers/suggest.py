@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+import sqlite3
+from app.database import get_db_connection
+from app.config import settings
+from app.suggest import SUGGEST_FIELDS, get_suggest_index
+import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/api", tags=["suggest"])
+
+@router.get("/suggest")
+def suggest(
+    field: str = Query(..., pattern=f"^({'|'.join(SUGGEST_FIELDS)})$", description="Field to complete: " + " | ".join(SUGGEST_FIELDS)),
+    prefix: str = Query(..., min_length=1, description="Text typed so far"),
+    limit: int = Query(10, ge=1, le=settings.suggest_max_results, description="Maximum number of suggestions"),
+    conn: sqlite3.Connection = Depends(get_db_connection)
+):
+    """Typeahead completions ranked by paper count, served from in-memory prefix indexes"""
+    try:
+        index = get_suggest_index(field, conn)
+        return {
+            "field": field,
+            "prefix": prefix,
+            "suggestions": index.complete(prefix, limit)
+        }
+    except Exception as e:
+        logger.error(f"Suggest error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch suggestions")
@@ -0,0 +1,64 @@
+import re
+import sqlite3
+from typing import Dict, Optional
+
+FTS_TABLE = "papers_fts"
+
+# Trigram index over the free-text filter columns of advanced search; the
+# low-cardinality columns are resolved by the categorical dictionary instead
+TRIGRAM_TABLE = "papers_trigram"
+TRIGRAM_COLUMNS = ("all_authors", "corresponding_institution")
+
+# bm25() column weights for (preprint_title, preprint_abstract, all_authors, preprint_doi)
+BM25_WEIGHTS = (10.0, 1.0, 5.0, 5.0)
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+def build_match_query(text: str) -> Optional[str]:
+    """Turn free-text user input into an FTS5 MATCH expression.
+
+    Every word becomes a quoted prefix term and the terms are ANDed together,
+    so "neuro imag" matches papers containing words starting with both.
+    Returns None when the input has no searchable words.
+    """
+    terms = _TERM_RE.findall(text or "")
+    if not terms:
+        return None
+    return " ".join(f'"{term}"*' for term in terms)
+
+def _has_table(conn: sqlite3.Connection, name: str) -> bool:
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+        (name,)
+    ).fetchone()
+    return row is not None
+
+def has_fts_index(conn: sqlite3.Connection) -> bool:
+    """Check whether the database was built with the full-text search index"""
+    return _has_table(conn, FTS_TABLE)
+
+def has_trigram_index(conn: sqlite3.Connection) -> bool:
+    """Check whether the database was built with the trigram substring index"""
+    return _has_table(conn, TRIGRAM_TABLE)
+
+def build_substring_match(filters: Dict[str, str]) -> Optional[str]:
+    """Turn {column: substring} filters into one trigram MATCH expression.
+
+    FTS5 intersects the posting lists of all terms, starting from the rarest,
+    so only rows containing every substring are visited. Substrings shorter
+    than three characters or containing LIKE wildcards cannot be answered by
+    trigrams and are left out; callers keep their LIKE conditions, which the
+    candidate rows still have to satisfy. Returns None when no filter is usable.
+    """
+    terms = []
+    for column, text in filters.items():
+        if len(text) < 3 or "%" in text or "_" in text:
+            continue
+        phrase = text.replace('"', '""')
+        terms.append(f'{column} : "{phrase}"')
+    return " AND ".join(terms) if terms else None
+
+def bm25_expression() -> str:
+    """SQL expression ranking FTS matches by BM25 (lower is more relevant)"""
+    weights = ", ".join(str(w) for w in BM25_WEIGHTS)
+    return f"bm25({FTS_TABLE}, {weights})"
@@ -0,0 +1,114 @@
+import heapq
+import logging
+import sqlite3
+import threading
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.author_index import AUTHOR_STATS_TABLE, has_author_index, normalize_author_name
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Prefixes up to this length match large key ranges, so their results are memoized
+_MEMO_PREFIX_LENGTH = 2
+
+# Value and paper count per suggestable field; every query returns (value, count) rows
+SUGGEST_SOURCES = {
+    "subject": """
+        SELECT preprint_subject, COUNT(*) FROM papers
+        WHERE preprint_subject IS NOT NULL AND preprint_subject != ''
+        GROUP BY preprint_subject
+    """,
+    "institution": """
+        SELECT corresponding_institution, COUNT(*) FROM papers
+        WHERE corresponding_institution IS NOT NULL AND corresponding_institution != ''
+        GROUP BY corresponding_institution
+    """,
+    "country": """
+        SELECT country_name, COUNT(*) FROM papers
+        WHERE country_name IS NOT NULL AND country_name != ''
+        GROUP BY country_name
+    """,
+}
+_AUTHOR_SOURCE = f"SELECT author_name, paper_count FROM {AUTHOR_STATS_TABLE}"
+_LEGACY_AUTHOR_SOURCE = """
+    SELECT submission_contact, COUNT(*) FROM papers
+    WHERE submission_contact IS NOT NULL AND submission_contact != ''
+    GROUP BY submission_contact
+"""
+SUGGEST_FIELDS = ("author",) + tuple(SUGGEST_SOURCES)
+
+class PrefixIndex:
+    """Sorted-array prefix index returning the most frequent completions.
+
+    Every word start of a value is indexed, so "smi" completes "John Smith".
+    Lookups are two binary searches plus a top-k pass over the matching range.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, int]]):
+        self._values: List[str] = []
+        self._counts: List[int] = []
+        keyed = []
+        for value, count in entries:
+            value_id = len(self._values)
+            self._values.append(value)
+            self._counts.append(int(count))
+            # Same accent- and case-insensitive form as author lookups
+            words = normalize_author_name(value).split(" ")
+            for start in range(len(words)):
+                keyed.append((" ".join(words[start:]), value_id))
+        keyed.sort()
+        self._keys = [key for key, _ in keyed]
+        self._ids = [value_id for _, value_id in keyed]
+        self._memo: Dict[str, List[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def _top_ids(self, prefix: str, limit: int) -> List[int]:
+        lo = bisect_left(self._keys, prefix)
+        hi = bisect_left(self._keys, prefix + "\U0010ffff")
+        ids = set(self._ids[lo:hi])
+        return heapq.nsmallest(limit, ids, key=lambda i: (-self._counts[i], self._values[i]))
+
+    def complete(self, prefix: str, limit: int = 10) -> List[Dict[str, object]]:
+        """Values with a word starting with ``prefix``, by paper count"""
+        prefix = normalize_author_name(prefix)
+        if not prefix:
+            return []
+        if len(prefix) <= _MEMO_PREFIX_LENGTH and limit <= settings.suggest_max_results:
+            ids = self._memo.get(prefix)
+            if ids is None:
+                ids = self._top_ids(prefix, settings.suggest_max_results)
+                self._memo[prefix] = ids
+            ids = ids[:limit]
+        else:
+            ids = self._top_ids(prefix, limit)
+        return [{"value": self._values[i], "count": self._counts[i]} for i in ids]
+
+_indexes: Dict[str, PrefixIndex] = {}
+_lock = threading.Lock()
+
+def build_suggest_indexes(conn: sqlite3.Connection) -> Dict[str, PrefixIndex]:
+    """Load every suggestable field from the database into fresh prefix indexes"""
+    sources = dict(SUGGEST_SOURCES)
+    sources["author"] = _AUTHOR_SOURCE if has_author_index(conn) else _LEGACY_AUTHOR_SOURCE
+
+    indexes = {}
+    for field, query in sources.items():
+        indexes[field] = PrefixIndex(conn.execute(query).fetchall())
+        logger.info(f"Suggest index '{field}': {len(indexes[field])} values")
+
+    # Swap all indexes at once so readers never see a partial rebuild
+    global _indexes
+    _indexes = indexes
+    return indexes
+
+def get_suggest_index(field: str, conn: Optional[sqlite3.Connection] = None) -> PrefixIndex:
+    """Prefix index for a field, building the indexes on first use if startup did not"""
+    if not _indexes and conn is not None:
+        with _lock:
+            if not _indexes:
+                build_suggest_indexes(conn)
+    return _indexes[field]
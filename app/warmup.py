@@ -0,0 +1,145 @@
+import asyncio
+import inspect
+import logging
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple
+from urllib.parse import urlencode
+
+from fastapi import FastAPI, params
+from fastapi.routing import APIRoute
+from pydantic_core import PydanticUndefined
+from starlette.concurrency import run_in_threadpool
+
+from app.cache import TieredCache
+from app.config import settings
+from app.database import db_manager, get_db_connection
+
+logger = logging.getLogger(__name__)
+
+class WarmupEntry(NamedTuple):
+    """One manifest entry resolved to its endpoint and the caches it fills"""
+    path: str
+    params: Dict[str, Any]
+    endpoint: Callable
+    caches: Tuple[TieredCache, ...]
+
+    @property
+    def label(self) -> str:
+        return f"{self.path}?{urlencode(self.params)}" if self.params else self.path
+
+    @property
+    def refresh_interval(self) -> float:
+        """Seconds between recomputations: ahead of the shortest TTL involved"""
+        ttl = min(cache.ttl for cache in self.caches)
+        return max(ttl - settings.warmup_refresh_margin, ttl / 2)
+
+class _RefreshingCache:
+    """Cache seen by an endpoint during a refresh.
+
+    Every key reads as missing, so the endpoint recomputes its response (and
+    the totals and facets it caches on the way), and every write goes to
+    the real cache.
+    """
+
+    def __init__(self, cache: TieredCache):
+        self.cache = cache
+
+    def __contains__(self, key: object) -> bool:
+        return False
+
+    def __getitem__(self, key: str) -> Any:
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.cache[key] = value
+
+    def get_or_compute(self, key: str, compute: Callable, conn) -> Any:
+        return self.cache.refresh(key, compute, conn)
+
+    def tagged(self, tags) -> "_RefreshingCache":
+        return _RefreshingCache(self.cache.tagged(tags))
+
+def _find_endpoint(app: FastAPI, path: str) -> Callable:
+    for route in app.routes:
+        if isinstance(route, APIRoute) and route.path == path and "GET" in route.methods:
+            return route.endpoint
+    raise ValueError(f"no GET endpoint at {path}")
+
+def _endpoint_arguments(entry: WarmupEntry, conn, refresh: bool) -> Dict[str, Any]:
+    """Keyword arguments for calling the endpoint the way a request would"""
+    arguments = {}
+    for name, parameter in inspect.signature(entry.endpoint).parameters.items():
+        default = parameter.default
+        if name in entry.params:
+            arguments[name] = entry.params[name]
+        elif isinstance(default, params.Depends):
+            if default.dependency is get_db_connection:
+                arguments[name] = conn
+            else:
+                value = default.dependency()
+                arguments[name] = _RefreshingCache(value) if refresh and isinstance(value, TieredCache) else value
+        elif isinstance(default, params.Param) and default.default is not PydanticUndefined:
+            arguments[name] = default.default
+        else:
+            raise ValueError(f"missing parameter '{name}'")
+    return arguments
+
+def _resolve(app: FastAPI, item: Dict[str, Any]) -> WarmupEntry:
+    path = item["path"]
+    endpoint = _find_endpoint(app, path)
+    entry_params = dict(item.get("params") or {})
+    signature = inspect.signature(endpoint)
+    unknown = set(entry_params).difference(signature.parameters)
+    if unknown:
+        raise ValueError(f"unknown parameters {', '.join(sorted(unknown))}")
+    caches = tuple(
+        parameter.default.dependency()
+        for parameter in signature.parameters.values()
+        if isinstance(parameter.default, params.Depends)
+        and parameter.default.dependency is not get_db_connection
+    )
+    caches = tuple(cache for cache in caches if isinstance(cache, TieredCache))
+    if not caches:
+        raise ValueError("endpoint does not cache its responses")
+    return WarmupEntry(path, entry_params, endpoint, caches)
+
+def load_warmup_manifest(app: FastAPI) -> List[WarmupEntry]:
+    """Resolve settings.warmup_manifest against the app's routes, skipping invalid entries"""
+    entries = []
+    for item in settings.warmup_manifest:
+        try:
+            entries.append(_resolve(app, item))
+        except (KeyError, TypeError, ValueError) as e:
+            logger.warning(f"Skipping warmup entry {item}: {e}")
+    return entries
+
+def _run_entry(entry: WarmupEntry, refresh: bool) -> None:
+    start = time.perf_counter()
+    try:
+        with db_manager.connection_context() as conn:
+            entry.endpoint(**_endpoint_arguments(entry, conn, refresh))
+    except Exception as e:
+        logger.warning(f"{'Refresh' if refresh else 'Warmup'} of {entry.label} failed: {e}")
+        return
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    logger.info(f"{'Refreshed' if refresh else 'Warmed'} {entry.label} in {elapsed_ms:.1f}ms")
+
+def warm_up(entries: List[WarmupEntry]) -> None:
+    """Fill the caches for every entry; entries another worker already computed come from the shared cache"""
+    start = time.perf_counter()
+    for entry in entries:
+        _run_entry(entry, refresh=False)
+    if entries:
+        logger.info(f"Cache warmup finished: {len(entries)} entries in {time.perf_counter() - start:.2f}s")
+
+async def refresh_warmup_entries(entries: List[WarmupEntry]) -> None:
+    """Recompute each entry before its cache TTL runs out, forever (cancel to stop)"""
+    if not entries:
+        return
+    due = {index: time.monotonic() + entry.refresh_interval for index, entry in enumerate(entries)}
+    while True:
+        index = min(due, key=due.get)
+        await asyncio.sleep(max(0.0, due[index] - time.monotonic()))
+        entry = entries[index]
+        await run_in_threadpool(_run_entry, entry, True)
+        due[index] = time.monotonic() + entry.refresh_interval
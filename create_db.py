@@ -1,8 +1,15 @@
 import pandas as pd
 import sqlite3
 import sys
+import time
 import logging
 
+from app.author_index import AUTHOR_SYNC_TABLE, normalize_author_name, parse_author_names
+from app.data_version import DATA_VERSION_TABLE
+from app.paper_details import DETAIL_COLUMNS, PAPER_DETAILS_TABLE, PAPER_TEXT_VIEW, has_paper_details
+from app.rollup import ROLLUP_TABLES, dimension_sql, rollup_select_sql
+from app.search import TRIGRAM_COLUMNS
+
 CSV_INPUT = 'combined_db_with_updated_country.csv'
 DB_NAME = 'ppc.db'
 TABLE_NAME = 'papers'
@@ -26,16 +33,28 @@ def create_indexes(conn):
             "CREATE INDEX IF NOT EXISTS idx_papers_country_name ON papers(country_name)",
             "CREATE INDEX IF NOT EXISTS idx_papers_total_citation ON papers(total_citation)",
             "CREATE INDEX IF NOT EXISTS idx_papers_preprint_title ON papers(preprint_title)",
-            "CREATE INDEX IF NOT EXISTS idx_papers_all_authors ON papers(all_authors)",
             "CREATE INDEX IF NOT EXISTS idx_papers_preprint_server ON papers(preprint_server)",
             
             # Composite indexes for common query patterns
             "CREATE INDEX IF NOT EXISTS idx_papers_subject_date ON papers(preprint_subject, preprint_submission_date)",
             "CREATE INDEX IF NOT EXISTS idx_papers_citation_date ON papers(total_citation, preprint_submission_date)",
             "CREATE INDEX IF NOT EXISTS idx_papers_country_date ON papers(country_name, preprint_submission_date)",
+
+            # Point lookups by id (paper pages, author paper lists)
+            "CREATE INDEX IF NOT EXISTS idx_papers_ppc_id ON papers(PPC_Id)",
+
+            # Keyset pagination: listings are ordered by (total_citation DESC, PPC_Id DESC)
+            "CREATE INDEX IF NOT EXISTS idx_papers_citation_id ON papers(total_citation, PPC_Id)",
+
+            # Materialized submission date parts (see add_date_columns)
+            "CREATE INDEX IF NOT EXISTS idx_papers_sub_year ON papers(sub_year)",
+            "CREATE INDEX IF NOT EXISTS idx_papers_sub_ym ON papers(sub_ym)",
+            "CREATE INDEX IF NOT EXISTS idx_papers_subject_year ON papers(preprint_subject, sub_year)",
+            "CREATE INDEX IF NOT EXISTS idx_papers_server_year ON papers(preprint_server, sub_year)",
+            "CREATE INDEX IF NOT EXISTS idx_papers_country_year ON papers(country_name, sub_year)",
             
             # Index for search functionality
-            "CREATE INDEX IF NOT EXISTS idx_papers_search ON papers(preprint_title, preprint_doi, all_authors)",
+            "CREATE INDEX IF NOT EXISTS idx_papers_search ON papers(preprint_title, preprint_doi)",
         ]
         
         for index_sql in indexes:
@@ -57,6 +76,469 @@ def create_indexes(conn):
         logger.error(f"Error creating indexes: {e}")
         raise
 
+def add_date_columns(conn):
+    """Materialize submission date parts as indexed integer columns.
+
+    Filtering on strftime('%Y', preprint_submission_date) cannot use an index,
+    so the routers filter and group on these columns instead:
+    sub_year, sub_month, sub_day, sub_ym (YYYYMM) and sub_dow (0 = Sunday).
+    """
+    try:
+        cursor = conn.cursor()
+
+        logger.info("Materializing submission date columns...")
+
+        for column in ("sub_year", "sub_month", "sub_day", "sub_ym", "sub_dow"):
+            cursor.execute(f"ALTER TABLE papers ADD COLUMN {column} INTEGER")
+
+        date_parts = """
+            sub_year = CAST(strftime('%Y', preprint_submission_date) AS INTEGER),
+            sub_month = CAST(strftime('%m', preprint_submission_date) AS INTEGER),
+            sub_day = CAST(strftime('%d', preprint_submission_date) AS INTEGER),
+            sub_ym = CAST(strftime('%Y%m', preprint_submission_date) AS INTEGER),
+            sub_dow = CAST(strftime('%w', preprint_submission_date) AS INTEGER)
+        """
+        cursor.execute(f"UPDATE papers SET {date_parts}")
+
+        # Keep the derived columns in sync for rows written after ingest
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS papers_dates_ai AFTER INSERT ON papers BEGIN
+                UPDATE papers SET {date_parts} WHERE rowid = new.rowid;
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS papers_dates_au AFTER UPDATE OF preprint_submission_date ON papers BEGIN
+                UPDATE papers SET {date_parts} WHERE rowid = new.rowid;
+            END
+        """)
+
+        conn.commit()
+        logger.info("Submission date columns created successfully!")
+
+    except Exception as e:
+        logger.error(f"Error materializing date columns: {e}")
+        raise
+
+def split_paper_details(conn):
+    """Move the bulky text columns of papers into the paper_details side table.
+
+    Abstracts, author lists, version and citation JSON make up most of each
+    row, while listings, filters and aggregations never read them. With the
+    text in paper_details (keyed by PPC_Id), scans over papers touch far
+    fewer pages; the API reads the text back with primary-key lookups. The
+    number of versions is kept on papers as version_count, and the
+    paper_text view joins both tables back together for the text indexes.
+    """
+    try:
+        cursor = conn.cursor()
+
+        logger.info("Moving text columns into paper_details...")
+
+        detail_columns = ", ".join(DETAIL_COLUMNS)
+        cursor.execute(f"DROP VIEW IF EXISTS {PAPER_TEXT_VIEW}")
+        cursor.execute(f"DROP TABLE IF EXISTS {PAPER_DETAILS_TABLE}")
+        cursor.execute(f"""
+            CREATE TABLE {PAPER_DETAILS_TABLE} (
+                PPC_Id TEXT PRIMARY KEY,
+                {", ".join(f"{column} TEXT" for column in DETAIL_COLUMNS)}
+            )
+        """)
+        cursor.execute(f"""
+            INSERT OR IGNORE INTO {PAPER_DETAILS_TABLE} (PPC_Id, {detail_columns})
+            SELECT PPC_Id, {detail_columns} FROM papers
+            WHERE PPC_Id IS NOT NULL
+            ORDER BY rowid
+        """)
+        skipped = cursor.execute(
+            "SELECT COUNT(PPC_Id) - COUNT(DISTINCT PPC_Id) FROM papers"
+        ).fetchone()[0]
+        if skipped:
+            logger.warning(f"{skipped} rows share a PPC_Id; only the first row's text was kept")
+
+        cursor.execute("ALTER TABLE papers ADD COLUMN version_count INTEGER")
+        cursor.execute("""
+            UPDATE papers SET version_count =
+                CASE WHEN json_valid(versions) THEN json_array_length(versions) END
+        """)
+        for column in DETAIL_COLUMNS:
+            cursor.execute(f"ALTER TABLE papers DROP COLUMN {column}")
+
+        cursor.execute(f"""
+            CREATE VIEW {PAPER_TEXT_VIEW} AS
+            SELECT p.rowid AS rowid, p.PPC_Id, p.preprint_title, d.preprint_abstract,
+                   d.all_authors, p.preprint_doi, p.corresponding_institution
+            FROM papers p
+            LEFT JOIN {PAPER_DETAILS_TABLE} d ON d.PPC_Id = p.PPC_Id
+        """)
+        conn.commit()
+
+        # Reclaim the space of the dropped columns and pack the narrow rows
+        cursor.execute("VACUUM")
+        logger.info("Text columns moved into paper_details successfully!")
+
+    except Exception as e:
+        logger.error(f"Error moving text columns into paper_details: {e}")
+        raise
+
+def _create_text_index_triggers(cursor, index, columns):
+    """Keep an FTS5 index over the paper_text view in sync with both tables.
+
+    External content indexes need the previously indexed values to delete an
+    entry, so each trigger rebuilds them from the row being replaced.
+    """
+    column_list = ", ".join(columns)
+
+    def indexed_values(paper, details):
+        # Column values as the view yields them, from the given row aliases
+        # (details=None: a paper without a paper_details row)
+        return ", ".join(
+            (f"{details}.{column}" if details else "NULL") if column in DETAIL_COLUMNS else f"{paper}.{column}"
+            for column in columns
+        )
+
+    insert_from_view = (
+        f"INSERT INTO {index}(rowid, {column_list}) "
+        f"SELECT rowid, {column_list} FROM {PAPER_TEXT_VIEW}"
+    )
+    # The deleted or updated papers row, with its details as they are now
+    delete_old_paper = (
+        f"INSERT INTO {index}({index}, rowid, {column_list}) "
+        f"SELECT 'delete', old.rowid, {indexed_values('old', 'd')} FROM (SELECT 1) "
+        f"LEFT JOIN {PAPER_DETAILS_TABLE} d ON d.PPC_Id = old.PPC_Id"
+    )
+
+    def delete_for_details(details, ppc_id):
+        # The papers row of a paper_details row, as indexed with the given details
+        return (
+            f"INSERT INTO {index}({index}, rowid, {column_list}) "
+            f"SELECT 'delete', p.rowid, {indexed_values('p', details)} "
+            f"FROM papers p WHERE p.PPC_Id = {ppc_id}"
+        )
+
+    triggers = [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {index}_ai AFTER INSERT ON papers BEGIN
+            {insert_from_view} WHERE rowid = new.rowid;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {index}_ad AFTER DELETE ON papers BEGIN
+            {delete_old_paper};
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {index}_au AFTER UPDATE ON papers BEGIN
+            {delete_old_paper};
+            {insert_from_view} WHERE rowid = new.rowid;
+        END
+        """,
+        # A paper inserted before its details was indexed without them
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {index}_details_ai AFTER INSERT ON {PAPER_DETAILS_TABLE} BEGIN
+            {delete_for_details(None, "new.PPC_Id")};
+            {insert_from_view} WHERE PPC_Id = new.PPC_Id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {index}_details_au AFTER UPDATE ON {PAPER_DETAILS_TABLE} BEGIN
+            {delete_for_details("old", "old.PPC_Id")};
+            {insert_from_view} WHERE PPC_Id = new.PPC_Id;
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {index}_details_ad AFTER DELETE ON {PAPER_DETAILS_TABLE} BEGIN
+            {delete_for_details("old", "old.PPC_Id")};
+            {insert_from_view} WHERE PPC_Id = old.PPC_Id;
+        END
+        """,
+    ]
+    for trigger_sql in triggers:
+        cursor.execute(trigger_sql)
+
+def create_search_index(conn):
+    """Build the FTS5 full-text index over title, abstract, authors and DOI.
+
+    The index uses the ``paper_text`` view as its external content table, so
+    the text is not stored twice. Triggers on papers and paper_details keep it
+    in sync with inserts, updates and deletes. If the database is ever
+    VACUUMed, rerun this step since rowids may change.
+    """
+    try:
+        cursor = conn.cursor()
+
+        logger.info("Building full-text search index...")
+
+        cursor.execute("DROP TABLE IF EXISTS papers_fts")
+        cursor.execute(f"""
+            CREATE VIRTUAL TABLE papers_fts USING fts5(
+                preprint_title, preprint_abstract, all_authors, preprint_doi,
+                content='{PAPER_TEXT_VIEW}', content_rowid='rowid',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+        """)
+        cursor.execute("INSERT INTO papers_fts(papers_fts) VALUES('rebuild')")
+
+        _create_text_index_triggers(
+            cursor, "papers_fts", ("preprint_title", "preprint_abstract", "all_authors", "preprint_doi")
+        )
+
+        cursor.execute("INSERT INTO papers_fts(papers_fts) VALUES('optimize')")
+        conn.commit()
+        logger.info("Full-text search index created successfully!")
+
+    except Exception as e:
+        logger.error(f"Error creating full-text search index: {e}")
+        raise
+
+def create_substring_index(conn):
+    """Build the trigram FTS5 index behind the author and institution filters of advanced search.
+
+    Like papers_fts it reads its text from the ``paper_text`` view and is kept
+    in sync by triggers; rerun this step after a VACUUM.
+    """
+    try:
+        cursor = conn.cursor()
+
+        logger.info("Building trigram substring index...")
+
+        cursor.execute("DROP TABLE IF EXISTS papers_trigram")
+        cursor.execute(f"""
+            CREATE VIRTUAL TABLE papers_trigram USING fts5(
+                {", ".join(TRIGRAM_COLUMNS)},
+                content='{PAPER_TEXT_VIEW}', content_rowid='rowid',
+                tokenize='trigram'
+            )
+        """)
+        cursor.execute("INSERT INTO papers_trigram(papers_trigram) VALUES('rebuild')")
+
+        _create_text_index_triggers(cursor, "papers_trigram", TRIGRAM_COLUMNS)
+
+        cursor.execute("INSERT INTO papers_trigram(papers_trigram) VALUES('optimize')")
+        conn.commit()
+        logger.info("Trigram substring index created successfully!")
+
+    except Exception as e:
+        logger.error(f"Error creating trigram substring index: {e}")
+        raise
+
+def create_author_index(conn, df):
+    """Split all_authors into normalized, indexed author tables.
+
+    paper_authors has one row per (paper, author) with the author's position
+    in the byline, author_stats holds per-author paper counts and citation
+    totals, and authors_fts indexes the normalized names for name search.
+    Triggers keep the tables consistent when papers are deleted or their
+    PPC_Id or total_citation change. The author rows come from parsing the
+    all_authors literal, which SQL cannot do, so inserts and all_authors
+    updates are queued in author_index_pending by triggers and applied by
+    app.author_index.sync_author_index() before the API reads the tables.
+    """
+    try:
+        cursor = conn.cursor()
+
+        logger.info("Building author tables...")
+
+        rows = []
+        for ppc_id, all_authors in zip(df['PPC_Id'], df['all_authors']):
+            seen = set()
+            for position, name in enumerate(parse_author_names(all_authors), start=1):
+                author_norm = normalize_author_name(name)
+                if author_norm and author_norm not in seen:
+                    seen.add(author_norm)
+                    rows.append((ppc_id, author_norm, position, name))
+
+        cursor.execute("DROP TABLE IF EXISTS paper_authors")
+        cursor.execute("""
+            CREATE TABLE paper_authors (
+                PPC_Id TEXT NOT NULL,
+                author_norm TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                author_name TEXT NOT NULL
+            )
+        """)
+        cursor.executemany("INSERT INTO paper_authors VALUES (?, ?, ?, ?)", rows)
+        cursor.execute("CREATE INDEX idx_paper_authors_norm ON paper_authors(author_norm, PPC_Id)")
+        cursor.execute("CREATE INDEX idx_paper_authors_paper ON paper_authors(PPC_Id, position)")
+
+        cursor.execute("DROP TABLE IF EXISTS author_stats")
+        cursor.execute("""
+            CREATE TABLE author_stats (
+                author_norm TEXT PRIMARY KEY,
+                author_name TEXT NOT NULL,
+                paper_count INTEGER NOT NULL,
+                max_citations INTEGER,
+                total_citations INTEGER NOT NULL
+            )
+        """)
+        cursor.execute("""
+            INSERT INTO author_stats
+            SELECT pa.author_norm,
+                   MIN(pa.author_name),
+                   COUNT(*),
+                   MAX(p.total_citation),
+                   COALESCE(SUM(p.total_citation), 0)
+            FROM paper_authors pa
+            JOIN papers p ON p.PPC_Id = pa.PPC_Id
+            GROUP BY pa.author_norm
+        """)
+        cursor.execute("CREATE INDEX idx_author_stats_paper_count ON author_stats(paper_count DESC, author_norm)")
+
+        cursor.execute("DROP TABLE IF EXISTS authors_fts")
+        cursor.execute("CREATE VIRTUAL TABLE authors_fts USING fts5(author_norm, tokenize='unicode61 remove_diacritics 2')")
+        cursor.execute("INSERT INTO authors_fts(author_norm) SELECT author_norm FROM author_stats")
+        cursor.execute(f"DROP TABLE IF EXISTS {AUTHOR_SYNC_TABLE}")
+        cursor.execute(f"CREATE TABLE {AUTHOR_SYNC_TABLE} (PPC_Id TEXT PRIMARY KEY)")
+
+        # Deleting a paper removes its author rows and refreshes the stats of its
+        # authors; stale authors_fts entries simply stop joining to any paper.
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS papers_authors_ad AFTER DELETE ON papers BEGIN
+                UPDATE author_stats SET
+                    paper_count = paper_count - 1,
+                    total_citations = total_citations - COALESCE(old.total_citation, 0),
+                    max_citations = (
+                        SELECT MAX(p.total_citation) FROM paper_authors pa
+                        JOIN papers p ON p.PPC_Id = pa.PPC_Id
+                        WHERE pa.author_norm = author_stats.author_norm
+                    )
+                WHERE author_norm IN (SELECT author_norm FROM paper_authors WHERE PPC_Id = old.PPC_Id);
+                DELETE FROM author_stats
+                WHERE paper_count <= 0
+                  AND author_norm IN (SELECT author_norm FROM paper_authors WHERE PPC_Id = old.PPC_Id);
+                DELETE FROM paper_authors WHERE PPC_Id = old.PPC_Id;
+            END
+        """)
+        # A renamed paper keeps its author rows; a citation change moves the
+        # citation totals of its authors.
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS papers_authors_au AFTER UPDATE OF PPC_Id, total_citation ON papers BEGIN
+                UPDATE paper_authors SET PPC_Id = new.PPC_Id WHERE PPC_Id = old.PPC_Id;
+                UPDATE author_stats SET
+                    total_citations = total_citations - COALESCE(old.total_citation, 0) + COALESCE(new.total_citation, 0),
+                    max_citations = (
+                        SELECT MAX(p.total_citation) FROM paper_authors pa
+                        JOIN papers p ON p.PPC_Id = pa.PPC_Id
+                        WHERE pa.author_norm = author_stats.author_norm
+                    )
+                WHERE author_norm IN (SELECT author_norm FROM paper_authors WHERE PPC_Id = new.PPC_Id);
+                UPDATE OR REPLACE {AUTHOR_SYNC_TABLE} SET PPC_Id = new.PPC_Id WHERE PPC_Id = old.PPC_Id;
+            END
+        """)
+
+        # New papers and changed bylines are queued for sync_author_index()
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS papers_authors_ai AFTER INSERT ON papers BEGIN
+                INSERT OR IGNORE INTO {AUTHOR_SYNC_TABLE} (PPC_Id) VALUES (new.PPC_Id);
+            END
+        """)
+        # all_authors lives in paper_details once split out of papers
+        byline_table = "papers"
+        if has_paper_details(conn):
+            byline_table = PAPER_DETAILS_TABLE
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS papers_authors_details_ai AFTER INSERT ON {PAPER_DETAILS_TABLE} BEGIN
+                    INSERT OR IGNORE INTO {AUTHOR_SYNC_TABLE} (PPC_Id) VALUES (new.PPC_Id);
+                END
+            """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS papers_authors_byline_au AFTER UPDATE OF all_authors ON {byline_table} BEGIN
+                INSERT OR IGNORE INTO {AUTHOR_SYNC_TABLE} (PPC_Id) VALUES (new.PPC_Id);
+            END
+        """)
+
+        conn.commit()
+        logger.info(f"Author tables created successfully! ({len(rows)} paper-author rows)")
+
+    except Exception as e:
+        logger.error(f"Error building author tables: {e}")
+        raise
+
+def _refresh_rollup_cell(table, dimensions, prefix):
+    """Trigger statements replacing the rollup cell of the old or new papers row with its current aggregate"""
+    in_cell = " AND ".join(
+        f"{dimension} IS ({dimension_sql(dimension, prefix)})" for dimension in dimensions
+    )
+    papers_in_cell = " AND ".join(
+        f"({dimension_sql(dimension)}) IS ({dimension_sql(dimension, prefix)})" for dimension in dimensions
+    )
+    return (
+        f"DELETE FROM {table} WHERE {in_cell};\n"
+        f"INSERT INTO {table} {rollup_select_sql(dimensions, papers_in_cell)};"
+    )
+
+def create_rollups(conn):
+    """Build the rollup tables the analytics endpoints read instead of papers.
+
+    Each table holds one row per combination of its dimensions (year, month,
+    subject, server, ...) with counts, sums, minima and maxima of citations
+    and publication delay. Triggers recompute the cells of changed papers
+    from papers, so the rollups stay exact through inserts, updates and
+    deletes.
+    """
+    try:
+        cursor = conn.cursor()
+
+        logger.info("Building rollup tables...")
+
+        for table, dimensions in ROLLUP_TABLES.items():
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            cursor.execute(f"CREATE TABLE {table} AS {rollup_select_sql(dimensions)}")
+            cursor.execute(f"CREATE INDEX idx_{table}_cell ON {table}({', '.join(dimensions)})")
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_ai AFTER INSERT ON papers BEGIN
+                    {_refresh_rollup_cell(table, dimensions, "new.")}
+                END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_ad AFTER DELETE ON papers BEGIN
+                    {_refresh_rollup_cell(table, dimensions, "old.")}
+                END
+            """)
+            cursor.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_au AFTER UPDATE ON papers BEGIN
+                    {_refresh_rollup_cell(table, dimensions, "old.")}
+                    {_refresh_rollup_cell(table, dimensions, "new.")}
+                END
+            """)
+            cells = cursor.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+            logger.info(f"Created rollup {table}: {cells} cells")
+
+        conn.commit()
+        logger.info("Rollup tables created successfully!")
+
+    except Exception as e:
+        logger.error(f"Error building rollup tables: {e}")
+        raise
+
+def create_data_version(conn):
+    """Start a new data generation for the freshly built database.
+
+    The API derives ETag and Last-Modified headers from this row; the
+    generation is seeded from the clock so it never repeats across rebuilds,
+    and write endpoints advance it.
+    """
+    try:
+        now = time.time()
+        cursor = conn.cursor()
+        cursor.execute(f"DROP TABLE IF EXISTS {DATA_VERSION_TABLE}")
+        cursor.execute(f"""
+            CREATE TABLE {DATA_VERSION_TABLE} (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                generation INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        cursor.execute(
+            f"INSERT INTO {DATA_VERSION_TABLE} (id, generation, updated_at) VALUES (1, ?, ?)",
+            (int(now * 1000), now)
+        )
+        conn.commit()
+        logger.info("Data version recorded")
+
+    except Exception as e:
+        logger.error(f"Error recording data version: {e}")
+        raise
+
 def main():
     try:
         df = pd.read_csv(CSV_INPUT, low_memory=False)
@@ -69,13 +551,38 @@ def main():
         df.to_sql(TABLE_NAME, conn, if_exists='replace', index=False)
         logger.info(f"Database '{DB_NAME}' with table '{TABLE_NAME}' created successfully.")
         
+        # Materialize integer date parts before indexing them
+        add_date_columns(conn)
+
+        # Keep papers narrow: bulky text goes to paper_details
+        split_paper_details(conn)
+
         # Create indexes for performance optimization
         create_indexes(conn)
 
+        # Build the full-text search index used by /api/papers/search
+        create_search_index(conn)
+
+        # Trigram index for the free-text filters of advanced search
+        create_substring_index(conn)
+
+        # Normalized author tables used by /api/authors
+        create_author_index(conn, df)
+
+        # Pre-aggregated cells behind the analytics endpoints
+        create_rollups(conn)
+
+        # Data generation behind the API's ETag / Last-Modified headers
+        create_data_version(conn)
+
     print(f"\n✅ Database creation and optimization completed!")
     print(f"📊 Database: {DB_NAME}")
-    print(f"📋 Table: {TABLE_NAME}")
+    print(f"📋 Table: {TABLE_NAME} (text columns in {PAPER_DETAILS_TABLE})")
     print("🚀 Performance indexes: All performance indexes created successfully")
+    print("🔎 Full-text search: papers_fts index created")
+    print("🔤 Substring filters: papers_trigram index created")
+    print("👥 Authors: paper_authors, author_stats and authors_fts tables created")
+    print(f"📈 Rollups: {', '.join(ROLLUP_TABLES)} tables created")
 
 if __name__ == "__main__":
     main()
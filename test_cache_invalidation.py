@@ -0,0 +1,205 @@
+"""Check that deleting a paper invalidates exactly the cached results it affects.
+
+Runs the app in-process against a copy of the configured database
+(DATABASE_NAME), since papers are deleted, with a throwaway shared cache
+file. Reports:
+  - searches, author pages and analytics that include the deleted paper
+    are recomputed on the next read;
+  - cached results that cannot include it survive the delete;
+  - a value computed before a delete and stored after it is not cached;
+  - the L1 budget evicts the entries cheapest to recompute first.
+"""
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+
+WORK_DIR = tempfile.mkdtemp(prefix="ppc-cache-test-")
+SOURCE_DB = os.environ.get("DATABASE_NAME", "ppc.db")
+TEST_DB = os.path.join(WORK_DIR, "ppc.db")
+
+# Deletes go to a copy; the caches start empty and share a file of their own
+os.environ["DATABASE_NAME"] = TEST_DB
+os.environ["CACHE_BACKEND"] = "sqlite"
+os.environ["CACHE_PATH"] = os.path.join(WORK_DIR, "response_cache.db")
+os.environ.setdefault("METRICS_BACKEND", "memory")
+os.environ["WARMUP_MANIFEST"] = "[]"
+
+from fastapi.testclient import TestClient
+
+from app.author_index import PAPER_AUTHORS_TABLE, matching_author_norms
+from app.cache import _BudgetedTTLCache, _Entry, analytics_cache, cache
+from app.cache_tags import _query_matches_paper, paper_tag
+from app.main import app
+from app.search import has_fts_index
+
+failures = 0
+
+def check(condition, message):
+    global failures
+    if condition:
+        print(f"✅ {message}")
+    else:
+        failures += 1
+        print(f"❌ {message}")
+
+def copy_database():
+    with sqlite3.connect(SOURCE_DB) as source, sqlite3.connect(TEST_DB) as target:
+        source.backup(target)
+
+def cached_keys():
+    return set(cache.local) | set(analytics_cache.local)
+
+def get(client, url):
+    """Response body of url and the cache keys requesting it added"""
+    before = cached_keys()
+    response = client.get(url)
+    assert response.status_code == 200, f"{url} -> {response.status_code}"
+    return response.text, cached_keys() - before
+
+def is_cached(key):
+    return key in cache or key in analytics_cache
+
+def title_words(title):
+    return [word for word in title.lower().split() if word.isalpha() and len(word) > 5]
+
+def pick_fixture(conn):
+    """A paper to delete plus a search, an author and a subject that cannot find it"""
+    fts = has_fts_index(conn)
+    rows = conn.execute(
+        "SELECT rowid, PPC_Id, preprint_title, preprint_subject FROM papers "
+        "WHERE preprint_title IS NOT NULL AND preprint_subject IS NOT NULL ORDER BY rowid LIMIT 200"
+    ).fetchall()
+    rowid, ppc_id, title, subject = rows[0]
+    author = conn.execute(
+        f"SELECT author_norm FROM {PAPER_AUTHORS_TABLE} WHERE PPC_Id = ? ORDER BY author_norm LIMIT 1", (ppc_id,)
+    ).fetchone()[0]
+    deleted_authors = {r[0] for r in conn.execute(
+        f"SELECT author_norm FROM {PAPER_AUTHORS_TABLE} WHERE PPC_Id = ?", (ppc_id,)
+    )}
+    query = next(word for word in title_words(title) if _query_matches_paper(conn, word, rowid, fts))
+
+    other_query = other_author = other_subject = other_id = None
+    for _, candidate_id, candidate_title, candidate_subject in rows[1:]:
+        if other_query is None:
+            other_query = next((
+                word for word in title_words(candidate_title)
+                if not _query_matches_paper(conn, word, rowid, fts)
+            ), None)
+        if other_subject is None and candidate_subject.lower() not in subject.lower():
+            other_subject, other_id = candidate_subject, candidate_id
+        if other_author is None:
+            for (norm,) in conn.execute(
+                f"SELECT author_norm FROM {PAPER_AUTHORS_TABLE} WHERE PPC_Id = ?", (candidate_id,)
+            ):
+                if not deleted_authors.intersection(matching_author_norms(conn, norm) or []):
+                    other_author = norm
+                    break
+    return ppc_id, query, author, subject, other_id, other_query, other_author, other_subject
+
+def spare_papers(conn, count, exclude):
+    rows = conn.execute("SELECT PPC_Id FROM papers ORDER BY rowid DESC LIMIT ?", (count + len(exclude),))
+    return [r[0] for r in rows if r[0] not in exclude][:count]
+
+def check_delete(client, fixture):
+    ppc_id, query, author, subject, other_id, other_query, other_author, other_subject = fixture
+    affected = {
+        "search": f"/api/papers/search?query={query}&page_size=100",
+        "author papers": f"/api/authors/{author}/papers?page_size=100",
+        "subject timeline": f"/api/advanced-analytics/publication-timeline?subject={subject}",
+        "dashboard": "/api/analytics/dashboard",
+    }
+    unrelated = {
+        "other paper": f"/api/papers/{other_id}",
+        "other search": f"/api/papers/search?query={other_query}&page_size=100",
+        "other author papers": f"/api/authors/{other_author}/papers?page_size=100",
+        "other subject timeline": f"/api/advanced-analytics/publication-timeline?subject={other_subject}",
+    }
+    before = {name: get(client, url) for name, url in {**affected, **unrelated}.items()}
+
+    response = client.delete(f"/api/papers/{ppc_id}")
+    check(response.status_code == 204, f"deleted {ppc_id}")
+    check(client.get(f"/api/papers/{ppc_id}").status_code == 404, f"{ppc_id} is gone")
+
+    for name, url in affected.items():
+        body, keys = before[name]
+        check(keys and not any(is_cached(key) for key in keys), f"[{name}] dropped from the cache")
+        after, _ = get(client, url)
+        if name in ("search", "author papers"):
+            totals = json.loads(body)["total"], json.loads(after)["total"]
+            check(totals[1] == totals[0] - 1, f"[{name}] no longer counts {ppc_id}")
+        else:
+            check(after != body, f"[{name}] recomputed without {ppc_id}")
+
+    for name, url in unrelated.items():
+        body, keys = before[name]
+        check(keys and all(is_cached(key) for key in keys), f"[{name}] still cached")
+        after, _ = get(client, url)
+        check(after == body, f"[{name}] unchanged")
+
+def check_race(client, mapping_victim, compute_victim):
+    # The tag belongs to no paper that is deleted, so only the generation check can drop these
+    tags = (paper_tag("PPC-no-such-paper"),)
+
+    key = "race_mapping"
+    check(key not in cache, f"[{key}] missed")
+    client.delete(f"/api/papers/{mapping_victim}")
+    cache.tagged(tags)[key] = "computed before the delete"
+    check(key not in cache, f"[{key}] result computed before a delete is not cached")
+
+    key = "race_compute"
+    def compute(_conn):
+        client.delete(f"/api/papers/{compute_victim}")
+        return "computed before the delete"
+    with sqlite3.connect(TEST_DB) as conn:
+        value = cache.tagged(tags).get_or_compute(key, compute, conn)
+    check(value == "computed before the delete", f"[{key}] result returned to its caller")
+    check(key not in cache, f"[{key}] result computed across a delete is not cached")
+
+    cache.tagged(tags)[key] = "computed after the delete"
+    check(key in cache, f"[{key}] result computed after the delete is cached")
+
+def check_eviction_order():
+    size = 100
+    weight = _BudgetedTTLCache.ENTRY_OVERHEAD + size
+    local = _BudgetedTTLCache(3 * weight, 60, "test")
+
+    def put(key, cost, length=size):
+        keys = set(local)
+        local[key] = _Entry(b"x" * length, 0.0, (), cost)
+        return keys - set(local)
+
+    put("cheap", 0.001)
+    put("expensive", 0.05)
+    put("popular", 0.001)
+    for _ in range(3):
+        local.touch("popular")
+    check(put("fourth", 0.01) == {"cheap"}, "[gdsf] the cheapest entry goes first")
+    check(put("fifth", 0.01) == {"popular"}, "[gdsf] hits keep an entry longer, cost still wins")
+    check("expensive" in local, "[gdsf] the costliest entry survives")
+
+    local = _BudgetedTTLCache(3 * weight, 60, "test")
+    put("large", 0.01, 2 * size)
+    put("small", 0.01)
+    check(put("another", 0.01) == {"large"}, "[gdsf] of equal cost, the larger entry goes first")
+
+def main():
+    print("🔍 Checking cache invalidation on delete...\n")
+    copy_database()
+    try:
+        with sqlite3.connect(TEST_DB) as conn:
+            fixture = pick_fixture(conn)
+            victims = spare_papers(conn, 2, {fixture[0], fixture[4]})
+        with TestClient(app) as client:
+            check_delete(client, fixture)
+            check_race(client, *victims)
+        check_eviction_order()
+    finally:
+        shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    print(f"\n📊 {failures} check(s) failed." if failures else "\n📊 All checks passed.")
+    return failures
+
+if __name__ == "__main__":
+    raise SystemExit(1 if main() else 0)
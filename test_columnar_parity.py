@@ -0,0 +1,71 @@
+"""Compare the columnar engine against SQL for every endpoint it can serve.
+
+Runs the app in-process against the configured database (DATABASE_NAME),
+requesting each URL once with the engine off and once with it on, and
+reports any response whose JSON differs.
+"""
+import itertools
+import os
+
+# Keep the runs independent of any shared cache or metrics files
+os.environ.setdefault("CACHE_BACKEND", "memory")
+os.environ.setdefault("METRICS_BACKEND", "memory")
+
+from fastapi.testclient import TestClient
+
+from app.cache import analytics_cache
+from app.columnar import COLUMNAR_ENDPOINTS
+from app.config import settings
+from app.main import app
+
+SUBJECTS = [None, "bio", "neuro", "genomics", "no-such-subject"]
+SERVERS = [None, "Rxiv", "med"]
+YEAR_RANGES = [(None, None), ("2015", None), (None, "2019"), ("2016", "2018"), ("2100", None)]
+TIME_RANGES = ["all", "last_year", "last_5_years", "last_10_years"]
+
+def _query(**params):
+    return "&".join(f"{name}={value}" for name, value in params.items() if value is not None)
+
+def build_urls():
+    urls = []
+    for subject, server, (year_from, year_to) in itertools.product(SUBJECTS, SERVERS, YEAR_RANGES):
+        years = {"year_from": year_from, "year_to": year_to}
+        urls.append(f"/api/advanced-analytics/publication-timeline?{_query(subject=subject, server=server, **years)}")
+        urls.append(f"/api/advanced-analytics/publication-status?{_query(subject=subject, server=server, **years)}")
+        urls.append(f"/api/advanced-analytics/submission-type-analytics?{_query(subject=subject, **years)}")
+        urls.append(f"/api/advanced-analytics/license-analytics?{_query(subject=subject, **years)}")
+        urls.append(f"/api/advanced-analytics/version-analytics?{_query(subject=subject, server=server)}")
+    for time_range, subject in itertools.product(TIME_RANGES, SUBJECTS):
+        urls.append(f"/api/subjects/analysis?{_query(time_range=time_range, subject=subject, top=3)}")
+    for time_range in TIME_RANGES:
+        urls.append(f"/api/subjects/analysis?time_range={time_range}&subjects=genomics,neuroscience,no-such-subject")
+    return list(dict.fromkeys(urls))
+
+def fetch(client, url, endpoints):
+    settings.columnar_endpoints = endpoints
+    analytics_cache.clear()
+    response = client.get(url)
+    return response.status_code, response.json()
+
+def main():
+    print("🔍 Comparing columnar and SQL analytics...\n")
+    urls = build_urls()
+    failures = 0
+    with TestClient(app) as client:
+        for url in urls:
+            sql = fetch(client, url, [])
+            columnar = fetch(client, url, list(COLUMNAR_ENDPOINTS))
+            if sql[0] != 200:
+                failures += 1
+                print(f"💥 [{sql[0]}] SQL request failed -> {url}")
+            elif sql != columnar or repr(sql) != repr(columnar):
+                failures += 1
+                print(f"❌ [MISMATCH] -> {url}")
+            else:
+                print(f"✅ [MATCH] -> {url}")
+
+    print(f"\n📊 {len(urls) - failures}/{len(urls)} responses identical.")
+    return failures
+
+if __name__ == "__main__":
+    raise SystemExit(1 if main() else 0)